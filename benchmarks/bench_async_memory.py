@@ -0,0 +1,112 @@
+"""Event-loop health with a slow database: MemorySystem vs AsyncMemorySystem.
+
+Fans hit a /chat-style pipeline (store memory, read context, simulated LLM
+call) while a fixed delay is injected into every commit to mimic a slow SQLite
+fsync. Alongside them a probe stream issues LLM-only calls, standing in for
+other fans' in-flight Gemini requests. With the blocking MemorySystem each
+commit freezes the event loop, so probe latency and loop lag balloon; with
+AsyncMemorySystem the database waits happen off the loop.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_async_memory --requests 200 --commit-delay 0.02
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import event
+
+from src.idolmcp.core.memory import MemoryConfig, MemorySystem
+from src.idolmcp.core.memory.async_memory import AsyncMemorySystem
+
+def add_commit_delay(engine, delay: float) -> None:
+    @event.listens_for(engine, "commit")
+    def _slow_fsync(conn):
+        time.sleep(delay)
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+async def run(store, get, requests: int, llm_latency: float, probes: int) -> dict:
+    probe_latencies = []
+    loop_lag = []
+    done = asyncio.Event()
+
+    async def chat(i: int) -> None:
+        user_id = f"fan_{i % 50}"
+        await store(user_id, f"message {i}", ["chat", "bench"])
+        await get(user_id)
+        await asyncio.sleep(llm_latency)
+
+    async def probe() -> None:
+        for _ in range(probes):
+            start = time.perf_counter()
+            await asyncio.sleep(llm_latency)
+            probe_latencies.append(time.perf_counter() - start)
+
+    async def heartbeat() -> None:
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.005)
+            loop_lag.append(time.perf_counter() - start - 0.005)
+
+    beat = asyncio.create_task(heartbeat())
+    start = time.perf_counter()
+    await asyncio.gather(probe(), *(chat(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await beat
+
+    return {
+        "elapsed": elapsed,
+        "throughput": requests / elapsed,
+        "probe_p50": statistics.median(probe_latencies),
+        "probe_p95": percentile(probe_latencies, 95),
+        "max_loop_lag": max(loop_lag) if loop_lag else 0.0,
+    }
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--commit-delay", type=float, default=0.02, help="seconds added to every commit")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="simulated LLM call duration")
+    parser.add_argument("--probes", type=int, default=10, help="sequential LLM-only probe calls")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sync_system = MemorySystem(MemoryConfig(db_url=f"sqlite:///{os.path.join(tmp, 'sync.db')}"))
+        add_commit_delay(sync_system.engine, args.commit_delay)
+
+        async def sync_store(*a):
+            sync_system.store_memory(*a)
+
+        async def sync_get(*a):
+            return sync_system.get_memories(*a)
+
+        sync_result = await run(sync_store, sync_get, args.requests, args.llm_latency, args.probes)
+        sync_system.engine.dispose()
+
+        async_system = AsyncMemorySystem(MemoryConfig(db_url=f"sqlite:///{os.path.join(tmp, 'async.db')}"))
+        await async_system.init_schema()
+        add_commit_delay(async_system.engine.sync_engine, args.commit_delay)
+        async_result = await run(
+            async_system.store_memory, async_system.get_memories,
+            args.requests, args.llm_latency, args.probes
+        )
+        await async_system.close()
+
+    print(f"requests={args.requests} commit_delay={args.commit_delay}s llm_latency={args.llm_latency}s")
+    print(f"{'backend':<20}{'elapsed':>10}{'req/s':>10}{'probe p50':>12}{'probe p95':>12}{'max lag':>10}")
+    for name, r in (("MemorySystem", sync_result), ("AsyncMemorySystem", async_result)):
+        print(
+            f"{name:<20}{r['elapsed']:>9.2f}s{r['throughput']:>10.1f}"
+            f"{r['probe_p50'] * 1000:>10.0f}ms{r['probe_p95'] * 1000:>10.0f}ms{r['max_loop_lag'] * 1000:>8.0f}ms"
+        )
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+"""One webhook delivery of N messages: N /chat calls against one /chat/batch.
+
+Builds the app in-process (src/idolmcp, stub LLM, SQLite file database) and
+replays the same deliveries both ways: the messages fanned out as
+concurrent /chat calls, and the whole delivery posted to /chat/batch.
+Reports the time per delivery and per message.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_chat_batch --messages 50 --deliveries 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from fastapi.testclient import TestClient
+
+APP_DIR = os.path.join(os.path.dirname(__file__), "..", "src", "idolmcp")
+GREETINGS = ["早安", "晚安", "hi", "午安", "加油！", "[貼圖]", "好可愛", "愛你"]
+
+def delivery(n: int, messages: int) -> List[Dict[str, str]]:
+    return [
+        {"user_id": f"fan_{(n * messages + i) % 200}", "message": GREETINGS[i % len(GREETINGS)], "platform": "line"}
+        for i in range(messages)
+    ]
+
+def fan_out(client: TestClient, requests: List[Dict[str, str]]) -> None:
+    async def post_all():
+        # Concurrent, like a bridge fanning a delivery out over HTTP
+        return await asyncio.gather(*(asyncio.to_thread(client.post, "/chat", json=r) for r in requests))
+
+    responses = asyncio.run(post_all())
+    assert all(response.status_code == 200 for response in responses)
+
+def batched(client: TestClient, requests: List[Dict[str, str]]) -> None:
+    results = client.post("/chat/batch", json={"requests": requests}).json()["results"]
+    assert all(result["status"] == 200 for result in results)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=50, help="messages per delivery")
+    parser.add_argument("--deliveries", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="stub LLM first-token delay")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.update(
+            DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'memories.db')}",
+            LLM_PROVIDER="STUB",
+            LLM_STUB_LATENCY=str(args.llm_latency),
+            CHAT_BATCH_MAX_SIZE=str(max(100, args.messages)),
+            LOG_LEVEL="WARNING",
+        )
+        sys.path.insert(0, APP_DIR)
+        import main as app_main
+
+        with TestClient(app_main.IdolMCP().app) as client:
+            for name, send in (("N x /chat", fan_out), ("/chat/batch", batched)):
+                send(client, delivery(0, args.messages))
+                times = []
+                for n in range(1, args.deliveries + 1):
+                    started = time.perf_counter()
+                    send(client, delivery(n, args.messages))
+                    times.append(time.perf_counter() - started)
+                median = statistics.median(times)
+                print(
+                    f"{name:<12} {args.messages} messages: median {median * 1000:8.1f} ms per delivery  "
+                    f"{median / args.messages * 1000:6.2f} ms per message"
+                )
+
+if __name__ == "__main__":
+    main()
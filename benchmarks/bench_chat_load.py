@@ -0,0 +1,271 @@
+"""End-to-end /chat load test against the real IdolMCP app and a stub LLM.
+
+Builds the FastAPI app from src/idolmcp/main.py with LLM_PROVIDER=STUB,
+seeds the memory store, then drives /chat in-process through httpx's ASGI
+transport with N concurrent fans per round. Reports throughput, p50/p95/p99
+request latency, a per-stage breakdown (persona, emotion, memory write,
+memory read, LLM) and database pool checkout waits, and writes everything to a JSON file so runs on different
+commits can be compared (--compare).
+
+Run from the repository root:
+
+    python -m benchmarks.bench_chat_load --fans 100,1000 --memories 100000
+    python -m benchmarks.bench_chat_load --db-url postgresql://user:pw@localhost/idolmcp
+    python -m benchmarks.bench_chat_load --compare benchmarks/results/chat_load_<sha>.json
+"""
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import httpx
+from sqlalchemy import insert
+
+APP_DIR = os.path.join(os.path.dirname(__file__), "..", "src", "idolmcp")
+GREETINGS = ["早安", "晚安", "hi", "午安", "加油！", "[貼圖]", "好可愛", "愛你"]
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean_ms": statistics.fmean(values) * 1000,
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+        "max_ms": max(values) * 1000,
+    }
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+class StageTimer:
+    """Wraps component methods on the app instance to time each pipeline stage."""
+
+    def __init__(self):
+        self.durations: Dict[str, List[float]] = defaultdict(list)
+
+    def wrap(self, obj, attr: str, stage: str) -> None:
+        original = getattr(obj, attr)
+        if asyncio.iscoroutinefunction(original):
+            @functools.wraps(original)
+            async def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await original(*args, **kwargs)
+                finally:
+                    self.durations[stage].append(time.perf_counter() - start)
+        else:
+            @functools.wraps(original)
+            def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    self.durations[stage].append(time.perf_counter() - start)
+        setattr(obj, attr, timed)
+
+    def reset(self) -> None:
+        self.durations.clear()
+
+def build_app(args):
+    os.environ.setdefault("LLM_PROVIDER", "STUB")
+    os.environ["DATABASE_URL"] = args.db_url
+    os.environ["LLM_STUB_LATENCY"] = str(args.llm_latency)
+    os.environ["LLM_STUB_DISTRIBUTION"] = args.llm_distribution
+    os.environ["LLM_STUB_JITTER"] = str(args.llm_jitter)
+    for item in args.env:
+        key, _, value = item.partition("=")
+        os.environ[key] = value
+    sys.path.insert(0, APP_DIR)
+    import main
+    logging.getLogger().setLevel(logging.ERROR)
+    return main.IdolMCP()
+
+async def seed(memory_system, users: int, memories: int) -> None:
+    """Bulk-insert ``memories`` rows spread over ``users`` fans, newest in the last 30 days.
+
+    The database assigns the ids (RETURNING gives them back for the tag and
+    search index rows), so seeding works on a store that already has rows and
+    leaves the id sequence ready for the writes made during the run.
+    """
+    from core.memory import MemoryEntry, MemoryTag, MemoryTerm, search_terms
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    batch = 5000
+    async with memory_system.engine.begin() as conn:
+        for first in range(0, memories, batch):
+            entries = []
+            for n in range(first, min(first + batch, memories)):
+                created = now - timedelta(seconds=rng.uniform(0, 30 * 86400))
+                entries.append({
+                    "user_id": f"fan_{rng.randrange(users)}",
+                    "content": f"歷史訊息 {n + 1}",
+                    "tags": ["chat", rng.choice(["web", "line", "discord"])],
+                    "created_at": created,
+                    "updated_at": created,
+                })
+            ids = (await conn.execute(
+                insert(MemoryEntry).returning(MemoryEntry.id, sort_by_parameter_order=True), entries
+            )).scalars().all()
+            tags, terms = [], []
+            for memory_id, entry in zip(ids, entries):
+                tags.extend({"memory_id": memory_id, "tag": tag} for tag in entry["tags"])
+                terms.extend(
+                    {"memory_id": memory_id, "user_id": term.user_id, "term": term.term,
+                     "tf": term.tf, "doc_length": term.doc_length}
+                    for term in search_terms(entry["user_id"], entry["content"])
+                )
+            await conn.execute(insert(MemoryTag), tags)
+            await conn.execute(insert(MemoryTerm), terms)
+    memory_system.search_stats.clear()
+    if memory_system.cache is not None:
+        memory_system.cache.clear()
+
+async def run_round(client: httpx.AsyncClient, fans: int, requests_per_fan: int, users: int, greeting_ratio: float) -> dict:
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    rng = random.Random(fans)
+
+    async def fan(index: int) -> None:
+        user_id = f"fan_{rng.randrange(users)}"
+        for n in range(requests_per_fan):
+            if rng.random() < greeting_ratio:
+                message = rng.choice(GREETINGS)
+            else:
+                message = f"第 {n} 則訊息，來自 {user_id} 的第 {index} 位粉絲"
+            start = time.perf_counter()
+            response = await client.post("/chat", json={"user_id": user_id, "message": message, "platform": "web"})
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(fan(i) for i in range(fans)))
+    elapsed = time.perf_counter() - start
+    total = fans * requests_per_fan
+    return {
+        "fans": fans,
+        "requests": total,
+        "elapsed_s": elapsed,
+        "throughput_rps": total / elapsed,
+        "status_codes": {str(code): count for code, count in sorted(statuses.items())},
+        "error_rate": 1 - statuses.get(200, 0) / total,
+        "latency": summarize(latencies),
+    }
+
+def print_round(result: dict) -> None:
+    lat = result["latency"]
+    print(
+        f"\n{result['fans']} fans: {result['requests']} requests in {result['elapsed_s']:.2f}s "
+        f"= {result['throughput_rps']:.1f} req/s, errors {result['error_rate']:.1%} {result['status_codes']}"
+    )
+    print(f"  {'stage':<14}{'count':>8}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for stage, s in [("request", lat)] + list(result["stages"].items()):
+        if s["count"]:
+            print(
+                f"  {stage:<14}{s['count']:>8}{s['mean_ms']:>8.1f}ms{s['p50_ms']:>8.1f}ms"
+                f"{s['p95_ms']:>8.1f}ms{s['p99_ms']:>8.1f}ms"
+            )
+    pool = result.get("pool")
+    if pool and pool["checkouts"]:
+        print(
+            f"  db pool: {pool['checkouts']} checkouts, wait p50 {pool['wait_p50_ms']:.1f}ms "
+            f"p95 {pool['wait_p95_ms']:.1f}ms max {pool['wait_max_ms']:.1f}ms, {pool['timeouts']} timeouts"
+        )
+
+def print_comparison(results: List[dict], baseline_path: str) -> None:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    previous = {r["fans"]: r for r in baseline["rounds"]}
+    print(f"\ncompared with {baseline['commit']} ({baseline_path}):")
+    for result in results:
+        old = previous.get(result["fans"])
+        if old is None:
+            continue
+        print(
+            f"  {result['fans']} fans: throughput {old['throughput_rps']:.1f} -> {result['throughput_rps']:.1f} req/s"
+            f" ({result['throughput_rps'] / old['throughput_rps'] - 1:+.1%}),"
+            f" p95 {old['latency']['p95_ms']:.1f} -> {result['latency']['p95_ms']:.1f}ms"
+            f" ({result['latency']['p95_ms'] / old['latency']['p95_ms'] - 1:+.1%})"
+        )
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fans", default="100,1000", help="comma-separated concurrency levels")
+    parser.add_argument("--requests-per-fan", type=int, default=3)
+    parser.add_argument("--users", type=int, default=1000, help="distinct fan user_ids")
+    parser.add_argument("--memories", type=int, default=10000, help="memories seeded before the run")
+    parser.add_argument("--greeting-ratio", type=float, default=0.3, help="share of short repeated messages")
+    parser.add_argument("--db-url", help="memory store URL (default: a temporary SQLite file)")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="stub first-token latency (s)")
+    parser.add_argument("--llm-distribution", default="lognormal")
+    parser.add_argument("--llm-jitter", type=float, default=0.3)
+    parser.add_argument("--env", action="append", default=[], help="extra KEY=VALUE settings for the app")
+    parser.add_argument("--output", help="JSON results path (default: benchmarks/results/chat_load_<commit>.json)")
+    parser.add_argument("--compare", help="previous JSON results to compare against")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        args.db_url = args.db_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        idolmcp = build_app(args)
+        timer = StageTimer()
+        timer.wrap(idolmcp.persona, "refresh_mood", "persona")
+        timer.wrap(idolmcp.persona, "get_response_style", "persona")
+        timer.wrap(idolmcp.emotion_store, "update_state", "emotion")
+        timer.wrap(idolmcp.memory_system, "store_memory", "memory_write")
+        timer.wrap(idolmcp.memory_system, "get_memories", "memory_read")
+        timer.wrap(idolmcp.memory_system, "search_memories", "memory_search")
+        timer.wrap(idolmcp.llm_service, "generate_response", "llm")
+
+        results = []
+        async with idolmcp.app.router.lifespan_context(idolmcp.app):
+            start = time.perf_counter()
+            await seed(idolmcp.memory_system, args.users, args.memories)
+            print(f"seeded {args.memories:,} memories for {args.users:,} fans in {time.perf_counter() - start:.1f}s")
+            transport = httpx.ASGITransport(app=idolmcp.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+                for fans in (int(n) for n in args.fans.split(",")):
+                    timer.reset()
+                    result = await run_round(client, fans, args.requests_per_fan, args.users, args.greeting_ratio)
+                    result["stages"] = {stage: summarize(values) for stage, values in timer.durations.items()}
+                    result["pool"] = idolmcp.memory_system.pool_stats.stats()
+                    print_round(result)
+                    results.append(result)
+
+    commit = git_commit()
+    output = args.output or os.path.join("benchmarks", "results", f"chat_load_{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "compare")}
+    if "://" in config["db_url"] and not config["db_url"].startswith("sqlite"):
+        config["db_url"] = config["db_url"].split("://")[0] + "://..."
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "commit": commit,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "config": config,
+            "rounds": results,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"\nresults written to {output}")
+    if args.compare:
+        print_comparison(results, args.compare)
+
+if __name__ == "__main__":
+    asyncio.run(main())
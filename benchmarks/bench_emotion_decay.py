@@ -0,0 +1,68 @@
+"""Bulk emotion decay over 1M tracked users.
+
+Compares a periodic per-user Python tick (what EmotionEngine.decay_emotion
+would need if it were scheduled for every fan) with the NumPy bulk paths of
+EmotionStateStore, and measures the cost of a single lazy read.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_emotion_decay --users 1000000
+"""
+import argparse
+import random
+import time
+
+from src.idolmcp.core.emotion import EmotionConfig, EmotionState
+from src.idolmcp.core.emotion.store import EmotionStateStore, EmotionStoreConfig
+
+def timed(label: str, fn, users: int) -> None:
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34}{elapsed * 1000:>10.1f} ms{users / elapsed / 1e6:>10.1f} M users/s")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    clock = [0.0]
+    config = EmotionConfig(base_emotion=EmotionState.NEUTRAL, emotion_triggers={}, emotion_decay_interval=60)
+    store = EmotionStateStore(
+        config,
+        EmotionStoreConfig(max_entries=args.users, idle_ttl_seconds=1e9),
+        clock=lambda: clock[0]
+    )
+    states = list(EmotionState)
+    rng = random.Random(0)
+    start = time.perf_counter()
+    for i in range(args.users):
+        clock[0] = i / args.users * 600
+        store.update_state(f"fan_{i}", "line", rng.choice(states), rng.random())
+    print(f"populated {len(store):,} users in {time.perf_counter() - start:.1f}s")
+    clock[0] = 900
+
+    def python_tick() -> None:
+        # One Python-level decay step per tracked user, as a scheduled tick would do
+        base = config.base_emotion
+        rate = config.emotion_decay_rate
+        for slot in store._slots.values():
+            if store._codes[store._state[slot]] != base:
+                intensity = store._intensity[slot] - rate
+                if intensity <= 0:
+                    store._state[slot] = store._code_of[base]
+                    intensity = 0.5
+                store._intensity[slot] = intensity
+
+    def lazy_reads() -> None:
+        for i in range(0, args.users, 100):
+            store.get(f"fan_{i}", "line")
+
+    timed("python per-user tick", python_tick, args.users)
+    timed("snapshot() (NumPy)", store.snapshot, args.users)
+    timed("state_counts() (NumPy)", store.state_counts, args.users)
+    timed("decay_all() (NumPy)", store.decay_all, args.users)
+    timed("lazy get() x users/100", lazy_reads, args.users // 100)
+
+if __name__ == "__main__":
+    main()
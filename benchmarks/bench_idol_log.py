@@ -0,0 +1,67 @@
+"""IdolLog segment storage: append cost and query latency.
+
+Appends N entries through IdolLog (as /chat does once per request), with
+and without the segment store, then times range, type and warm-up reads
+against the files on disk.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_idol_log --entries 200000
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from src.idolmcp.core.idol_log import IdolLog
+from src.idolmcp.core.idol_log_store import SegmentLogConfig, SegmentLogStore
+
+def timed(label: str, fn, count: int):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34}{elapsed * 1000:>10.1f} ms{elapsed / count * 1e6:>10.2f} µs/op")
+    return result
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=200_000)
+    parser.add_argument("--fsync", action="store_true", help="fsync after every append")
+    args = parser.parse_args()
+    n = args.entries
+
+    def fill(log: IdolLog) -> None:
+        for i in range(n):
+            log.add_entry(
+                "training" if i % 50 == 0 else "chat",
+                f"粉絲 {i % 1000} 的訊息 #{i}",
+                "happy",
+                {"user_id": f"fan_{i % 1000}", "platform": "line"}
+            )
+
+    logging.getLogger(IdolLog.__module__).setLevel(logging.WARNING)
+
+    timed("append, memory only", lambda: fill(IdolLog()), n)
+    with tempfile.TemporaryDirectory() as directory:
+        config = SegmentLogConfig(directory=directory, fsync=args.fsync)
+        store = SegmentLogStore(config)
+        start_time = datetime.now()
+        timed("append, with segment store", lambda: fill(IdolLog(store=store)), n)
+        store.flush()
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        print(f"on disk: {size / 1e6:.1f} MB in {len(store._segments)} segments ({size / n:.0f} B/entry)")
+
+        # A window covering 1% of the history, in the middle of it
+        span = datetime.now() - start_time
+        middle = start_time + span / 2
+        window = timed("read_range 1% window", lambda: store.read_range(middle, middle + span / 100), 1)
+        print(f"  -> {len(window)} entries")
+        training = timed("read_by_type (2% match)", lambda: store.read_by_type("training"), n)
+        print(f"  -> {len(training)} entries")
+        timed("warm IdolLog (1000 recent)", lambda: IdolLog(store=store), 1)
+        store.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Time the event loop spends logging one /chat request, per logging setup.
+
+Replays the log lines of one /chat request (INFO lines plus the DEBUG
+prompt dump) at a fixed request rate through the root logger configured by
+setup_logging, with stderr redirected to a file. Reports the caller-side
+cost per request (what a request handler pays), how many lines reached the
+file and how many the queue dropped. Compares the old synchronous
+basicConfig-style handler with the background queue, JSON output and
+per-logger sampling.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_logging --requests 5000 --rate 1000
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from src.idolmcp.core.log_config import LoggingConfig, request_id, setup_logging, stop_logging
+
+SETUPS = {
+    # First: lean_records switches are process-wide and stay on once set
+    "sync text (old)": LoggingConfig(level="DEBUG", background=False, lean_records=False),
+    "sync text, INFO": LoggingConfig(level="INFO", background=False),
+    "background text": LoggingConfig(level="INFO"),
+    "background json": LoggingConfig(level="INFO", json_format=True),
+    "background json, 10% sampled": LoggingConfig(level="INFO", json_format=True, sample_rates={"main": 0.1, "core": 0.1}),
+}
+
+PROMPT = "Context:\n" + "\n".join(f"- 第 {i} 則記憶，今天也很開心" for i in range(20)) + "\nUser: 早安\nAssistant:"
+
+def one_request(n: int, main_log: logging.Logger, llm_log: logging.Logger, memory_log: logging.Logger) -> None:
+    request = {"user_id": f"fan_{n}", "message": "早安", "platform": "web"}
+    main_log.info("收到聊天請求: %s", request)
+    main_log.info("更新情緒狀態...")
+    main_log.info("存儲記憶...")
+    memory_log.info("記憶已寫入")
+    main_log.info("獲取記憶上下文...")
+    main_log.info("生成回應...")
+    llm_log.info("開始生成回應...")
+    llm_log.debug("格式化後的提示詞: %s", PROMPT)
+    llm_log.info("回應生成成功")
+    main_log.info("回應生成完成")
+
+def run(config: LoggingConfig, requests: int, rate: float, path: str) -> tuple:
+    stderr = sys.stderr
+    costs = []
+    with open(path, "w") as sink:
+        sys.stderr = sink
+        try:
+            handler = setup_logging(config)
+            loggers = [logging.getLogger(name) for name in ("main", "core.llm", "core.memory.async_memory")]
+            next_at = time.perf_counter()
+            for n in range(requests):
+                token = request_id.set(f"req{n}")
+                started = time.perf_counter()
+                one_request(n, *loggers)
+                costs.append(time.perf_counter() - started)
+                request_id.reset(token)
+                # The rest of the request: the background thread gets the CPU here
+                next_at += 1 / rate
+                time.sleep(max(0.0, next_at - time.perf_counter()))
+            # Drain the queue before counting what was written
+            stop_logging()
+        finally:
+            sys.stderr = stderr
+    with open(path) as written:
+        lines = sum(1 for _ in written)
+    return costs, lines, getattr(handler, "dropped", 0)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--rate", type=float, default=1000.0, help="requests per second")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "log.txt")
+        for name, config in SETUPS.items():
+            costs, lines, dropped = run(config, args.requests, args.rate, path)
+            costs.sort()
+            print(
+                f"{name:<30} caller p50 {statistics.median(costs) * 1e6:6.1f} µs  "
+                f"p99 {costs[int(len(costs) * 0.99)] * 1e6:7.1f} µs  "
+                f"{lines:>8,} lines written  {dropped:,} dropped"
+            )
+    logging.getLogger().handlers.clear()
+
+if __name__ == "__main__":
+    main()
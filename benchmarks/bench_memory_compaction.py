@@ -0,0 +1,114 @@
+"""Effect of memory compaction on table size, database size and prompt context.
+
+Seeds long-time fans with weeks of mostly trivial chatter, runs one full
+compaction pass, and compares row counts, SQLite file size (after VACUUM),
+get_memories latency and the rendered prompt context before and after.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_memory_compaction --users 50 --memories 2000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, text
+
+from src.idolmcp.core.llm.context import ContextBuilder, ContextConfig
+from src.idolmcp.core.memory import MemoryArchive, MemoryConfig, MemoryEntry, MemoryTag, MemoryTerm
+from src.idolmcp.core.memory.async_memory import AsyncMemorySystem
+from src.idolmcp.core.memory.compaction import CompactionConfig, MemoryCompactor
+
+CHATTER = ["早安", "晚安", "[貼圖]", "哈哈哈", "好可愛", "加油！", "愛你", "午安～"]
+FACTS = [
+    "我最喜歡草莓蛋糕", "下個月要去大阪看演唱會", "我的貓叫做小橘", "最近在準備期末考好累",
+    "新歌已經聽了一百遍", "我是從出道就開始支持的", "週末要去握手會", "今天升職了超開心",
+]
+
+async def populate(system: AsyncMemorySystem, users: int, memories: int, rng: random.Random) -> None:
+    await system.init_schema()
+    start = datetime.utcnow() - timedelta(days=60)
+    for user in range(users):
+        async with system.Session() as session:
+            session.add_all([
+                MemoryEntry(
+                    user_id=f"fan_{user}",
+                    content=rng.choice(FACTS) if rng.random() < 0.2 else rng.choice(CHATTER),
+                    tags=["chat", "web"],
+                    created_at=start + timedelta(minutes=i * 40),
+                    updated_at=start + timedelta(minutes=i * 40)
+                )
+                for i in range(memories)
+            ])
+            await session.commit()
+
+async def snapshot(system: AsyncMemorySystem, path: str, users: int) -> dict:
+    async with system.engine.begin() as conn:
+        await conn.execute(text("VACUUM"))
+    async with system.Session() as session:
+        rows = {
+            model.__tablename__: await session.scalar(select(func.count()).select_from(model))
+            for model in (MemoryEntry, MemoryTag, MemoryTerm, MemoryArchive)
+        }
+    system.cache.clear() if system.cache is not None else None
+    samples = []
+    builder = ContextBuilder(ContextConfig())
+    covered = []
+    for user in range(users):
+        started = time.perf_counter()
+        memories = await system.get_memories(f"fan_{user}")
+        samples.append(time.perf_counter() - started)
+        built = builder.build(memories, "你還記得我喜歡什麼嗎")
+        covered.append(built.tokens)
+    return {
+        "rows": rows,
+        "db_mb": os.path.getsize(path) / 1e6,
+        "get_memories_ms": statistics.median(samples) * 1000,
+        "context_tokens": statistics.mean(covered),
+        "oldest_in_context": min(m["created_at"] for m in memories),
+    }
+
+def show(label: str, stats: dict) -> None:
+    rows = ", ".join(f"{table} {count:,}" for table, count in stats["rows"].items())
+    print(
+        f"{label:<7} {rows}\n        db {stats['db_mb']:.1f} MB, get_memories p50 {stats['get_memories_ms']:.2f} ms, "
+        f"context {stats['context_tokens']:.0f} tokens, reaches back to {stats['oldest_in_context']:%m/%d}"
+    )
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--memories", type=int, default=2000, help="memories per user")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--keep-recent", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        system = AsyncMemorySystem(MemoryConfig(db_url=f"sqlite:///{path}"))
+        await populate(system, args.users, args.memories, random.Random(0))
+        show("before", await snapshot(system, path, args.users))
+
+        compactor = MemoryCompactor(system, CompactionConfig(
+            keep_recent=args.keep_recent,
+            batch_size=args.batch_size,
+            users_per_run=args.users,
+            max_batches_per_second=1e9
+        ))
+        started = time.perf_counter()
+        run = await compactor.run_once()
+        elapsed = time.perf_counter() - started
+        print(
+            f"compacted {run.archived:,} memories into {run.summaries:,} summaries "
+            f"in {elapsed:.1f}s ({run.summaries / elapsed:.0f} summaries/s unthrottled)"
+        )
+        show("after", await snapshot(system, path, args.users))
+        await system.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,93 @@
+"""Writer stalls while expired memories are deleted: one big DELETE vs. bounded batches.
+
+Seeds a SQLite file where most memories have expired, then runs
+expire_memories while a concurrent fan keeps storing memories, and
+reports how long the cleanup took and the worst store_memory latency seen
+during it. --batch-size 0 reproduces the old single-transaction DELETE.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_memory_expiry --memories 200000 --batch-size 0
+    python -m benchmarks.bench_memory_expiry --memories 200000 --batch-size 500
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from src.idolmcp.core.memory import MemoryConfig, MemoryEntry, MemoryTag, MemoryTerm, search_terms
+from src.idolmcp.core.memory.async_memory import AsyncMemorySystem
+
+async def populate(system: AsyncMemorySystem, count: int, expired_ratio: float) -> None:
+    await system.init_schema()
+    now = datetime.utcnow()
+    async with system.engine.begin() as conn:
+        for first in range(0, count, 5000):
+            rows = []
+            for i in range(first, min(count, first + 5000)):
+                age = timedelta(days=60) if i < count * expired_ratio else timedelta(days=1)
+                rows.append({
+                    "id": i + 1, "user_id": f"fan_{i % 1000}", "content": f"第 {i} 則訊息，今天也很開心",
+                    "tags": ["chat", "web"], "created_at": now - age, "updated_at": now - age,
+                })
+            await conn.execute(insert(MemoryEntry), rows)
+            await conn.execute(insert(MemoryTag), [
+                {"memory_id": row["id"], "tag": tag} for row in rows for tag in row["tags"]
+            ])
+            await conn.execute(insert(MemoryTerm), [
+                {"memory_id": row["id"], "user_id": term.user_id, "term": term.term,
+                 "tf": term.tf, "doc_length": term.doc_length}
+                for row in rows for term in search_terms(row["user_id"], row["content"])
+            ])
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--memories", type=int, default=200000)
+    parser.add_argument("--expired", type=float, default=0.8, help="share of memories already expired")
+    parser.add_argument("--batch-size", type=int, default=500, help="rows per transaction, 0 = everything at once")
+    parser.add_argument("--pause", type=float, default=0.05)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        system = AsyncMemorySystem(MemoryConfig(db_url=f"sqlite:///{path}", memory_expiry_days=30))
+        await populate(system, args.memories, args.expired)
+        size_before = os.path.getsize(path)
+
+        latencies = []
+        done = asyncio.Event()
+
+        async def writer() -> None:
+            n = 0
+            while not done.is_set():
+                started = time.perf_counter()
+                await system.store_memory("live_fan", f"即時訊息 {n}", ["chat", "web"])
+                latencies.append(time.perf_counter() - started)
+                n += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(writer())
+        await asyncio.sleep(0.2)
+        started = time.perf_counter()
+        batch_size = args.batch_size or args.memories * 10
+        expired, _ = await system.expire_memories(batch_size=batch_size, pause=args.pause)
+        elapsed = time.perf_counter() - started
+        done.set()
+        await task
+        reclaimed = await system.reclaim_space(10 ** 9)
+
+        print(f"deleted {expired:,} expired memories in {elapsed:.2f}s (batch size {args.batch_size or 'unbounded'})")
+        print(
+            f"concurrent store_memory: {len(latencies)} writes, p50 {statistics.median(latencies) * 1000:.1f} ms, "
+            f"max {max(latencies) * 1000:.1f} ms"
+        )
+        print(f"file {size_before / 1e6:.1f} MB -> {os.path.getsize(path) / 1e6:.1f} MB after reclaiming {reclaimed:,} pages")
+        await system.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+"""get_memories latency at 1k / 10k / 100k memories per user.
+
+Compares the SQL-side tag filter + LIMIT (memory_tags index) against the old
+strategy of loading every row for the user and filtering tags in Python.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_memory_query --sizes 1000 10000 100000
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from src.idolmcp.core.memory import MemoryConfig, MemoryEntry, MemorySystem, MemoryTag
+
+TAG_SETS = [["chat", "line"], ["chat", "discord"], ["chat", "line", "情感"], ["event"]]
+
+def populate(system: MemorySystem, user_id: str, count: int) -> None:
+    start = datetime.utcnow() - timedelta(seconds=count)
+    session = system.Session()
+    try:
+        for offset in range(0, count, 5000):
+            chunk = range(offset, min(count, offset + 5000))
+            entries = [
+                {
+                    "user_id": user_id,
+                    "content": f"fan message {i}",
+                    "tags": TAG_SETS[i % len(TAG_SETS)],
+                    "created_at": start + timedelta(seconds=i),
+                    "updated_at": start + timedelta(seconds=i),
+                }
+                for i in chunk
+            ]
+            ids = session.scalars(insert(MemoryEntry).returning(MemoryEntry.id), entries).all()
+            session.execute(insert(MemoryTag), [
+                {"memory_id": memory_id, "tag": tag}
+                for memory_id, entry in zip(ids, entries)
+                for tag in entry["tags"]
+            ])
+        session.commit()
+    finally:
+        session.close()
+
+def legacy_get_memories(system: MemorySystem, user_id: str, tags):
+    session = system.Session()
+    try:
+        memories = session.query(MemoryEntry).filter(
+            MemoryEntry.user_id == user_id
+        ).order_by(MemoryEntry.updated_at.desc()).all()
+        if tags:
+            memories = [m for m in memories if all(tag in m.tags for tag in tags)]
+        memories = memories[:system.config.max_memories_per_user]
+        return [{"content": m.content, "tags": m.tags, "created_at": m.created_at} for m in memories]
+    finally:
+        session.close()
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'memories':>9} {'filter':<22}{'legacy ms':>11}{'indexed ms':>12}{'speedup':>9}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            system = MemorySystem(MemoryConfig(db_url=f"sqlite:///{os.path.join(tmp, 'bench.db')}"))
+            populate(system, "power_fan", size)
+            populate(system, "other_fan", 100)
+            for tags in (None, ["chat"], ["chat", "line", "情感"]):
+                assert legacy_get_memories(system, "power_fan", tags) == system.get_memories("power_fan", tags)
+                legacy = timed(lambda: legacy_get_memories(system, "power_fan", tags), args.repeat)
+                indexed = timed(lambda: system.get_memories("power_fan", tags), args.repeat)
+                label = ",".join(tags) if tags else "(none)"
+                print(f"{size:>9} {label:<22}{legacy:>11.2f}{indexed:>12.2f}{legacy / indexed:>8.1f}x")
+            system.engine.dispose()
+
+if __name__ == "__main__":
+    main()
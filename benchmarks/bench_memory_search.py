@@ -0,0 +1,91 @@
+"""search_memories (BM25 over memory_terms) latency at 1k / 10k / 100k memories per user.
+
+Memories are synthetic fan messages built from a small vocabulary, so common
+bigrams appear in a large share of them, as in real chat logs.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_memory_search --sizes 1000 10000 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from src.idolmcp.core.memory import MemoryConfig, MemoryEntry, MemorySystem, MemoryTag, MemoryTerm, search_terms
+
+SUBJECTS = ["我", "今天我", "昨天", "本週", "我朋友", "我媽媽"]
+VERBS = ["喜歡", "去看了", "吃了", "想要", "討厭", "買了", "聽了"]
+OBJECTS = [
+    "草莓蛋糕", "演唱會", "新歌", "拉麵", "貓咪", "電影", "握手會", "周邊商品",
+    "珍珠奶茶", "夏日祭典", "遊戲", "偶像劇", "煙火大會", "直播", "見面會",
+]
+TAILS = ["", "！", "，好開心", "，有點累", "，超級期待", "～"]
+QUERIES = ["你記得我喜歡吃什麼嗎", "上次的演唱會", "煙火大會好玩嗎", "新歌", "我媽媽買了什麼"]
+
+def message(rng: random.Random) -> str:
+    return rng.choice(SUBJECTS) + rng.choice(VERBS) + rng.choice(OBJECTS) + rng.choice(TAILS)
+
+def populate(system: MemorySystem, user_id: str, count: int, rng: random.Random) -> None:
+    start = datetime.utcnow() - timedelta(seconds=count)
+    session = system.Session()
+    try:
+        for offset in range(0, count, 5000):
+            entries = [
+                {
+                    "user_id": user_id,
+                    "content": message(rng),
+                    "tags": ["chat"],
+                    "created_at": start + timedelta(seconds=i),
+                    "updated_at": start + timedelta(seconds=i),
+                }
+                for i in range(offset, min(count, offset + 5000))
+            ]
+            ids = session.scalars(insert(MemoryEntry).returning(MemoryEntry.id), entries).all()
+            session.execute(insert(MemoryTag), [{"memory_id": memory_id, "tag": "chat"} for memory_id in ids])
+            session.execute(insert(MemoryTerm), [
+                {"memory_id": memory_id, "user_id": user_id, "term": term.term,
+                 "tf": term.tf, "doc_length": term.doc_length}
+                for memory_id, entry in zip(ids, entries)
+                for term in search_terms(user_id, entry["content"])
+            ])
+        session.commit()
+    finally:
+        session.close()
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'memories':>9}  {'query':<16}{'ms':>8}  top hit")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            system = MemorySystem(MemoryConfig(db_url=f"sqlite:///{os.path.join(tmp, 'bench.db')}"))
+            populate(system, "power_fan", size, rng)
+            populate(system, "other_fan", 1000, rng)
+            for query in QUERIES:
+                ms = timed(lambda: system.search_memories("power_fan", query, args.k), args.repeat)
+                hits = system.search_memories("power_fan", query, args.k)
+                top = hits[0]["content"] if hits else "-"
+                print(f"{size:>9}  {query:<16}{ms:>8.2f}  {top}")
+            system.engine.dispose()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Cold-start time of the service: import, first /health and first /ready.
+
+Each run starts a fresh `uvicorn main:create_app --factory` process in
+src/idolmcp against an empty SQLite database and records, from the moment
+the process is spawned:
+
+  import   time to import main (measured separately with python -c)
+  live     first 200 from /health (server bound, schema created)
+  ready    first 200 from /ready (DB connections, LLM client warm)
+
+With --target the script exits non-zero when the median time to ready is
+above it, so it can guard the cold start of autoscaled replicas in CI.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_startup --runs 5
+    python -m benchmarks.bench_startup --provider GEMINI --target 3
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+APP_DIR = os.path.join(os.path.dirname(__file__), "..", "src", "idolmcp")
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def import_time(env) -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import main"], cwd=APP_DIR, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - started
+
+def wait_for(client: httpx.Client, path: str, started: float, timeout: float = 60.0) -> float:
+    while time.perf_counter() - started < timeout:
+        try:
+            if client.get(path).status_code == 200:
+                return time.perf_counter() - started
+        except httpx.TransportError:
+            pass
+        time.sleep(0.005)
+    raise RuntimeError(f"{path} did not return 200 within {timeout:.0f}s")
+
+def start_once(env) -> tuple:
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:create_app", "--factory",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=5) as client:
+            live = wait_for(client, "/health", started)
+            ready = wait_for(client, "/ready", started)
+        return live, ready
+    finally:
+        server.terminate()
+        server.wait()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--provider", default="STUB", help="LLM_PROVIDER; GEMINI includes the SDK import")
+    parser.add_argument("--target", type=float, default=None, help="fail if median seconds to ready exceed this")
+    args = parser.parse_args()
+
+    imports, lives, readies = [], [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        for run in range(args.runs):
+            env = dict(
+                os.environ,
+                DATABASE_URL=f"sqlite:///{os.path.join(tmp, f'memories_{run}.db')}",
+                LLM_PROVIDER=args.provider,
+                LLM_API_KEY=os.getenv("LLM_API_KEY", "bench"),
+            )
+            imports.append(import_time(env))
+            live, ready = start_once(env)
+            lives.append(live)
+            readies.append(ready)
+
+    for name, values in (("import", imports), ("live", lives), ("ready", readies)):
+        print(f"{name:<7} median {statistics.median(values) * 1000:7.0f} ms   max {max(values) * 1000:7.0f} ms")
+    if args.target is not None and statistics.median(readies) > args.target:
+        print(f"median time to ready is above the {args.target:.1f}s target")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
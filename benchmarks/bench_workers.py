@@ -0,0 +1,144 @@
+"""/chat throughput as the number of uvicorn worker processes grows.
+
+For each worker count, starts `uvicorn main:create_app --factory --workers N`
+in src/idolmcp with a stub LLM, emotion/mood state in a shared SQLite file
+(STATE_BACKEND=sqlite) and a fresh memory database, drives /chat over HTTP
+with a fixed number of concurrent fans for a fixed time, and reports
+requests per second, latency percentiles and scaling efficiency
+(rps(N) / (N * rps(1))). Scaling is bounded by CPU cores: on a machine with
+fewer cores than workers the extra processes only add scheduling overhead.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_workers --workers 1,2,4 --fans 64 --seconds 20
+    python -m benchmarks.bench_workers --workers 1,4 --state redis --redis-url redis://localhost:6379/1
+"""
+import argparse
+import asyncio
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+
+from src.idolmcp.core.memory import MemoryConfig, MemorySystem
+
+APP_DIR = os.path.join(os.path.dirname(__file__), "..", "src", "idolmcp")
+GREETINGS = ["早安", "晚安", "hi", "午安", "加油！", "[貼圖]", "好可愛", "愛你"]
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def start_server(workers: int, port: int, tmp: str, args) -> subprocess.Popen:
+    db_url = f"sqlite:///{os.path.join(tmp, f'memories_{workers}.db')}"
+    # Create the schema once up front instead of racing N workers on startup
+    MemorySystem(MemoryConfig(db_url=db_url)).engine.dispose()
+    env = dict(
+        os.environ,
+        WORKERS=str(workers),
+        DATABASE_URL=db_url,
+        LLM_PROVIDER="STUB",
+        LLM_STUB_LATENCY=str(args.llm_latency),
+        STATE_BACKEND=args.state,
+        STATE_SQLITE_PATH=os.path.join(tmp, f"state_{workers}.db"),
+        STATE_REDIS_URL=args.redis_url,
+        STATE_KEY_PREFIX=f"bench{workers}:",
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:create_app", "--factory",
+         "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        # Own process group so every worker is stopped with the supervisor
+        start_new_session=True
+    )
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/openapi.json")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+async def drive(client: httpx.AsyncClient, fans: int, seconds: float) -> Dict[str, float]:
+    latencies: List[float] = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+
+    async def fan(n: int) -> None:
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = await client.post("/chat", json={
+                "user_id": f"fan_{n}", "message": random.choice(GREETINGS), "platform": "web"
+            })
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(fan(n) for n in range(fans)))
+    elapsed = time.perf_counter() - started
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000 if latencies else 0.0,
+        "p95_ms": percentile(latencies, 95) * 1000 if latencies else 0.0,
+        "errors": errors,
+    }
+
+async def run(workers: int, tmp: str, args) -> Dict[str, float]:
+    port = free_port()
+    server = start_server(workers, port, tmp, args)
+    try:
+        limits = httpx.Limits(max_connections=args.fans, max_keepalive_connections=args.fans)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+            await wait_ready(client)
+            # Let every worker finish starting before measuring
+            await drive(client, args.fans, args.warmup)
+            return await drive(client, args.fans, args.seconds)
+    finally:
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait()
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--fans", type=int, default=64, help="concurrent fans")
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="stub LLM first-token delay")
+    parser.add_argument("--state", choices=["sqlite", "redis"], default="sqlite")
+    parser.add_argument("--redis-url", default="redis://localhost:6379/0")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPU cores, {args.fans} concurrent fans, stub LLM {args.llm_latency * 1000:.0f} ms")
+    baseline = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in (int(n) for n in args.workers.split(",")):
+            result = await run(workers, tmp, args)
+            baseline = baseline or result["rps"]
+            efficiency = result["rps"] / (workers * baseline) if baseline else 0.0
+            print(
+                f"workers={workers:<3} {result['rps']:8.1f} req/s  p50 {result['p50_ms']:7.1f} ms  "
+                f"p95 {result['p95_ms']:7.1f} ms  errors {result['errors']:<5} "
+                f"scaling efficiency {efficiency:.0%}"
+            )
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -14,4 +14,17 @@ config = MemoryConfig(
 # 初始化記憶系統（這會自動創建資料庫和表）
 memory_system = MemorySystem(config)
 
+# 為既有資料補建標籤索引
+memory_system.rebuild_tag_index()
+
+# 為既有資料補建全文搜尋索引
+memory_system.rebuild_search_index()
+
+# 舊的 SQLite 檔案需要完整 VACUUM 一次，之後背景維護才能逐步回收空間
+if memory_system.engine.dialect.name == "sqlite":
+    with memory_system.engine.connect() as conn:
+        if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2:
+            conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.exec_driver_sql("VACUUM")
+
 print("資料庫初始化完成！") 
\ No newline at end of file
@@ -13,6 +13,9 @@ class EmotionConfig(BaseModel):
     base_emotion: EmotionState
     emotion_triggers: Dict[str, List[EmotionState]]
     emotion_decay_rate: float = 0.1
+    # Seconds it takes to lose one emotion_decay_rate of intensity when decay
+    # is computed from elapsed time (see core.emotion.store)
+    emotion_decay_interval: float = 60.0
 
 class EmotionEngine:
     def __init__(self, config: EmotionConfig):
@@ -1,7 +1,9 @@
 from enum import Enum
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Sequence, Tuple
 from pydantic import BaseModel
 import logging
+import random
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
@@ -21,12 +23,46 @@ class EmotionTransition(BaseModel):
     probability: float = 1.0
     conditions: Optional[Dict] = None
 
+# (to_state, probability threshold, conditions) as stored in the compiled table
+CompiledTransition = Tuple[EmotionState, float, Optional[Dict]]
+
+_STATES = list(EmotionState)
+_STATE_INDEX = {state: i for i, state in enumerate(_STATES)}
+
+class _DenseTable:
+    """編譯後轉換表的陣列版本，索引為 [狀態, 觸發事件, 候選順序]；最後一個觸發事件欄位留空給未知事件"""
+    
+    def __init__(self, table: Dict[Tuple[EmotionState, str], List[CompiledTransition]]):
+        self.trigger_index = {trigger: i for i, trigger in enumerate(sorted({trigger for _, trigger in table}))}
+        shape = (len(_STATES), len(self.trigger_index) + 1, max((len(c) for c in table.values()), default=0))
+        self.to_state = np.zeros(shape, dtype=np.intp)
+        # 補位的候選門檻為 0，永遠不會觸發
+        self.threshold = np.zeros(shape, dtype=np.float64)
+        self.conditional = np.zeros(shape, dtype=bool)
+        for (state, trigger), candidates in table.items():
+            i, j = _STATE_INDEX[state], self.trigger_index[trigger]
+            for k, (to_state, threshold, conditions) in enumerate(candidates):
+                self.to_state[i, j, k] = _STATE_INDEX[to_state]
+                self.threshold[i, j, k] = threshold
+                self.conditional[i, j, k] = conditions is not None
+
 class EmotionFSM:
-    def __init__(self, initial_state: EmotionState = EmotionState.NEUTRAL):
+    def __init__(self, initial_state: EmotionState = EmotionState.NEUTRAL, seed: Optional[int] = None):
         self.current_state = initial_state
         self.transitions: Dict[EmotionState, List[EmotionTransition]] = {}
+        # (from_state, trigger) -> candidate transitions in insertion order
+        self._table: Dict[Tuple[EmotionState, str], List[CompiledTransition]] = {}
+        self._rng = random.Random(seed)
+        # process_triggers 一次抽出整批隨機數
+        self._batch_rng = np.random.default_rng(seed)
+        self._dense: Optional[_DenseTable] = None
         self._setup_default_transitions()
-        logger.info(f"初始化情緒 FSM，初始狀態: {initial_state.value}")
+        logger.info("初始化情緒 FSM，初始狀態: %s", initial_state.value)
+    
+    def seed(self, seed: Optional[int]) -> None:
+        """重設隨機數種子，用於重播相同的轉換序列"""
+        self._rng.seed(seed)
+        self._batch_rng = np.random.default_rng(seed)
     
     def _setup_default_transitions(self):
         """設置默認的情緒轉換規則"""
@@ -73,30 +109,81 @@ class EmotionFSM:
         if transition.from_state not in self.transitions:
             self.transitions[transition.from_state] = []
         self.transitions[transition.from_state].append(transition)
-        logger.debug(f"添加轉換規則: {transition.from_state.value} -> {transition.to_state.value}")
+        self._table.setdefault((transition.from_state, transition.trigger), []).append((
+            transition.to_state,
+            min(max(transition.probability, 0.0), 1.0),
+            transition.conditions or None
+        ))
+        self._dense = None
+        logger.debug("添加轉換規則: %s -> %s", transition.from_state.value, transition.to_state.value)
     
     def process_trigger(self, trigger: str, context: Optional[Dict] = None) -> bool:
         """處理觸發事件，可能導致狀態轉換"""
-        logger.info(f"處理觸發事件: {trigger}, 當前狀態: {self.current_state.value}")
+        logger.debug("處理觸發事件: %s, 當前狀態: %s", trigger, self.current_state.value)
         
-        if self.current_state not in self.transitions:
-            logger.warning(f"當前狀態 {self.current_state.value} 沒有定義轉換規則")
+        new_state = self._advance(self.current_state, trigger, context)
+        if new_state is None:
+            if self.current_state not in self.transitions:
+                logger.warning("當前狀態 %s 沒有定義轉換規則", self.current_state.value)
+            else:
+                logger.debug("沒有找到合適的轉換規則")
             return False
         
-        for transition in self.transitions[self.current_state]:
-            if transition.trigger == trigger:
-                # 檢查條件
-                if transition.conditions and not self._check_conditions(transition.conditions, context):
-                    continue
-                
-                # 根據概率決定是否轉換
-                if self._should_transition(transition.probability):
-                    logger.info(f"狀態轉換: {self.current_state.value} -> {transition.to_state.value}")
-                    self.current_state = transition.to_state
-                    return True
+        logger.debug("狀態轉換: %s -> %s", self.current_state.value, new_state.value)
+        self.current_state = new_state
+        return True
+    
+    def process_triggers(
+        self,
+        states: Sequence[EmotionState],
+        triggers: Sequence[str],
+        contexts: Optional[Sequence[Optional[Dict]]] = None
+    ) -> List[EmotionState]:
+        """批次推進多個會話的狀態機：states[i] 接收 triggers[i]，回傳各會話的新狀態
+        
+        以陣列一次查出所有會話的候選轉換，並一次抽出整批隨機數；與 process_trigger
+        的規則和機率相同，但使用獨立的隨機數序列，相同種子仍可重播相同結果。
+        只有帶條件的候選轉換需要逐一檢查 context。
+        """
+        if len(states) != len(triggers):
+            raise ValueError("states 與 triggers 長度不一致")
+        if contexts is not None and len(contexts) != len(states):
+            raise ValueError("contexts 與 states 長度不一致")
+        if self._dense is None:
+            self._dense = _DenseTable(self._table)
+        dense = self._dense
+        if not states or dense.threshold.shape[2] == 0:
+            return list(states)
         
-        logger.debug(f"沒有找到合適的轉換規則")
-        return False
+        unknown = len(dense.trigger_index)
+        state_idx = np.fromiter((_STATE_INDEX[state] for state in states), dtype=np.intp, count=len(states))
+        trigger_idx = np.fromiter(
+            (dense.trigger_index.get(trigger, unknown) for trigger in triggers), dtype=np.intp, count=len(triggers)
+        )
+        # 每個候選轉換各抽一個隨機數，與逐一處理時的機率相同
+        draws = self._batch_rng.random((len(states), dense.threshold.shape[2]))
+        fires = draws < dense.threshold[state_idx, trigger_idx]
+        for i, k in zip(*np.nonzero(fires & dense.conditional[state_idx, trigger_idx])):
+            conditions = self._table[(states[i], triggers[i])][k][2]
+            if not self._check_conditions(conditions, contexts[i] if contexts is not None else None):
+                fires[i, k] = False
+        
+        # 取第一個觸發的候選轉換；沒有任何觸發時維持原狀態
+        first = fires.argmax(axis=1)
+        rows = np.arange(len(states))
+        new_idx = np.where(fires[rows, first], dense.to_state[state_idx, trigger_idx, first], state_idx)
+        return [_STATES[i] for i in new_idx.tolist()]
+    
+    def _advance(self, state: EmotionState, trigger: str, context: Optional[Dict]) -> Optional[EmotionState]:
+        """查表取得候選轉換，回傳新狀態；沒有發生轉換時回傳 None"""
+        for to_state, threshold, conditions in self._table.get((state, trigger), ()):
+            # 檢查條件
+            if conditions and not self._check_conditions(conditions, context):
+                continue
+            # 根據概率決定是否轉換
+            if self._rng.random() < threshold:
+                return to_state
+        return None
     
     def _check_conditions(self, conditions: Dict, context: Optional[Dict]) -> bool:
         """檢查轉換條件是否滿足"""
@@ -110,8 +197,7 @@ class EmotionFSM:
     
     def _should_transition(self, probability: float) -> bool:
         """根據概率決定是否進行狀態轉換"""
-        import random
-        return random.random() < probability
+        return self._rng.random() < probability
     
     def get_current_state(self) -> EmotionState:
         """獲取當前情緒狀態"""
@@ -0,0 +1,256 @@
+import time
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from pydantic import BaseModel
+
+from . import EmotionConfig, EmotionState
+
+StateKey = Tuple[str, str]
+
+# Intensity reported for users at the base emotion
+DEFAULT_INTENSITY = 0.5
+
+class EmotionStoreConfig(BaseModel):
+    max_entries: int = 500000
+    idle_ttl_seconds: float = 3600.0
+
+def decayed_state(config: EmotionConfig, state: EmotionState, intensity: float, elapsed: float) -> Tuple[EmotionState, float]:
+    """(state, intensity) ``elapsed`` seconds after it was set, per the lazy decay rule."""
+    if state == config.base_emotion:
+        return state, intensity
+    intensity -= config.emotion_decay_rate / config.emotion_decay_interval * max(0.0, elapsed)
+    if intensity <= 0:
+        return config.base_emotion, DEFAULT_INTENSITY
+    return state, intensity
+
+@dataclass
+class EmotionSnapshot:
+    """Decayed state of every tracked user at one instant, as NumPy arrays."""
+    taken_at: float
+    keys: List[StateKey]
+    states: np.ndarray
+    intensity: np.ndarray
+    updated_at: np.ndarray
+    codes: List[EmotionState]
+
+    def state_of(self, index: int) -> EmotionState:
+        return self.codes[self.states[index]]
+
+class EmotionStateStore:
+    """Emotion state per (platform, user_id), replacing one engine shared by every fan.
+
+    States live in parallel typed arrays (1 byte state code, 8 byte intensity,
+    8 byte timestamp per slot); the dict only maps a key to its slot. Slots
+    freed by eviction are reused. Entries idle for longer than
+    ``idle_ttl_seconds`` or beyond ``max_entries`` are evicted oldest first.
+
+    Decay is never ticked: the intensity a reader sees is computed from the
+    time elapsed since it was last set, losing ``emotion_decay_rate`` every
+    ``emotion_decay_interval`` seconds until it reaches zero and the user
+    falls back to the base emotion. snapshot()/decay_all()/state_counts()
+    apply the same rule to every tracked user at once with NumPy.
+    """
+
+    DEFAULT_INTENSITY = DEFAULT_INTENSITY
+
+    def __init__(
+        self,
+        config: EmotionConfig,
+        store_config: Optional[EmotionStoreConfig] = None,
+        clock: Callable[[], float] = time.time
+    ):
+        self.config = config
+        self.store_config = store_config or EmotionStoreConfig()
+        self._clock = clock
+        self._codes: List[EmotionState] = list(EmotionState)
+        self._code_of: Dict[EmotionState, int] = {state: code for code, state in enumerate(self._codes)}
+        # key -> slot, ordered from least to most recently updated
+        self._slots: "OrderedDict[StateKey, int]" = OrderedDict()
+        self._free: List[int] = []
+        # slot -> key (None for free slots), so bulk paths never walk the ordered dict
+        self._keys: List[Optional[StateKey]] = []
+        self._state = array("B")
+        self._intensity = array("d")
+        self._updated_at = array("d")
+        # Reference time for lazy decay; differs from _updated_at after decay_all()
+        self._decayed_at = array("d")
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, key: StateKey) -> bool:
+        return key in self._slots
+
+    def get(self, user_id: str, platform: str = "") -> Tuple[EmotionState, float]:
+        """Current (state, intensity) for a user; untracked users are at the base emotion."""
+        slot = self._slots.get((platform, user_id))
+        if slot is None:
+            return self.config.base_emotion, self.DEFAULT_INTENSITY
+        return decayed_state(
+            self.config, self._codes[self._state[slot]], self._intensity[slot], self._clock() - self._decayed_at[slot]
+        )
+
+    def update_state(self, user_id: str, platform: str, new_state: EmotionState, intensity: float) -> Tuple[EmotionState, float]:
+        """Set a user's emotion state and intensity (clamped to [0, 1]); returns what was stored."""
+        intensity = max(0.0, min(1.0, intensity))
+        now = self._clock()
+        key = (platform, user_id)
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._allocate()
+            self._slots[key] = slot
+            self._keys[slot] = key
+        else:
+            self._slots.move_to_end(key)
+        self._state[slot] = self._code_of[new_state]
+        self._intensity[slot] = intensity
+        self._updated_at[slot] = now
+        self._decayed_at[slot] = now
+        self._evict(now)
+        return new_state, intensity
+
+    def reset(self, user_id: str, platform: str = "") -> None:
+        """Forget a user's state, returning them to the base emotion."""
+        slot = self._slots.pop((platform, user_id), None)
+        if slot is not None:
+            self._release(slot)
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """Drop entries not updated within the idle TTL; returns how many were removed."""
+        return self._evict(self._clock() if now is None else now)
+
+    def snapshot(self, now: Optional[float] = None) -> EmotionSnapshot:
+        """Decayed state of all tracked users, e.g. for dashboards or persistence."""
+        now = self._clock() if now is None else now
+        slots, states, intensity = self._decayed_live(now)
+        return EmotionSnapshot(
+            taken_at=now,
+            keys=[self._keys[slot] for slot in slots.tolist()],
+            states=states,
+            intensity=intensity,
+            updated_at=np.frombuffer(self._updated_at, dtype=np.float64)[slots],
+            codes=self._codes
+        )
+
+    def state_counts(self, now: Optional[float] = None) -> Dict[EmotionState, int]:
+        """Number of tracked users currently in each emotion state."""
+        _, states, _ = self._decayed_live(self._clock() if now is None else now)
+        counts = np.bincount(states, minlength=len(self._codes))
+        return {state: int(counts[code]) for code, state in enumerate(self._codes)}
+
+    def decay_all(self, now: Optional[float] = None) -> None:
+        """Fold elapsed decay into the stored intensities of every user in one pass."""
+        now = self._clock() if now is None else now
+        state_view = np.frombuffer(self._state, dtype=np.uint8)
+        intensity_view = np.frombuffer(self._intensity, dtype=np.float64)
+        decayed_at_view = np.frombuffer(self._decayed_at, dtype=np.float64)
+        state_view[:], intensity_view[:] = self._decayed(state_view, intensity_view, decayed_at_view, now)
+        decayed_at_view[:] = now
+        # Views pin the arrays' buffers; release them so the arrays can grow again
+        del state_view, intensity_view, decayed_at_view
+
+    def _decayed_live(self, now: float):
+        live = np.ones(len(self._keys), dtype=bool)
+        live[self._free] = False
+        slots = np.flatnonzero(live)
+        states, intensity = self._decayed(
+            np.frombuffer(self._state, dtype=np.uint8)[slots],
+            np.frombuffer(self._intensity, dtype=np.float64)[slots],
+            np.frombuffer(self._decayed_at, dtype=np.float64)[slots],
+            now
+        )
+        return slots, states, intensity
+
+    def _decay_per_second(self) -> float:
+        return self.config.emotion_decay_rate / self.config.emotion_decay_interval
+
+    def _decayed(self, states: np.ndarray, intensity: np.ndarray, decayed_at: np.ndarray, now: float):
+        base = self._code_of[self.config.base_emotion]
+        decayed = intensity - self._decay_per_second() * np.maximum(now - decayed_at, 0.0)
+        active = states != base
+        expired = active & (decayed <= 0)
+        new_states = np.where(expired, base, states).astype(np.uint8)
+        new_intensity = np.where(active, np.where(expired, self.DEFAULT_INTENSITY, decayed), intensity)
+        return new_states, new_intensity
+
+    def _allocate(self) -> int:
+        if self._free:
+            return self._free.pop()
+        self._keys.append(None)
+        self._state.append(0)
+        self._intensity.append(0.0)
+        self._updated_at.append(0.0)
+        self._decayed_at.append(0.0)
+        return len(self._state) - 1
+
+    def _release(self, slot: int) -> None:
+        self._keys[slot] = None
+        self._free.append(slot)
+
+    def _evict(self, now: float) -> int:
+        cutoff = now - self.store_config.idle_ttl_seconds
+        removed = 0
+        # The front of the ordered dict is always the least recently updated entry
+        while self._slots:
+            key, slot = next(iter(self._slots.items()))
+            if len(self._slots) <= self.store_config.max_entries and self._updated_at[slot] >= cutoff:
+                break
+            del self._slots[key]
+            self._release(slot)
+            removed += 1
+        self.evictions += removed
+        return removed
+
+class SharedEmotionStateStore:
+    """get()/update_state()/reset() of EmotionStateStore over a StateBackend.
+
+    Used when several worker processes serve the same fans: each user's state
+    is one "state|intensity|updated_at" value with the idle TTL as its expiry,
+    so whichever worker handles the next message sees it. Decay follows the
+    same lazy rule; the bulk NumPy views exist only on the in-process store.
+    The methods are coroutines, like the backend calls behind them.
+    """
+
+    DEFAULT_INTENSITY = DEFAULT_INTENSITY
+
+    def __init__(
+        self,
+        config: EmotionConfig,
+        backend,
+        store_config: Optional[EmotionStoreConfig] = None,
+        clock: Callable[[], float] = time.time
+    ):
+        self.config = config
+        self.backend = backend
+        self.store_config = store_config or EmotionStoreConfig()
+        self._clock = clock
+
+    @staticmethod
+    def _key(user_id: str, platform: str) -> str:
+        return f"emotion:{platform}:{user_id}"
+
+    async def get(self, user_id: str, platform: str = "") -> Tuple[EmotionState, float]:
+        """Current (state, intensity) for a user; untracked users are at the base emotion."""
+        value = await self.backend.get(self._key(user_id, platform))
+        if value is None:
+            return self.config.base_emotion, self.DEFAULT_INTENSITY
+        state, intensity, updated_at = value.split("|")
+        return decayed_state(self.config, EmotionState(state), float(intensity), self._clock() - float(updated_at))
+
+    async def update_state(self, user_id: str, platform: str, new_state: EmotionState, intensity: float) -> Tuple[EmotionState, float]:
+        """Set a user's emotion state and intensity (clamped to [0, 1]); returns what was stored."""
+        intensity = max(0.0, min(1.0, intensity))
+        await self.backend.set(
+            self._key(user_id, platform),
+            f"{new_state.value}|{intensity!r}|{self._clock()!r}",
+            ttl=self.store_config.idle_ttl_seconds
+        )
+        return new_state, intensity
+
+    async def reset(self, user_id: str, platform: str = "") -> None:
+        """Forget a user's state, returning them to the base emotion."""
+        await self.backend.delete(self._key(user_id, platform))
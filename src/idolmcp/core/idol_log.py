@@ -1,8 +1,13 @@
-from datetime import datetime
-from typing import List, Optional
+from bisect import bisect_left, bisect_right
+from collections import deque
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Deque, Dict, List, Optional
 from pydantic import BaseModel
 import logging
 
+if TYPE_CHECKING:
+    from .idol_log_store import SegmentLogStore
+
 logger = logging.getLogger(__name__)
 
 class IdolLogEntry(BaseModel):
@@ -12,49 +17,150 @@ class IdolLogEntry(BaseModel):
     emotion_state: str
     additional_data: Optional[dict] = None
 
+class _TimestampView:
+    """按時間順序檢視環形緩衝區中的時間戳，供 bisect 使用"""
+
+    def __init__(self, log: "IdolLog"):
+        self._log = log
+
+    def __len__(self) -> int:
+        return self._log._count
+
+    def __getitem__(self, index: int) -> datetime:
+        return self._log._entry_at(self._log._first_seq + index).timestamp
+
 class IdolLog:
-    def __init__(self, max_entries: int = 1000):
-        self.log_entries: List[IdolLogEntry] = []
+    def __init__(self, max_entries: int = 1000, store: Optional["SegmentLogStore"] = None):
+        if max_entries < 1:
+            raise ValueError(f"max_entries 必須至少為 1，收到 {max_entries}")
         self.max_entries = max_entries
+        # 可選的持久化後端；記憶體中只保留最近 max_entries 筆
+        self.store = store
+        self._reset()
+        if store is not None:
+            # 重啟後從磁碟回填最近的條目
+            self._load(store.read_recent(max_entries))
         logger.info("初始化偶像日誌系統")
-    
+
+    def _reset(self) -> None:
+        # 固定容量的環形緩衝區：序號 seq 的條目存放在 seq % max_entries
+        self._buffer: List[Optional[IdolLogEntry]] = [None] * self.max_entries
+        self._next_seq = 0
+        self._count = 0
+        # 次級索引：事件類型 / 情緒狀態 -> 依時間排序的序號
+        self._by_type: Dict[str, Deque[int]] = {}
+        self._by_emotion: Dict[str, Deque[int]] = {}
+
+    @property
+    def log_entries(self) -> List[IdolLogEntry]:
+        """依時間順序排列的所有日誌條目（新的 list；修改它不會影響日誌，請改用 add_entry / 指定新的 list）"""
+        return [self._entry_at(seq) for seq in range(self._first_seq, self._next_seq)]
+
+    @log_entries.setter
+    def log_entries(self, entries: List[IdolLogEntry]) -> None:
+        # 與舊版的 list 屬性相容：整個替換記憶體中的條目，只保留最後 max_entries 筆
+        self._reset()
+        self._load(entries)
+
+    def _load(self, entries: List[IdolLogEntry]) -> None:
+        # 日期範圍查詢以二分搜尋定位，條目必須依時間排序（sorted 是穩定排序，同時間的保留原順序）
+        for entry in sorted(entries, key=lambda entry: entry.timestamp):
+            self._insert(entry)
+
+    @property
+    def _first_seq(self) -> int:
+        return self._next_seq - self._count
+
+    def _entry_at(self, seq: int) -> IdolLogEntry:
+        return self._buffer[seq % self.max_entries]
+
     def add_entry(self, event_type: str, description: str, emotion_state: str, additional_data: Optional[dict] = None) -> None:
         """添加新的日誌條目"""
+        timestamp = datetime.now()
+        if self._count:
+            # 系統時鐘可能倒退；時間戳保持嚴格遞增，記憶體與段落中的條目才會依時間排序
+            timestamp = max(timestamp, self._entry_at(self._next_seq - 1).timestamp + timedelta(microseconds=1))
         entry = IdolLogEntry(
-            timestamp=datetime.now(),
+            timestamp=timestamp,
             event_type=event_type,
             description=description,
             emotion_state=emotion_state,
             additional_data=additional_data
         )
-        
-        self.log_entries.append(entry)
-        logger.info(f"添加日誌條目: {event_type} - {description}")
-        
-        # 如果超過最大條目數，移除最舊的條目
-        if len(self.log_entries) > self.max_entries:
-            self.log_entries.pop(0)
-    
+        if self.store is not None:
+            self.store.append(entry)
+        self._insert(entry)
+        # 每個聊天請求都會寫入一筆；不記錄訊息內容
+        logger.debug("添加日誌條目: %s", event_type)
+
+    def _insert(self, entry: IdolLogEntry) -> None:
+        # 如果已達最大條目數，覆蓋最舊的條目 (O(1))
+        if self._count == self.max_entries:
+            self._evict_oldest()
+
+        seq = self._next_seq
+        self._buffer[seq % self.max_entries] = entry
+        self._by_type.setdefault(entry.event_type, deque()).append(seq)
+        self._by_emotion.setdefault(entry.emotion_state, deque()).append(seq)
+        self._next_seq += 1
+        self._count += 1
+
+    def _evict_oldest(self) -> None:
+        seq = self._first_seq
+        oldest = self._entry_at(seq)
+        # 最舊的條目必定位於各索引的最前端
+        for index, key in ((self._by_type, oldest.event_type), (self._by_emotion, oldest.emotion_state)):
+            seqs = index[key]
+            seqs.popleft()
+            if not seqs:
+                del index[key]
+        self._buffer[seq % self.max_entries] = None
+        self._count -= 1
+
     def get_recent_entries(self, limit: int = 10) -> List[IdolLogEntry]:
         """獲取最近的日誌條目"""
-        return self.log_entries[-limit:]
-    
+        if limit <= 0:
+            return self.log_entries[-limit:]
+        start = max(self._first_seq, self._next_seq - limit)
+        return [self._entry_at(seq) for seq in range(start, self._next_seq)]
+
+    def _store_boundary(self) -> Optional[datetime]:
+        """記憶體中最舊條目的時間戳；段落中可能還有更舊的條目時才回傳，否則為 None"""
+        if self.store is None or self._count < self.max_entries:
+            return None
+        return self._entry_at(self._first_seq).timestamp
+
     def get_entries_by_type(self, event_type: str) -> List[IdolLogEntry]:
-        """根據事件類型獲取日誌條目"""
-        return [entry for entry in self.log_entries if entry.event_type == event_type]
-    
+        """根據事件類型獲取日誌條目，早於記憶體範圍的條目從段落讀取"""
+        entries = [self._entry_at(seq) for seq in self._by_type.get(event_type, ())]
+        boundary = self._store_boundary()
+        if boundary is None:
+            return entries
+        # 時間戳嚴格遞增，早於 boundary 的就是已移出記憶體的條目
+        older = self.store.read_by_type(event_type, end_date=boundary)
+        return [entry for entry in older if entry.timestamp < boundary] + entries
+
     def get_entries_by_emotion(self, emotion_state: str) -> List[IdolLogEntry]:
         """根據情緒狀態獲取日誌條目"""
-        return [entry for entry in self.log_entries if entry.emotion_state == emotion_state]
-    
+        return [self._entry_at(seq) for seq in self._by_emotion.get(emotion_state, ())]
+
     def get_entries_by_date_range(self, start_date: datetime, end_date: datetime) -> List[IdolLogEntry]:
-        """根據日期範圍獲取日誌條目"""
-        return [
-            entry for entry in self.log_entries
-            if start_date <= entry.timestamp <= end_date
-        ]
-    
+        """根據日期範圍獲取日誌條目，早於記憶體範圍的條目從段落讀取"""
+        # 條目按寫入時間排序，以二分搜尋定位範圍
+        timestamps = _TimestampView(self)
+        lo = bisect_left(timestamps, start_date)
+        hi = bisect_right(timestamps, end_date)
+        first = self._first_seq
+        entries = [self._entry_at(first + i) for i in range(lo, hi)]
+        boundary = self._store_boundary()
+        if boundary is None or start_date >= boundary:
+            return entries
+        older = self.store.read_range(start_date, min(end_date, boundary))
+        return [entry for entry in older if entry.timestamp < boundary] + entries
+
     def clear_log(self) -> None:
-        """清空日誌"""
-        self.log_entries.clear()
-        logger.info("清空偶像日誌") 
\ No newline at end of file
+        """清空日誌，包含持久化的段落"""
+        self._reset()
+        if self.store is not None:
+            self.store.clear()
+        logger.info("清空偶像日誌")
@@ -0,0 +1,339 @@
+from bisect import bisect_right
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional, Tuple
+from pydantic import BaseModel
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+import zlib
+
+from .idol_log import IdolLogEntry
+
+logger = logging.getLogger(__name__)
+
+# length, crc32, timestamp (µs), event_type len, emotion_state len, description len, additional_data len
+RECORD_HEADER = struct.Struct("<IIqHHII")
+# timestamp (µs), byte offset of the record inside the segment
+INDEX_ENTRY = struct.Struct("<qQ")
+EPOCH = datetime(1970, 1, 1)
+
+def _to_micros(ts: datetime) -> int:
+    return (ts.replace(tzinfo=None) - EPOCH) // timedelta(microseconds=1)
+
+def _from_micros(us: int) -> datetime:
+    return EPOCH + timedelta(microseconds=us)
+
+def encode_entry(entry: IdolLogEntry) -> bytes:
+    """將日誌條目編碼為緊湊的二進位紀錄"""
+    event_type = entry.event_type.encode("utf-8")
+    emotion_state = entry.emotion_state.encode("utf-8")
+    description = entry.description.encode("utf-8")
+    data = b"" if entry.additional_data is None else json.dumps(
+        entry.additional_data, ensure_ascii=False, separators=(",", ":"), default=str
+    ).encode("utf-8")
+    body = event_type + emotion_state + description + data
+    fields = (_to_micros(entry.timestamp), len(event_type), len(emotion_state), len(description), len(data))
+    crc = zlib.crc32(struct.pack("<qHHII", *fields) + body)
+    return RECORD_HEADER.pack(RECORD_HEADER.size + len(body), crc, *fields) + body
+
+class SegmentLogConfig(BaseModel):
+    directory: str
+    segment_bytes: int = 8 * 1024 * 1024
+    # 每隔多少筆紀錄寫一個時間索引點
+    index_interval: int = 64
+    # 依段落數量與時間保留，超出時整段刪除
+    max_segments: Optional[int] = None
+    retention_seconds: Optional[float] = None
+    # 除了開啟與換段時，寫入時每隔多久再檢查一次保留策略（流量低、久久才換段時也會清除舊段落）
+    retention_check_seconds: float = 300.0
+    # 每次寫入後 fsync，確保斷電不遺失
+    fsync: bool = False
+
+class _Segment:
+    def __init__(self, directory: str, number: int):
+        self.number = number
+        self.log_path = os.path.join(directory, f"{number:020d}.log")
+        self.index_path = os.path.join(directory, f"{number:020d}.idx")
+        self.index: List[Tuple[int, int]] = []
+
+    @property
+    def first_micros(self) -> Optional[int]:
+        return self.index[0][0] if self.index else None
+
+    def size(self) -> int:
+        try:
+            return os.path.getsize(self.log_path)
+        except FileNotFoundError:
+            return 0
+
+    def load_index(self) -> None:
+        with open(self.index_path, "rb") as f:
+            data = f.read()
+        usable = len(data) - len(data) % INDEX_ENTRY.size
+        self.index = [INDEX_ENTRY.unpack_from(data, pos) for pos in range(0, usable, INDEX_ENTRY.size)]
+
+class SegmentLogStore:
+    """IdolLog 的持久化後端：只追加的滾動段落檔案
+
+    每個段落是一個 ``.log`` 檔（連續的二進位紀錄）加上一個 ``.idx`` 稀疏時間
+    索引。查詢透過 mmap 讀取段落，只解碼需要的紀錄；保留策略以整個段落為
+    單位刪除，在開啟、換段以及每隔 retention_check_seconds 的寫入時執行。
+    """
+
+    def __init__(self, config: SegmentLogConfig):
+        self.config = config
+        os.makedirs(config.directory, exist_ok=True)
+        self._segments: List[_Segment] = []
+        self._log_file = None
+        self._index_file = None
+        self._records_in_segment = 0
+        self._retention_checked = 0.0
+        self._open()
+        logger.info("開啟日誌段落儲存: %s (%d 個段落)", config.directory, len(self._segments))
+        self.apply_retention()
+
+    # --- 寫入 ---
+
+    def append(self, entry: IdolLogEntry) -> None:
+        """追加一筆紀錄"""
+        # 追加模式下 tell() 含尚未寫出的緩衝，等於段落的邏輯大小
+        if self._records_in_segment and self._log_file.tell() >= self.config.segment_bytes:
+            self._roll()
+        active = self._segments[-1]
+        record = encode_entry(entry)
+        offset = self._log_file.tell()
+        self._log_file.write(record)
+        if self._records_in_segment % self.config.index_interval == 0:
+            point = (_to_micros(entry.timestamp), offset)
+            active.index.append(point)
+            self._index_file.write(INDEX_ENTRY.pack(*point))
+        self._records_in_segment += 1
+        if self.config.fsync:
+            self.flush(sync=True)
+        if time.monotonic() - self._retention_checked >= self.config.retention_check_seconds:
+            self.apply_retention()
+
+    def flush(self, sync: bool = False) -> None:
+        """把緩衝區寫入檔案；sync=True 時再做 fsync"""
+        self._log_file.flush()
+        self._index_file.flush()
+        if sync:
+            os.fsync(self._log_file.fileno())
+            os.fsync(self._index_file.fileno())
+
+    def close(self) -> None:
+        if self._log_file is not None:
+            self.flush()
+            self._log_file.close()
+            self._index_file.close()
+            self._log_file = self._index_file = None
+
+    def clear(self) -> None:
+        """刪除所有段落，從新的空段落重新開始"""
+        self.close()
+        for segment in self._segments:
+            for path in (segment.log_path, segment.index_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        self._segments = [_Segment(self.config.directory, self._segments[-1].number + 1)]
+        self._open_active()
+        logger.info("清空日誌段落儲存: %s", self.config.directory)
+
+    def apply_retention(self, now: Optional[datetime] = None) -> int:
+        """依保留策略刪除最舊的整個段落，回傳刪除的段落數"""
+        self._retention_checked = time.monotonic()
+        removed = 0
+        cutoff = None
+        if self.config.retention_seconds is not None:
+            cutoff = _to_micros((now or datetime.now()) - timedelta(seconds=self.config.retention_seconds))
+        # 作用中的段落永遠保留
+        while len(self._segments) > 1:
+            too_many = self.config.max_segments is not None and len(self._segments) > self.config.max_segments
+            # 下一段的第一筆早於 cutoff，代表最舊段落的所有紀錄都已過期
+            next_first = self._segments[1].first_micros
+            expired = cutoff is not None and next_first is not None and next_first < cutoff
+            if not (too_many or expired):
+                break
+            segment = self._segments.pop(0)
+            for path in (segment.log_path, segment.index_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            removed += 1
+        if removed:
+            logger.info("依保留策略刪除 %d 個日誌段落", removed)
+        return removed
+
+    # --- 查詢 ---
+
+    def read_range(self, start_date: datetime, end_date: datetime) -> List[IdolLogEntry]:
+        """讀取時間範圍內的紀錄"""
+        self.flush()
+        start, end = _to_micros(start_date), _to_micros(end_date)
+        results = []
+        for i, segment in enumerate(self._segments):
+            if segment.first_micros is None or segment.first_micros > end:
+                continue
+            next_first = self._segments[i + 1].first_micros if i + 1 < len(self._segments) else None
+            if next_first is not None and next_first < start:
+                continue
+            # 從最後一個時間早於 start 的索引點開始掃描
+            pos = bisect_right(segment.index, (start, -1)) - 1
+            with self._mapped(segment) as mm:
+                for micros, offset, _ in self._records(mm, segment.index[max(pos, 0)][1]):
+                    if micros > end:
+                        break
+                    if micros >= start:
+                        results.append(self._decode(mm, offset))
+        return results
+
+    def read_by_type(
+        self,
+        event_type: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> List[IdolLogEntry]:
+        """讀取某事件類型的紀錄，可選擇限定時間範圍"""
+        self.flush()
+        wanted = event_type.encode("utf-8")
+        start = _to_micros(start_date) if start_date else None
+        end = _to_micros(end_date) if end_date else None
+        results = []
+        for segment in self._segments:
+            with self._mapped(segment) as mm:
+                for micros, offset, _ in self._records(mm, 0):
+                    if end is not None and micros > end:
+                        break
+                    if start is not None and micros < start:
+                        continue
+                    # 只比對事件類型欄位，不符合的紀錄不需要解碼
+                    type_len = struct.unpack_from("<H", mm, offset + 16)[0]
+                    body = offset + RECORD_HEADER.size
+                    if type_len == len(wanted) and mm[body:body + type_len] == wanted:
+                        results.append(self._decode(mm, offset))
+        return results
+
+    def read_recent(self, limit: int) -> List[IdolLogEntry]:
+        """讀取最近 limit 筆紀錄（依時間排序），用於重啟後回填記憶體日誌"""
+        self.flush()
+        results: List[IdolLogEntry] = []
+        for segment in reversed(self._segments):
+            need = limit - len(results)
+            if need <= 0:
+                break
+            with self._mapped(segment) as mm:
+                offsets = [offset for _, offset, _ in self._records(mm, 0)]
+                results = [self._decode(mm, offset) for offset in offsets[-need:]] + results
+        return results
+
+    def __iter__(self) -> Iterator[IdolLogEntry]:
+        self.flush()
+        for segment in list(self._segments):
+            with self._mapped(segment) as mm:
+                for _, offset, _ in self._records(mm, 0):
+                    yield self._decode(mm, offset)
+
+    # --- 內部實作 ---
+
+    def _open(self) -> None:
+        numbers = sorted(
+            int(name[:-4]) for name in os.listdir(self.config.directory)
+            if name.endswith(".log") and name[:-4].isdigit()
+        )
+        for number in numbers:
+            segment = _Segment(self.config.directory, number)
+            if os.path.exists(segment.index_path) and number != numbers[-1]:
+                segment.load_index()
+            else:
+                self._rebuild_index(segment)
+            self._segments.append(segment)
+        if not self._segments:
+            self._segments.append(_Segment(self.config.directory, 0))
+        self._open_active()
+
+    def _open_active(self) -> None:
+        active = self._segments[-1]
+        self._log_file = open(active.log_path, "ab")
+        self._index_file = open(active.index_path, "ab")
+        with self._mapped(active) as mm:
+            self._records_in_segment = sum(1 for _ in self._records(mm, 0))
+
+    def _roll(self) -> None:
+        self.close()
+        self._segments.append(_Segment(self.config.directory, self._segments[-1].number + 1))
+        self._open_active()
+        self.apply_retention()
+
+    def _rebuild_index(self, segment: _Segment) -> None:
+        """掃描段落重建時間索引，並截斷寫入一半的尾端紀錄"""
+        segment.index = []
+        valid_end = 0
+        with self._mapped(segment) as mm:
+            for count, (micros, offset, length) in enumerate(self._records(mm, 0, verify=True)):
+                if count % self.config.index_interval == 0:
+                    segment.index.append((micros, offset))
+                valid_end = offset + length
+        if segment.size() > valid_end:
+            logger.warning("段落 %s 尾端有不完整紀錄，截斷至 %d 位元組", segment.log_path, valid_end)
+            with open(segment.log_path, "r+b") as f:
+                f.truncate(valid_end)
+        with open(segment.index_path, "wb") as f:
+            for point in segment.index:
+                f.write(INDEX_ENTRY.pack(*point))
+
+    @staticmethod
+    @contextmanager
+    def _mapped(segment: _Segment) -> Iterator[Optional[mmap.mmap]]:
+        """以唯讀 mmap 開啟段落；檔案不存在或為空時產生 None"""
+        try:
+            f = open(segment.log_path, "rb")
+        except FileNotFoundError:
+            yield None
+            return
+        with f:
+            if os.fstat(f.fileno()).st_size == 0:
+                yield None
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                yield mm
+
+    @staticmethod
+    def _records(mm: Optional[mmap.mmap], offset: int, verify: bool = False) -> Iterator[Tuple[int, int, int]]:
+        """依序走訪紀錄，產生 (時間戳 µs, 紀錄位移, 紀錄長度)"""
+        if mm is None:
+            return
+        size = len(mm)
+        while offset + RECORD_HEADER.size <= size:
+            length, crc, micros = struct.unpack_from("<IIq", mm, offset)
+            if length < RECORD_HEADER.size or offset + length > size:
+                break
+            if verify and zlib.crc32(mm[offset + 8:offset + length]) != crc:
+                break
+            yield micros, offset, length
+            offset += length
+
+    @staticmethod
+    def _decode(mm: mmap.mmap, offset: int) -> IdolLogEntry:
+        _, _, micros, type_len, emotion_len, desc_len, data_len = RECORD_HEADER.unpack_from(mm, offset)
+        pos = offset + RECORD_HEADER.size
+        event_type = mm[pos:pos + type_len].decode("utf-8")
+        pos += type_len
+        emotion_state = mm[pos:pos + emotion_len].decode("utf-8")
+        pos += emotion_len
+        description = mm[pos:pos + desc_len].decode("utf-8")
+        pos += desc_len
+        additional_data = json.loads(mm[pos:pos + data_len].decode("utf-8")) if data_len else None
+        return IdolLogEntry(
+            timestamp=_from_micros(micros),
+            event_type=event_type,
+            description=description,
+            emotion_state=emotion_state,
+            additional_data=additional_data
+        )
@@ -1,47 +1,94 @@
-from typing import Dict, List, Optional
+from contextlib import nullcontext
+from typing import AsyncIterator, Dict, List, Optional
 from enum import Enum
 from pydantic import BaseModel
-import google.generativeai as genai
 import os
-from dotenv import load_dotenv
+import time
 import logging
 
-logger = logging.getLogger(__name__)
+from .admission import AdmissionConfig, AdmissionController, LLMOverloadedError
+from .backends import GeminiBackend, LLMBackend, StubBackend, create_backend, register_backend
+from .cache import ResponseCache, ResponseCacheConfig
+from .context import ContextBuilder, ContextConfig, estimate_tokens
+from .singleflight import SingleFlight
+from .stub import StubConfig
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
 class LLMProvider(Enum):
     GEMINI = "gemini"
     OPENAI = "openai"
+    STUB = "stub"
 
 class LLMConfig(BaseModel):
     provider: LLMProvider
-    api_key: str
+    api_key: Optional[str] = None
     model_name: str
     temperature: float = 0.7
     max_tokens: int = 1000
+    cache: Optional[ResponseCacheConfig] = None
+    # Share one provider call between concurrent requests with the same prompt
+    coalesce_requests: bool = True
+    admission: Optional[AdmissionConfig] = None
+    # Simulated latency / errors / capacity for the STUB provider
+    stub: Optional[StubConfig] = None
+    # Render memory lists compactly within a token budget
+    context: Optional[ContextConfig] = None
+    # Create the provider client in warm_up() (or on first use) instead of the constructor
+    lazy_init: bool = False
+
+register_backend(LLMProvider.GEMINI, GeminiBackend)
+register_backend(LLMProvider.STUB, StubBackend)
 
 class LLMService:
-    def __init__(self, config: LLMConfig):
+    def __init__(self, config: LLMConfig, backend: Optional[LLMBackend] = None, metrics=None):
         self.config = config
-        self._setup_provider()
+        # Optional core.metrics.PipelineMetrics: prompt / provider latency and token counts
+        self.metrics = metrics
+        self.cache = ResponseCache(config.cache) if config.cache else None
+        self.single_flight = SingleFlight() if config.coalesce_requests else None
+        self.admission = AdmissionController(config.admission) if config.admission else None
+        self.context_builder = ContextBuilder(config.context) if config.context else None
+        self._backend = backend
+        if self._backend is None and not config.lazy_init:
+            self.warm_up()
     
-    def _setup_provider(self) -> None:
-        """Initialize the LLM provider based on configuration."""
-        if self.config.provider == LLMProvider.GEMINI:
-            try:
-                logger.info(f"初始化 Gemini API，使用模型: {self.config.model_name}")
-                genai.configure(api_key=self.config.api_key)
-                self.model = genai.GenerativeModel(
-                    model_name=self.config.model_name
-                )
-                logger.info("Gemini API 初始化成功")
-            except Exception as e:
-                logger.error(f"初始化 Gemini API 時發生錯誤: {str(e)}")
-                raise
-        elif self.config.provider == LLMProvider.OPENAI:
-            # TODO: Implement OpenAI integration
-            pass
+    @property
+    def backend(self) -> LLMBackend:
+        if self._backend is None:
+            self.warm_up()
+        return self._backend
+    
+    def warm_up(self) -> None:
+        """Create the provider client now; blocking (SDK import), so run it off the event loop."""
+        if self._backend is not None:
+            return
+        try:
+            self._backend = create_backend(self.config)
+        except Exception as e:
+            logger.error("初始化 LLM 提供者時發生錯誤: %s", e)
+            raise
+    
+    @property
+    def model(self):
+        """The provider's model object, for backends that wrap one."""
+        return getattr(self.backend, "model", None)
+    
+    def _admitted(self):
+        return self.admission.slot() if self.admission is not None else nullcontext()
+    
+    def _cache_key(self, prompt: str, context, style) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return self.cache.make_key(prompt, context, style, {
+            "model": self.config.model_name,
+            "temperature": self.config.temperature,
+            "max_tokens": self.config.max_tokens,
+        })
+    
+    async def _cache_put(self, key: Optional[str], response: str, started: float) -> None:
+        if key is not None:
+            await self.cache.put(key, response, time.perf_counter() - started, deterministic=self.config.temperature == 0)
     
     async def generate_response(
         self,
@@ -50,31 +97,112 @@ class LLMService:
         style: Optional[Dict] = None
     ) -> str:
         """Generate a response using the configured LLM provider."""
-        if self.config.provider == LLMProvider.GEMINI:
+        try:
+            cache_key = self._cache_key(prompt, context, style)
+            if cache_key is not None:
+                cached = await self.cache.get(cache_key)
+                if cached is not None:
+                    logger.info("使用快取回應")
+                    return cached
+            
+            logger.info("開始生成回應...")
+            started = time.perf_counter()
+            formatted_prompt = self.format_prompt(prompt, context, style)
+            if self.metrics is not None:
+                self.metrics.observe("format_prompt", started)
+            logger.debug("格式化後的提示詞: %s", formatted_prompt)
+            
+            if self.single_flight is None:
+                return await self._generate(formatted_prompt, cache_key)
+            return await self.single_flight.do(
+                formatted_prompt,
+                lambda: self._generate(formatted_prompt, cache_key)
+            )
+        except LLMOverloadedError:
+            logger.warning("LLM 請求過多，拒絕處理")
+            raise
+        except Exception as e:
+            logger.error("生成回應時發生錯誤: %s", e)
+            raise Exception(f"Error generating response: {str(e)}")
+    
+    async def complete(self, prompt: str) -> str:
+        """Send a raw prompt to the provider (no persona, context or cache), under admission control."""
+        return await self._generate(prompt, None)
+    
+    async def _generate(self, formatted_prompt: str, cache_key: Optional[str]) -> str:
+        """One provider call; shared by every request coalesced onto it."""
+        async with self._admitted():
+            started = time.perf_counter()
             try:
-                logger.info("開始生成回應...")
-                formatted_prompt = self.format_prompt(prompt, context, style)
-                logger.debug(f"格式化後的提示詞: {formatted_prompt}")
-                
-                response = await self.model.generate_content_async(
-                    formatted_prompt,
-                    generation_config=genai.types.GenerationConfig(
-                        temperature=self.config.temperature,
-                        max_output_tokens=self.config.max_tokens,
-                    )
-                )
-                
-                if not response.text:
-                    raise Exception("回應為空")
-                
-                logger.info("回應生成成功")
-                return response.text
-            except Exception as e:
-                logger.error(f"生成回應時發生錯誤: {str(e)}")
-                raise Exception(f"Error generating response: {str(e)}")
-        elif self.config.provider == LLMProvider.OPENAI:
-            # TODO: Implement OpenAI response generation
-            pass
+                text = await self.backend.generate(formatted_prompt)
+            except Exception:
+                self._record_call("error", formatted_prompt, "", started)
+                raise
+        
+        self._record_call("ok", formatted_prompt, text, started)
+        if not text:
+            raise Exception("回應為空")
+        
+        logger.info("回應生成成功")
+        await self._cache_put(cache_key, text, started)
+        return text
+    
+    async def generate_response_stream(
+        self,
+        prompt: str,
+        context: Optional[Dict] = None,
+        style: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        """Yield the response text chunk by chunk as the provider produces it."""
+        try:
+            cache_key = self._cache_key(prompt, context, style)
+            if cache_key is not None:
+                cached = await self.cache.get(cache_key)
+                if cached is not None:
+                    logger.info("使用快取回應")
+                    yield cached
+                    return
+            
+            logger.info("開始串流生成回應...")
+            started = time.perf_counter()
+            formatted_prompt = self.format_prompt(prompt, context, style)
+            if self.metrics is not None:
+                self.metrics.observe("format_prompt", started)
+            logger.debug("格式化後的提示詞: %s", formatted_prompt)
+            
+            chunks: List[str] = []
+            # The slot is held until the provider has sent the last chunk
+            async with self._admitted():
+                started = time.perf_counter()
+                try:
+                    async for text in self.backend.stream(formatted_prompt):
+                        if not chunks and self.metrics is not None:
+                            self.metrics.observe("llm_first_chunk", started)
+                        chunks.append(text)
+                        yield text
+                except Exception:
+                    self._record_call("error", formatted_prompt, "".join(chunks), started)
+                    raise
+            
+            self._record_call("ok", formatted_prompt, "".join(chunks), started)
+            if not chunks:
+                raise Exception("回應為空")
+            logger.info("串流回應完成")
+            await self._cache_put(cache_key, "".join(chunks), started)
+        except LLMOverloadedError:
+            logger.warning("LLM 請求過多，拒絕處理")
+            raise
+        except Exception as e:
+            logger.error("串流生成回應時發生錯誤: %s", e)
+            raise Exception(f"Error generating response: {str(e)}")
+    
+    def _record_call(self, outcome: str, prompt: str, reply: str, started: float) -> None:
+        if self.metrics is None:
+            return
+        self.metrics.observe("llm", started)
+        self.metrics.llm_calls.labels(outcome).inc()
+        self.metrics.tokens_in.inc(estimate_tokens(prompt))
+        self.metrics.tokens_out.inc(estimate_tokens(reply))
     
     def format_prompt(
         self,
@@ -86,7 +214,16 @@ class LLMService:
         prompt_parts = []
         
         if context:
-            prompt_parts.append(f"Context: {context}")
+            if self.context_builder is not None and isinstance(context, list):
+                built = self.context_builder.build(context, user_message)
+                logger.debug(
+                    "上下文: %d 筆記憶 / %d tokens，捨棄 %d 筆 / %d tokens，重複 %d 筆",
+                    built.items, built.tokens, built.dropped_items, built.dropped_tokens, built.duplicates
+                )
+                if built.text:
+                    prompt_parts.append(f"Context:\n{built.text}")
+            else:
+                prompt_parts.append(f"Context: {context}")
         
         if style:
             prompt_parts.append(f"Style: {style}")
@@ -0,0 +1,190 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional
+from pydantic import BaseModel
+
+class AdmissionConfig(BaseModel):
+    # Token bucket for provider calls; None disables rate limiting
+    rate_per_second: Optional[float] = None
+    burst: int = 10
+    max_in_flight: int = 16
+    # Requests waiting for a slot beyond this are rejected immediately
+    max_queue: int = 256
+    # Longest a request may wait (for a token and a slot) before it is rejected
+    queue_timeout: float = 10.0
+
+class LLMOverloadedError(Exception):
+    """Raised when a request is not admitted; ``retry_after`` is in seconds."""
+
+    RATE_LIMITED = "rate_limited"
+    QUEUE_FULL = "queue_full"
+    TIMEOUT = "timeout"
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"LLM overloaded ({reason}), retry after {retry_after:.1f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._tokens = float(burst)
+        self._updated = clock()
+
+    def delay(self) -> float:
+        """Seconds until a token is available, without taking it."""
+        self._refill()
+        return max(0.0, (1 - self._tokens) / self.rate)
+
+    def reserve(self, max_wait: float) -> Optional[float]:
+        """Take a token, returning how long to wait for it; None if that exceeds max_wait."""
+        delay = self.delay()
+        if delay > max_wait:
+            return None
+        # Going negative reserves a future token, so waiters are served in order
+        self._tokens -= 1
+        return delay
+
+    def refund(self) -> None:
+        """Give back a token taken by reserve() for a call that was never made."""
+        self._refill()
+        self._tokens = min(self.burst, self._tokens + 1)
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+class AdmissionController:
+    """Bounds provider calls: rate limit, max in flight and a bounded FIFO queue.
+
+    A request first takes a token from the bucket (waiting if it will be
+    available before its deadline), then a slot. Slots are handed to queued
+    requests in arrival order. Requests that cannot be admitted in time fail
+    fast with LLMOverloadedError carrying a Retry-After estimate, and give
+    their token back: only calls that reach the provider count against the rate.
+    """
+
+    def __init__(self, config: AdmissionConfig, clock=time.monotonic):
+        self.config = config
+        self._clock = clock
+        self._bucket = TokenBucket(config.rate_per_second, config.burst, clock) if config.rate_per_second else None
+        self._in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        # Moving average of how long a slot is held, for Retry-After estimates
+        self._service_time = 1.0
+        self._waits: Deque[float] = deque(maxlen=1024)
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {
+            LLMOverloadedError.RATE_LIMITED: 0,
+            LLMOverloadedError.QUEUE_FULL: 0,
+            LLMOverloadedError.TIMEOUT: 0,
+        }
+        self.max_queue_depth = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def check(self) -> None:
+        """Reject right away if a new request could not be admitted in time."""
+        if self._in_flight >= self.config.max_in_flight and len(self._waiters) >= self.config.max_queue:
+            self._reject(LLMOverloadedError.QUEUE_FULL, self._queue_retry_after())
+        if self._bucket is not None:
+            delay = self._bucket.delay()
+            if delay > self.config.queue_timeout:
+                self._reject(LLMOverloadedError.RATE_LIMITED, delay)
+
+    @asynccontextmanager
+    async def slot(self, timeout: Optional[float] = None) -> AsyncIterator[None]:
+        """Hold an admission slot for the duration of the block."""
+        await self.acquire(timeout)
+        started = self._clock()
+        try:
+            yield
+        finally:
+            self._service_time = 0.8 * self._service_time + 0.2 * (self._clock() - started)
+            self.release()
+
+    async def acquire(self, timeout: Optional[float] = None) -> None:
+        arrived = self._clock()
+        deadline = arrived + (self.config.queue_timeout if timeout is None else timeout)
+        if self._bucket is not None:
+            delay = self._bucket.reserve(deadline - arrived)
+            if delay is None:
+                self._reject(LLMOverloadedError.RATE_LIMITED, self._bucket.delay())
+        try:
+            if self._bucket is not None and delay > 0:
+                await asyncio.sleep(delay)
+            if self._in_flight < self.config.max_in_flight and not self._waiters:
+                self._in_flight += 1
+            else:
+                await self._wait_for_slot(deadline)
+        except BaseException:
+            # Rejected, timed out or cancelled before reaching the provider
+            if self._bucket is not None:
+                self._bucket.refund()
+            raise
+        self._waits.append(self._clock() - arrived)
+        self.admitted += 1
+
+    def release(self) -> None:
+        # Hand the slot straight to the oldest live waiter
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._in_flight -= 1
+
+    def stats(self) -> Dict[str, float]:
+        waits = sorted(self._waits)
+        return {
+            "in_flight": self._in_flight,
+            "queue_depth": len(self._waiters),
+            "max_queue_depth": self.max_queue_depth,
+            "admitted": self.admitted,
+            **{f"rejected_{reason}": count for reason, count in self.rejected.items()},
+            "wait_p50_seconds": waits[len(waits) // 2] if waits else 0.0,
+            "wait_p95_seconds": waits[int(len(waits) * 0.95)] if waits else 0.0,
+            "wait_max_seconds": waits[-1] if waits else 0.0,
+        }
+
+    async def _wait_for_slot(self, deadline: float) -> None:
+        if len(self._waiters) >= self.config.max_queue:
+            self._reject(LLMOverloadedError.QUEUE_FULL, self._queue_retry_after())
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.max_queue_depth = max(self.max_queue_depth, len(self._waiters))
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), max(0.0, deadline - self._clock()))
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over as we gave up; pass it on
+                self.release()
+            else:
+                waiter.cancel()
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.TimeoutError):
+                self._reject(LLMOverloadedError.TIMEOUT, self._queue_retry_after())
+            raise
+
+    def _queue_retry_after(self) -> float:
+        # Time for the current queue to drain through the available slots
+        return max(1.0, (len(self._waiters) / self.config.max_in_flight + 1) * self._service_time)
+
+    def _reject(self, reason: str, retry_after: float) -> None:
+        self.rejected[reason] += 1
+        raise LLMOverloadedError(reason, math.ceil(retry_after))
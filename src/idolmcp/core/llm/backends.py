@@ -0,0 +1,85 @@
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Dict
+import logging
+
+from .stub import StubConfig, StubModel
+
+if TYPE_CHECKING:
+    from . import LLMConfig, LLMProvider
+
+logger = logging.getLogger(__name__)
+
+class LLMBackend(ABC):
+    """Interface between LLMService and one provider.
+
+    ``generate`` returns the whole reply, ``stream`` yields it piece by
+    piece. Caching, coalescing and admission control live in LLMService,
+    so a backend only has to talk to its provider.
+    """
+
+    @abstractmethod
+    async def generate(self, prompt: str) -> str:
+        ...
+
+    @abstractmethod
+    def stream(self, prompt: str) -> AsyncIterator[str]:
+        ...
+
+class GenerativeModelBackend(LLMBackend):
+    """Backend for models with Gemini's ``generate_content_async`` API."""
+
+    def __init__(self, config: "LLMConfig", model):
+        self.config = config
+        self.model = model
+
+    def generation_config(self) -> Dict:
+        # The SDK accepts a plain dict, so the stub never needs to import it
+        return {
+            "temperature": self.config.temperature,
+            "max_output_tokens": self.config.max_tokens,
+        }
+
+    async def generate(self, prompt: str) -> str:
+        response = await self.model.generate_content_async(
+            prompt,
+            generation_config=self.generation_config()
+        )
+        return response.text
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        response = await self.model.generate_content_async(
+            prompt,
+            generation_config=self.generation_config(),
+            stream=True
+        )
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+class GeminiBackend(GenerativeModelBackend):
+    def __init__(self, config: "LLMConfig"):
+        # Imported here: the SDK takes about half a second to import
+        import google.generativeai as genai
+        logger.info("初始化 Gemini API，使用模型: %s", config.model_name)
+        genai.configure(api_key=config.api_key)
+        super().__init__(config, genai.GenerativeModel(model_name=config.model_name))
+        logger.info("Gemini API 初始化成功")
+
+class StubBackend(GenerativeModelBackend):
+    """Local provider with simulated latency, errors and capacity; see StubModel."""
+
+    def __init__(self, config: "LLMConfig"):
+        logger.info("使用離線 Stub 模型")
+        super().__init__(config, StubModel.from_config(config.stub or StubConfig()))
+
+_BACKENDS: Dict["LLMProvider", Callable[["LLMConfig"], LLMBackend]] = {}
+
+def register_backend(provider: "LLMProvider", factory: Callable[["LLMConfig"], LLMBackend]) -> None:
+    """Make ``provider`` available to LLMService, e.g. from a plugin module."""
+    _BACKENDS[provider] = factory
+
+def create_backend(config: "LLMConfig") -> LLMBackend:
+    factory = _BACKENDS.get(config.provider)
+    if factory is None:
+        raise ValueError(f"不支援的 LLM 提供者: {config.provider.value}")
+    return factory(config)
@@ -0,0 +1,219 @@
+import asyncio
+import hashlib
+import json
+import random
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel
+
+# Trailing punctuation and tildes don't change what a fan said
+_TRAILING = re.compile(r"[\s!！?？。．.,，~～…、]+$")
+_SPACES = re.compile(r"\s+")
+
+class ResponseCacheConfig(BaseModel):
+    max_entries: int = 5000
+    ttl_seconds: float = 3600.0
+    # Replies sampled per key before it is served from cache; hits then
+    # rotate through the distinct ones so repeated greetings don't sound canned
+    variants_per_key: int = 3
+    # Only messages up to this length are cached (greetings, stickers, ...)
+    max_message_chars: int = 32
+    # How many memories (most recent first) take part in the key; None keys on all
+    # of them, 0 ignores context so fans with different histories share replies
+    context_items: Optional[int] = None
+    # Optional on-disk tier shared across restarts and worker processes
+    db_path: Optional[str] = None
+
+@dataclass
+class _CachedResponse:
+    expires_at: float
+    target: int
+    samples: int = 0
+    variants: List[str] = field(default_factory=list)
+    # Average generation latency of the samples, credited on every hit
+    latency: float = 0.0
+    last_served: Optional[int] = None
+
+    def ready(self) -> bool:
+        return self.samples >= self.target
+
+class ResponseCache:
+    """LRU + TTL cache of LLM replies, with an optional SQLite tier.
+
+    Keys hash the normalized user message together with the persona style
+    (tone and mood), the content of the context memories and the generation
+    config. Memory timestamps and tags are left out, and so are memories
+    repeating the message itself, such as the one just stored for this request.
+    A key only starts producing hits once ``variants_per_key`` replies were
+    generated for it (one for deterministic configs); until then every
+    lookup is a miss and the new reply is kept as another variant.
+
+    get() and put() are coroutines because the SQLite tier runs on a worker
+    thread; memory-tier hits never leave the event loop.
+    """
+
+    def __init__(self, config: ResponseCacheConfig, clock=time.time, rng: Optional[random.Random] = None):
+        self.config = config
+        self._clock = clock
+        self._rng = rng or random.Random()
+        self._entries: "OrderedDict[str, _CachedResponse]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        # One connection shared by the worker threads
+        self._db_lock = threading.Lock()
+        if config.db_path:
+            self._db = sqlite3.connect(config.db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_response_cache ("
+                "key TEXT PRIMARY KEY, expires_at REAL NOT NULL, target INTEGER NOT NULL, "
+                "samples INTEGER NOT NULL, latency REAL NOT NULL, variants TEXT NOT NULL)"
+            )
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self.latency_saved = 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def normalize(message: str) -> str:
+        text = unicodedata.normalize("NFKC", message).casefold().strip()
+        text = _SPACES.sub(" ", text)
+        return _TRAILING.sub("", text) or text
+
+    def make_key(
+        self,
+        message: str,
+        context: Any = None,
+        style: Optional[Dict] = None,
+        generation: Optional[Dict] = None
+    ) -> Optional[str]:
+        """Cache key for a request, or None if the request should not be cached."""
+        normalized = self.normalize(message)
+        if len(normalized) > self.config.max_message_chars:
+            return None
+        payload = json.dumps(
+            [normalized, style, self._context_key(normalized, context), generation],
+            ensure_ascii=False, sort_keys=True, default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _context_key(self, normalized: str, context: Any) -> Any:
+        if self.config.context_items == 0 or not context:
+            return None
+        if not isinstance(context, list):
+            return context
+        memories = [item.get("content") if isinstance(item, dict) else item for item in context]
+        memories = [memory for memory in memories if self.normalize(str(memory)) != normalized]
+        if self.config.context_items is not None:
+            memories = memories[:self.config.context_items]
+        return memories or None
+
+    async def get(self, key: str) -> Optional[str]:
+        """Return a cached reply, or None if the caller should generate one."""
+        entry = self._entries.get(key)
+        if entry is None and self._db is not None:
+            entry = await asyncio.to_thread(self._load, key)
+            if entry is not None:
+                self.disk_hits += 1
+                self._remember(key, entry)
+        if entry is not None and entry.expires_at <= self._clock():
+            self._entries.pop(key, None)
+            if self._db is not None:
+                await asyncio.to_thread(self._execute, "DELETE FROM llm_response_cache WHERE key = ?", (key,))
+            entry = None
+        if entry is None or not entry.ready():
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        self.latency_saved += entry.latency
+        return entry.variants[self._pick(entry)]
+
+    async def put(self, key: str, response: str, latency: float, deterministic: bool = False) -> None:
+        """Record a freshly generated reply for ``key`` and how long it took."""
+        entry = self._entries.get(key)
+        if entry is None and self._db is not None:
+            entry = await asyncio.to_thread(self._load, key)
+        if entry is None or entry.expires_at <= self._clock():
+            entry = _CachedResponse(
+                expires_at=self._clock() + self.config.ttl_seconds,
+                target=1 if deterministic else max(1, self.config.variants_per_key)
+            )
+        if not entry.ready():
+            entry.latency = (entry.latency * entry.samples + latency) / (entry.samples + 1)
+            entry.samples += 1
+            if response not in entry.variants:
+                entry.variants.append(response)
+        self._remember(key, entry)
+        if self._db is not None:
+            await asyncio.to_thread(
+                self._execute,
+                "INSERT OR REPLACE INTO llm_response_cache VALUES (?, ?, ?, ?, ?, ?)",
+                (key, entry.expires_at, entry.target, entry.samples, entry.latency,
+                 json.dumps(entry.variants, ensure_ascii=False))
+            )
+
+    def clear(self) -> None:
+        self._entries.clear()
+        if self._db is not None:
+            self._execute("DELETE FROM llm_response_cache")
+
+    def close(self) -> None:
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+                self._db = None
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "disk_hits": self.disk_hits,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "latency_saved_seconds": self.latency_saved,
+        }
+
+    def _pick(self, entry: _CachedResponse) -> int:
+        # Never serve the same variant twice in a row when there is a choice
+        choices = [i for i in range(len(entry.variants)) if i != entry.last_served] or [0]
+        entry.last_served = self._rng.choice(choices)
+        return entry.last_served
+
+    def _remember(self, key: str, entry: _CachedResponse) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.config.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _execute(self, sql: str, params: tuple = ()) -> None:
+        with self._db_lock:
+            if self._db is not None:
+                self._db.execute(sql, params)
+
+    def _load(self, key: str) -> Optional[_CachedResponse]:
+        with self._db_lock:
+            if self._db is None:
+                return None
+            row = self._db.execute(
+                "SELECT expires_at, target, samples, latency, variants FROM llm_response_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return _CachedResponse(
+            expires_at=row[0], target=row[1], samples=row[2], latency=row[3], variants=json.loads(row[4])
+        )
+
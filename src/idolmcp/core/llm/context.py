@@ -0,0 +1,135 @@
+import math
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+from pydantic import BaseModel
+
+from .cache import ResponseCache
+
+# Kana, CJK ideographs, Hangul and full-width forms: roughly one token per character
+_WIDE = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯＀-￯]")
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local token estimate: one per CJK character, one per ~4 other characters."""
+    wide = len(_WIDE.findall(text))
+    return wide + math.ceil((len(text) - wide) / 4)
+
+class ContextConfig(BaseModel):
+    # Token budget for the rendered memory block
+    max_tokens: int = 600
+    # Longer memories are cut to this many characters
+    max_item_chars: int = 160
+    # Recency weight halves every this many hours
+    recency_half_life_hours: float = 72.0
+    # Weight of overlap with the current message; recency scores at most 1,
+    # so a memory sharing most of the message's bigrams beats a fresh one
+    relevance_weight: float = 2.0
+
+@dataclass
+class BuiltContext:
+    text: str
+    tokens: int
+    items: int
+    dropped_items: int
+    dropped_tokens: int
+    duplicates: int
+
+class ContextBuilder:
+    """Turns get_memories() output into a compact, token-budgeted prompt block.
+
+    Memories are deduplicated (including against the current message, which
+    /chat has just stored), scored by recency and character-bigram overlap
+    with the message, and added best-first until the budget is used. The
+    chosen ones are rendered oldest first, one short line each.
+    """
+
+    def __init__(self, config: ContextConfig):
+        self.config = config
+        self.prompts = 0
+        self.tokens_used = 0
+        self.tokens_dropped = 0
+        self.items_dropped = 0
+
+    def build(self, memories: List[Dict], message: str, now: Optional[datetime] = None) -> BuiltContext:
+        now = now or datetime.utcnow()
+        seen = {ResponseCache.normalize(message)}
+        message_grams = self._bigrams(ResponseCache.normalize(message))
+        candidates = []
+        duplicates = 0
+        for memory in memories:
+            content = str(memory.get("content") or "").strip()
+            key = ResponseCache.normalize(content)
+            if not key or key in seen:
+                duplicates += 1
+                continue
+            seen.add(key)
+            line = self._render(memory, content)
+            candidates.append((self._score(memory, key, message_grams, now), memory, line, estimate_tokens(line)))
+
+        # Best first; ties keep the newest-first order get_memories returns
+        candidates.sort(key=lambda c: -c[0])
+        chosen, used, dropped_tokens = [], 0, 0
+        for score, memory, line, tokens in candidates:
+            if used + tokens <= self.config.max_tokens:
+                chosen.append((memory, line))
+                used += tokens
+            else:
+                dropped_tokens += tokens
+        chosen.sort(key=lambda c: self._created_at(c[0]) or datetime.min)
+
+        built = BuiltContext(
+            text="\n".join(line for _, line in chosen),
+            tokens=used,
+            items=len(chosen),
+            dropped_items=len(candidates) - len(chosen),
+            dropped_tokens=dropped_tokens,
+            duplicates=duplicates
+        )
+        self.prompts += 1
+        self.tokens_used += built.tokens
+        self.tokens_dropped += built.dropped_tokens
+        self.items_dropped += built.dropped_items
+        return built
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "prompts": self.prompts,
+            "tokens_used": self.tokens_used,
+            "tokens_dropped": self.tokens_dropped,
+            "items_dropped": self.items_dropped,
+        }
+
+    def _render(self, memory: Dict, content: str) -> str:
+        if len(content) > self.config.max_item_chars:
+            content = content[:self.config.max_item_chars - 1] + "…"
+        created_at = self._created_at(memory)
+        return f"- {created_at:%m/%d %H:%M} {content}" if created_at else f"- {content}"
+
+    def _score(self, memory: Dict, key: str, message_grams: Set[str], now: datetime) -> float:
+        created_at = self._created_at(memory)
+        recency = 0.0
+        if created_at is not None:
+            age_hours = max((now - created_at).total_seconds(), 0.0) / 3600
+            recency = 0.5 ** (age_hours / self.config.recency_half_life_hours)
+        relevance = 0.0
+        if message_grams:
+            relevance = len(message_grams & self._bigrams(key)) / len(message_grams)
+        return recency + self.config.relevance_weight * relevance
+
+    @staticmethod
+    def _created_at(memory: Dict) -> Optional[datetime]:
+        created_at = memory.get("created_at")
+        if isinstance(created_at, str):
+            try:
+                return datetime.fromisoformat(created_at)
+            except ValueError:
+                return None
+        return created_at
+
+    @staticmethod
+    def _bigrams(text: str) -> Set[str]:
+        text = text.replace(" ", "")
+        if len(text) < 2:
+            return {text} if text else set()
+        return {text[i:i + 2] for i in range(len(text) - 1)}
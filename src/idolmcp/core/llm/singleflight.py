@@ -0,0 +1,67 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one in-flight task.
+
+    The first caller for a key starts the work; callers arriving while it
+    runs await the same task. Each caller awaits it through ``asyncio.shield``
+    so cancelling one caller (e.g. a fan disconnecting) does not cancel the
+    shared work; the task is only cancelled once every caller has left. An
+    exception raised by the work is delivered to every caller.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self.calls = 0
+        self.executions = 0
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+        """Return the result of ``factory()``, sharing it with concurrent callers of ``key``."""
+        self.calls += 1
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(factory()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda task: self._finished(key, call))
+            self.executions += 1
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Nobody is waiting any more: stop the work, and let the next
+                # caller for this key start fresh instead of joining it
+                self._forget(key, call)
+                call.task.cancel()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "dedup_ratio": 1 - self.executions / self.calls if self.calls else 0.0,
+            "in_flight": len(self._calls),
+        }
+
+    def _finished(self, key: Hashable, call: _Call) -> None:
+        self._forget(key, call)
+        # Mark the exception retrieved in case every caller was cancelled first
+        if not call.task.cancelled():
+            call.task.exception()
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
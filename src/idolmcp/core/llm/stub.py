@@ -0,0 +1,158 @@
+import asyncio
+import math
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager, nullcontext
+from enum import Enum
+from typing import AsyncIterator, Deque, List, Optional
+from pydantic import BaseModel
+
+class LatencyDistribution(Enum):
+    FIXED = "fixed"
+    # first_token_delay * (1 ± jitter)
+    UNIFORM = "uniform"
+    # median first_token_delay, sigma = jitter (long right tail, like real APIs)
+    LOGNORMAL = "lognormal"
+    # mean first_token_delay
+    EXPONENTIAL = "exponential"
+
+class StubConfig(BaseModel):
+    reply: Optional[str] = None
+    first_token_delay: float = 0.2
+    distribution: LatencyDistribution = LatencyDistribution.FIXED
+    jitter: float = 0.0
+    chunk_delay: float = 0.02
+    chunk_size: int = 4
+    # Fraction of requests that fail like a provider outage would
+    error_rate: float = 0.0
+    # Provider-side capacity: requests beyond this wait, as on a saturated API
+    max_concurrency: Optional[int] = None
+    # Provider quota: requests beyond this per second fail with StubQuotaError
+    requests_per_second: Optional[float] = None
+    seed: Optional[int] = None
+
+class StubError(Exception):
+    pass
+
+class StubQuotaError(StubError):
+    pass
+
+class StubChunk:
+    def __init__(self, text: str):
+        self.text = text
+
+class StubResponse:
+    """Mimics the parts of Gemini's response object that LLMService uses.
+
+    A streamed response (``model`` set) takes the model's capacity when it is
+    read and gives it back after the last chunk or when the reader closes it,
+    so a stream that is never read, or dropped part way, holds nothing.
+    """
+
+    def __init__(self, chunks: List[str], chunk_delay: float, model: Optional["StubModel"] = None):
+        self._chunks = chunks
+        self._chunk_delay = chunk_delay
+        self._model = model
+        self.text = "".join(chunks)
+
+    async def __aiter__(self) -> AsyncIterator[StubChunk]:
+        async with self._model._slot() if self._model is not None else nullcontext():
+            if self._model is not None:
+                await self._model._first_token()
+            for chunk in self._chunks:
+                await asyncio.sleep(self._chunk_delay)
+                yield StubChunk(chunk)
+
+class StubModel:
+    """Offline stand-in for ``genai.GenerativeModel``.
+
+    Replies with a canned sentence that echoes the user's message, after a
+    first-token delay drawn from ``distribution`` and then one chunk every
+    ``chunk_delay`` seconds. Optionally fails a fraction of requests, caps
+    concurrent requests and enforces a requests-per-second quota, so the
+    whole pipeline can be load tested without a provider.
+    """
+
+    def __init__(
+        self,
+        reply: Optional[str] = None,
+        first_token_delay: float = 0.2,
+        chunk_delay: float = 0.02,
+        chunk_size: int = 4,
+        distribution: LatencyDistribution = LatencyDistribution.FIXED,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        max_concurrency: Optional[int] = None,
+        requests_per_second: Optional[float] = None,
+        seed: Optional[int] = None
+    ):
+        self.reply = reply
+        self.first_token_delay = first_token_delay
+        self.chunk_delay = chunk_delay
+        self.chunk_size = chunk_size
+        self.distribution = distribution
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests_per_second = requests_per_second
+        self._rng = random.Random(seed)
+        self._capacity = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        self._recent: Deque[float] = deque()
+        self.requests = 0
+
+    @classmethod
+    def from_config(cls, config: StubConfig) -> "StubModel":
+        return cls(**config.model_dump())
+
+    async def generate_content_async(self, prompt: str, generation_config=None, stream: bool = False) -> StubResponse:
+        self.requests += 1
+        self._check_quota()
+        text = self.reply or f"本小姐收到囉～「{self._user_message(prompt)}」"
+        chunks = [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)]
+        if stream:
+            # A streamed request occupies provider capacity while it is read, until its last chunk
+            return StubResponse(chunks, self.chunk_delay, self)
+        async with self._slot():
+            await self._first_token()
+            await asyncio.sleep(self.chunk_delay * max(len(chunks) - 1, 0))
+        return StubResponse(chunks, 0.0)
+
+    @asynccontextmanager
+    async def _slot(self):
+        if self._capacity is None:
+            yield
+            return
+        async with self._capacity:
+            yield
+
+    async def _first_token(self) -> None:
+        await asyncio.sleep(self._first_token_delay())
+        if self.error_rate and self._rng.random() < self.error_rate:
+            raise StubError("simulated provider error")
+
+    def _first_token_delay(self) -> float:
+        delay = self.first_token_delay
+        if delay <= 0 or self.distribution == LatencyDistribution.FIXED:
+            return max(delay, 0.0)
+        if self.distribution == LatencyDistribution.UNIFORM:
+            return delay * self._rng.uniform(1 - self.jitter, 1 + self.jitter)
+        if self.distribution == LatencyDistribution.LOGNORMAL:
+            return self._rng.lognormvariate(math.log(delay), self.jitter)
+        return self._rng.expovariate(1 / delay)
+
+    def _check_quota(self) -> None:
+        if not self.requests_per_second:
+            return
+        now = time.monotonic()
+        while self._recent and self._recent[0] <= now - 1:
+            self._recent.popleft()
+        if len(self._recent) >= self.requests_per_second:
+            raise StubQuotaError("simulated quota exceeded")
+        self._recent.append(now)
+
+    @staticmethod
+    def _user_message(prompt: str) -> str:
+        for line in reversed(prompt.splitlines()):
+            if line.startswith("User: "):
+                return line[len("User: "):]
+        return prompt
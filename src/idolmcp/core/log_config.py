@@ -0,0 +1,190 @@
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import uuid
+import zlib
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+from pydantic import BaseModel
+
+# ID of the request being handled; set by RequestIdMiddleware, read by every log record
+request_id: ContextVar[str] = ContextVar("request_id", default="-")
+
+class LoggingConfig(BaseModel):
+    level: str = "INFO"
+    # One JSON object per line instead of plain text
+    json_format: bool = False
+    # Format and write records on a background thread instead of the caller's
+    background: bool = True
+    # Records waiting for the background thread; further records are dropped, never waited for
+    queue_size: int = 10000
+    # Share of INFO/DEBUG records kept per logger name (and its children); WARNING and up are always kept
+    sample_rates: Dict[str, float] = {}
+    # Skip the caller / thread / process lookups on every record; neither format prints them,
+    # but the switches are process-wide, so other handlers lose those fields too
+    lean_records: bool = False
+
+class RequestIdFilter(logging.Filter):
+    """Stamps each record with the current request ID; runs in the logging thread, before any queue."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        return True
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fixed share of INFO/DEBUG records from the configured loggers.
+
+    The decision hashes the request ID, so a sampled request keeps all of its
+    lines across persona/emotion/memory/llm and a dropped one loses all of them.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        # Longest prefix first, so "core.llm.cache" overrides "core.llm"
+        self.rates = sorted(rates.items(), key=lambda item: -len(item[0]))
+        self.dropped = 0
+
+    def _rate(self, name: str) -> float:
+        for prefix, rate in self.rates:
+            if name == prefix or name.startswith(prefix + "."):
+                return rate
+        return 1.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        if rate >= 1.0:
+            return True
+        rid = getattr(record, "request_id", "-")
+        sample = random.random() if rid == "-" else (zlib.crc32(rid.encode()) % 10000) / 10000
+        if sample < rate:
+            return True
+        self.dropped += 1
+        return False
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"
+
+class BackgroundQueueHandler(QueueHandler):
+    """QueueHandler that leaves all formatting to the listener thread and never blocks."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock prepare() formats the message here, on the event loop
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class RequestIdMiddleware:
+    """ASGI middleware: takes X-Request-ID from the client or generates one, and echoes it back."""
+
+    def __init__(self, app, header: str = "x-request-id"):
+        self.app = app
+        self.header = header.encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        rid = next((value.decode() for key, value in scope["headers"] if key == self.header), None)
+        rid = rid[:64] if rid else uuid.uuid4().hex[:16]
+        token = request_id.set(rid)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(self.header, rid.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id.reset(token)
+
+_listener: Optional[QueueListener] = None
+
+def stop_logging() -> None:
+    """Write out queued records and stop the background thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+# Flush what is still queued at interpreter exit
+atexit.register(stop_logging)
+
+# Caller / thread / process switches as they were before lean_records turned them off
+_saved_switches: Optional[tuple] = None
+
+def _use_lean_records(enabled: bool) -> None:
+    """Turn the per-record lookups off, or back to what they were before."""
+    global _saved_switches
+    if enabled and _saved_switches is None:
+        _saved_switches = (logging._srcfile, logging.logThreads, logging.logProcesses, logging.logMultiprocessing)
+        # The switches from the "Optimization" section of the logging HOWTO
+        logging._srcfile = None
+        logging.logThreads = False
+        logging.logProcesses = False
+        logging.logMultiprocessing = False
+    elif not enabled and _saved_switches is not None:
+        (logging._srcfile, logging.logThreads,
+         logging.logProcesses, logging.logMultiprocessing) = _saved_switches
+        _saved_switches = None
+
+def setup_logging(config: LoggingConfig) -> logging.Handler:
+    """Configure the root logger; returns the handler records go through first."""
+    global _listener
+    stop_logging()
+    _use_lean_records(config.lean_records)
+
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter() if config.json_format else logging.Formatter(TEXT_FORMAT))
+    if config.background:
+        handler = BackgroundQueueHandler(queue.Queue(config.queue_size))
+        _listener = QueueListener(handler.queue, output)
+        _listener.start()
+    else:
+        handler = output
+    handler.addFilter(RequestIdFilter())
+    if config.sample_rates:
+        handler.addFilter(SamplingFilter(config.sample_rates))
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+        existing.close()
+    root.addHandler(handler)
+    root.setLevel(config.level.upper())
+    return handler
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """Parse LOG_SAMPLE_RATES, e.g. "main=0.1,core.llm=0.05"."""
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, rate = item.partition("=")
+        rates[name.strip()] = float(rate)
+    return rates
@@ -1,14 +1,29 @@
 from typing import Dict, List, Optional
 from datetime import datetime, timedelta
 from pydantic import BaseModel
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, JSON
+from sqlalchemy import (
+    create_engine, Column, Integer, String, DateTime, JSON, ForeignKey, Index, case, delete, func, insert, literal,
+    select, union_all
+)
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import relationship, sessionmaker
+
+from . import search
+from .cache import MemoryCache, MemoryCacheConfig
+from .compaction import SUMMARY_TAG, CompactionConfig
+from .engine import PoolConfig, PoolStats, PostgresTuning, SQLiteTuning, engine_options, install_tuning
+from .maintenance import MaintenanceConfig
+from .write_behind import WriteBehindConfig
 
 Base = declarative_base()
 
 class MemoryEntry(Base):
     __tablename__ = "memory_entries"
+    __table_args__ = (
+        Index("ix_memory_entries_user_updated", "user_id", "updated_at"),
+        # Expiry walks this oldest-first in bounded batches
+        Index("ix_memory_entries_created", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True)
     user_id = Column(String, index=True)
@@ -16,65 +31,364 @@ class MemoryEntry(Base):
     tags = Column(JSON)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    tag_rows = relationship("MemoryTag", cascade="all, delete-orphan")
+    term_rows = relationship("MemoryTerm", cascade="all, delete-orphan")
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # Mirror the JSON tag list into the indexed memory_tags table
+        self.tag_rows = [
+            MemoryTag(tag=tag) for tag in dict.fromkeys(self.tags or [])
+        ]
+        self.term_rows = search_terms(self.user_id, self.content)
+
+class MemoryTag(Base):
+    """Normalized tag index so tag filters can run inside the database."""
+    __tablename__ = "memory_tags"
+    
+    memory_id = Column(Integer, ForeignKey("memory_entries.id", ondelete="CASCADE"), primary_key=True)
+    tag = Column(String, primary_key=True)
+
+class MemoryTerm(Base):
+    """Per-user inverted index over memory content for BM25 search."""
+    __tablename__ = "memory_terms"
+    __table_args__ = (
+        # Covering index: scoring a query term never touches the table
+        Index("ix_memory_terms_user_term", "user_id", "term", "memory_id", "tf", "doc_length"),
+    )
+    
+    memory_id = Column(Integer, ForeignKey("memory_entries.id", ondelete="CASCADE"), primary_key=True)
+    term = Column(String, primary_key=True)
+    user_id = Column(String, nullable=False)
+    tf = Column(Integer, nullable=False)
+    doc_length = Column(Integer, nullable=False)
+
+class MemoryArchive(Base):
+    """Original memories folded into a summary entry by compaction."""
+    __tablename__ = "memory_archive"
+    __table_args__ = (
+        Index("ix_memory_archive_user_created", "user_id", "created_at"),
+        Index("ix_memory_archive_created", "created_at"),
+    )
+    
+    # Same id the memory had in memory_entries
+    id = Column(Integer, primary_key=True)
+    user_id = Column(String, nullable=False)
+    content = Column(String)
+    tags = Column(JSON)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    # The summary entry that replaced it (it may have expired since)
+    summary_id = Column(Integer, index=True)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+def search_terms(user_id: str, content: Optional[str]) -> List["MemoryTerm"]:
+    """Index rows for one memory, including the document-length pseudo-term."""
+    counts = search.term_counts(content or "")
+    length = sum(counts.values())
+    rows = [
+        MemoryTerm(user_id=user_id, term=term, tf=tf, doc_length=length)
+        for term, tf in counts.items()
+    ]
+    rows.append(MemoryTerm(user_id=user_id, term=search.DOC_TERM, tf=length, doc_length=length))
+    return rows
+
+def create_schema(bind) -> None:
+    """Create missing tables and any indexes added after a table already existed."""
+    if bind.dialect.name == "sqlite":
+        # Lets maintenance hand freed pages back with PRAGMA incremental_vacuum.
+        # Only takes effect while the database is still empty.
+        bind.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+    Base.metadata.create_all(bind)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind, checkfirst=True)
+
+def memories_query(user_id: str, tags: Optional[List[str]], limit: int):
+    """Build the SELECT for a user's newest memories carrying all of ``tags``."""
+    stmt = select(MemoryEntry.content, MemoryEntry.tags, MemoryEntry.created_at).where(
+        MemoryEntry.user_id == user_id
+    )
+    for tag in dict.fromkeys(tags or []):
+        # Each EXISTS is a primary-key probe, so the planner can walk the
+        # (user_id, updated_at) index newest-first and stop at LIMIT
+        stmt = stmt.where(
+            select(MemoryTag.memory_id).where(
+                MemoryTag.memory_id == MemoryEntry.id,
+                MemoryTag.tag == tag
+            ).exists()
+        )
+    return stmt.order_by(MemoryEntry.updated_at.desc(), MemoryEntry.id.desc()).limit(limit)
+
+def memories_many_query(user_ids: List[str], limit: int):
+    """Each user's ``limit`` newest memories, for many users in one statement.
+
+    ROW_NUMBER() ranks every user's rows newest first along the
+    (user_id, updated_at) index; rows come back grouped by user, newest first.
+    """
+    ranked = select(
+        MemoryEntry.user_id, MemoryEntry.content, MemoryEntry.tags, MemoryEntry.created_at,
+        func.row_number().over(
+            partition_by=MemoryEntry.user_id,
+            order_by=(MemoryEntry.updated_at.desc(), MemoryEntry.id.desc())
+        ).label("rank")
+    ).where(MemoryEntry.user_id.in_(user_ids)).subquery()
+    return select(
+        ranked.c.user_id, ranked.c.content, ranked.c.tags, ranked.c.created_at
+    ).where(ranked.c.rank <= limit).order_by(ranked.c.user_id, ranked.c.rank)
+
+def search_stats_query(user_id: str):
+    """Number of indexed memories and their total length for a user."""
+    return select(func.count(), func.coalesce(func.sum(MemoryTerm.tf), 0)).where(
+        MemoryTerm.user_id == user_id,
+        MemoryTerm.term == search.DOC_TERM
+    )
+
+def term_df_query(user_id: str, terms: List[str]):
+    """Document frequency of each query term among a user's memories."""
+    return select(MemoryTerm.term, func.count()).where(
+        MemoryTerm.user_id == user_id,
+        MemoryTerm.term.in_(terms)
+    ).group_by(MemoryTerm.term)
+
+def bm25_query(user_id: str, weights: Dict[str, float], avg_length: float, k: int):
+    """Top-k memories by BM25, scored inside the database from the covering index.
+
+    Each term contributes at most its newest ``search.MAX_POSTINGS`` postings.
+    """
+    postings = union_all(*[
+        select(
+            select(MemoryTerm.memory_id, MemoryTerm.term, MemoryTerm.tf, MemoryTerm.doc_length).where(
+                MemoryTerm.user_id == user_id,
+                MemoryTerm.term == term
+            ).order_by(MemoryTerm.memory_id.desc()).limit(search.MAX_POSTINGS).subquery()
+        )
+        for term in weights
+    ]).subquery()
+    tf = postings.c.tf
+    norm = search.K1 * (1 - search.B + search.B * postings.c.doc_length / max(avg_length, 1.0))
+    score = func.sum(case(weights, value=postings.c.term) * tf * (search.K1 + 1) / (tf + norm))
+    ranked = select(postings.c.memory_id, score.label("score")).group_by(
+        postings.c.memory_id
+    ).order_by(score.desc()).limit(k).subquery()
+    return select(
+        MemoryEntry.content, MemoryEntry.tags, MemoryEntry.created_at, ranked.c.score
+    ).join(ranked, ranked.c.memory_id == MemoryEntry.id).order_by(ranked.c.score.desc(), MemoryEntry.id.desc())
+
+def expired_ids_query(model, expiry_date: datetime, limit: int):
+    """Ids of the oldest ``limit`` rows of ``model`` (MemoryEntry or MemoryArchive) created before ``expiry_date``."""
+    return select(model.id).where(model.created_at < expiry_date).order_by(model.created_at).limit(limit)
+
+def memory_delete_statements(memory_ids: List[int]):
+    """Build the DELETE statements that remove memories (index rows first)."""
+    return [
+        delete(MemoryTag).where(MemoryTag.memory_id.in_(memory_ids)),
+        delete(MemoryTerm).where(MemoryTerm.memory_id.in_(memory_ids)),
+        delete(MemoryEntry).where(MemoryEntry.id.in_(memory_ids)),
+    ]
+
+def compaction_users_query(cutoff: datetime, min_rows: int, after: str, limit: int):
+    """Users (in user_id order, after ``after``) with at least ``min_rows`` memories older than ``cutoff``."""
+    return select(MemoryEntry.user_id).where(
+        MemoryEntry.created_at < cutoff,
+        MemoryEntry.user_id > after
+    ).group_by(MemoryEntry.user_id).having(func.count() >= min_rows).order_by(MemoryEntry.user_id).limit(limit)
+
+def compaction_batch_query(user_id: str, cutoff: datetime, keep_recent: int, limit: int):
+    """A user's oldest memories older than ``cutoff``, never touching the newest ``keep_recent``.
+
+    Earlier summaries are included, so they roll up into later ones and a
+    user's summaries do not pile up.
+    """
+    recent = select(MemoryEntry.id).where(
+        MemoryEntry.user_id == user_id
+    ).order_by(MemoryEntry.updated_at.desc(), MemoryEntry.id.desc()).limit(keep_recent)
+    return select(MemoryEntry.id, MemoryEntry.content, MemoryEntry.tags, MemoryEntry.created_at).where(
+        MemoryEntry.user_id == user_id,
+        MemoryEntry.created_at < cutoff,
+        MemoryEntry.id.not_in(recent.scalar_subquery())
+    ).order_by(MemoryEntry.created_at, MemoryEntry.id).limit(limit)
+
+def archive_statements(memory_ids: List[int], summary_id: int, archived_at: datetime):
+    """Move memories into memory_archive and drop them (with their index rows) from the live tables."""
+    return [
+        insert(MemoryArchive).from_select(
+            ["id", "user_id", "content", "tags", "created_at", "updated_at", "summary_id", "archived_at"],
+            select(
+                MemoryEntry.id, MemoryEntry.user_id, MemoryEntry.content, MemoryEntry.tags,
+                MemoryEntry.created_at, MemoryEntry.updated_at, literal(summary_id), literal(archived_at)
+            ).where(MemoryEntry.id.in_(memory_ids))
+        ),
+        *memory_delete_statements(memory_ids),
+    ]
+
+def memory_to_dict(row) -> Dict:
+    return {"content": row.content, "tags": row.tags, "created_at": row.created_at}
+
+def search_result_to_dict(row) -> Dict:
+    return {**memory_to_dict(row), "score": row.score}
 
 class MemoryConfig(BaseModel):
     db_url: str
     max_memories_per_user: int = 100
     memory_expiry_days: int = 30
+    # Buffer writes and flush them in batches (AsyncMemorySystem only)
+    write_behind: Optional[WriteBehindConfig] = None
+    # Per-user read-through cache in front of get_memories
+    cache: Optional[MemoryCacheConfig] = None
+    # Relevant older memories (search_memories) added to the recent ones for prompts
+    search_results: int = 0
+    # Fold old memories into summary entries in the background (AsyncMemorySystem only)
+    compaction: Optional[CompactionConfig] = None
+    # Scheduled chunked expiry and space reclamation (AsyncMemorySystem only)
+    maintenance: Optional[MaintenanceConfig] = None
+    # Connection pool for file / server databases; None keeps SQLAlchemy's default pool
+    pool: Optional[PoolConfig] = None
+    # Per-backend tuning; None keeps the driver defaults
+    sqlite: Optional[SQLiteTuning] = None
+    postgres: Optional[PostgresTuning] = None
 
 class MemorySystem:
     def __init__(self, config: MemoryConfig):
         self.config = config
-        self.engine = create_engine(config.db_url)
-        Base.metadata.create_all(self.engine)
+        self.pool_stats = PoolStats()
+        self.engine = create_engine(config.db_url, **engine_options(config, config.db_url, self.pool_stats))
+        install_tuning(self.engine, config)
+        with self.engine.begin() as conn:
+            create_schema(conn)
         self.Session = sessionmaker(bind=self.engine)
+        self.cache = MemoryCache(config.cache) if config.cache is not None else None
+        self.search_stats = search.SearchStatsCache()
     
     def store_memory(self, user_id: str, content: str, tags: List[str]) -> None:
         """Store a new memory entry."""
         session = self.Session()
         try:
+            now = datetime.utcnow()
             memory = MemoryEntry(
                 user_id=user_id,
                 content=content,
-                tags=tags
+                tags=tags,
+                created_at=now,
+                updated_at=now
             )
             session.add(memory)
             session.commit()
         finally:
             session.close()
+        if self.cache is not None:
+            self.cache.on_store(
+                user_id,
+                {"content": content, "tags": list(tags), "created_at": now},
+                self.config.max_memories_per_user
+            )
     
     def get_memories(self, user_id: str, tags: Optional[List[str]] = None) -> List[Dict]:
         """Retrieve memories for a user, optionally filtered by tags."""
+        if self.cache is not None:
+            cached = self.cache.get(user_id, tags)
+            if cached is not None:
+                return cached
+            generation = self.cache.begin_fill(user_id)
         session = self.Session()
         try:
-            # Get all memories for the user
-            memories = session.query(MemoryEntry).filter(
-                MemoryEntry.user_id == user_id
-            ).order_by(
-                MemoryEntry.updated_at.desc()
+            rows = session.execute(
+                memories_query(user_id, tags, self.config.max_memories_per_user)
             ).all()
-            
-            # Filter memories by tags in Python
-            if tags:
-                filtered_memories = []
-                for memory in memories:
-                    # Check if all requested tags are present in memory tags
-                    if all(tag in memory.tags for tag in tags):
-                        filtered_memories.append(memory)
-                memories = filtered_memories[:self.config.max_memories_per_user]
-            else:
-                memories = memories[:self.config.max_memories_per_user]
-            
-            return [{"content": m.content, "tags": m.tags, "created_at": m.created_at} for m in memories]
+            memories = [memory_to_dict(row) for row in rows]
+            if self.cache is not None:
+                self.cache.put(user_id, tags, memories, generation)
+            return memories
+        finally:
+            session.close()
+            if self.cache is not None:
+                self.cache.end_fill(user_id)
+    
+    def cleanup_old_memories(self, batch_size: int = 1000) -> int:
+        """Remove memories older than the configured expiry period, ``batch_size`` per transaction."""
+        expiry_date = datetime.utcnow() - timedelta(days=self.config.memory_expiry_days)
+        deleted = 0
+        session = self.Session()
+        try:
+            for model in (MemoryEntry, MemoryArchive):
+                while True:
+                    ids = session.scalars(expired_ids_query(model, expiry_date, batch_size)).all()
+                    if not ids:
+                        break
+                    if model is MemoryEntry:
+                        for stmt in memory_delete_statements(ids):
+                            session.execute(stmt)
+                        deleted += len(ids)
+                    else:
+                        session.execute(delete(MemoryArchive).where(MemoryArchive.id.in_(ids)))
+                    session.commit()
+        finally:
+            session.close()
+            self.search_stats.clear()
+            if self.cache is not None:
+                self.cache.clear()
+        return deleted
+    
+    def search_memories(self, user_id: str, query: str, k: int = 10) -> List[Dict]:
+        """Return the k memories most relevant to ``query`` (BM25), best first."""
+        terms = search.query_terms(query)
+        if not terms:
+            return []
+        session = self.Session()
+        try:
+            stats = self.search_stats.get(user_id)
+            if stats is None:
+                stats = tuple(session.execute(search_stats_query(user_id)).one())
+                self.search_stats.put(user_id, *stats)
+            doc_count, total_length = stats
+            if not doc_count:
+                return []
+            dfs = dict(session.execute(term_df_query(user_id, terms)).all())
+            weights = search.term_weights(doc_count, dfs)
+            if not weights:
+                return []
+            rows = session.execute(bm25_query(user_id, weights, total_length / doc_count, k)).all()
+            return [search_result_to_dict(row) for row in rows]
+        finally:
+            session.close()
+    
+    def rebuild_search_index(self, batch_size: int = 1000) -> None:
+        """Repopulate memory_terms from memory content (for databases created before the index)."""
+        session = self.Session()
+        try:
+            session.execute(delete(MemoryTerm))
+            rows = session.execute(
+                select(MemoryEntry.id, MemoryEntry.user_id, MemoryEntry.content)
+            ).yield_per(batch_size)
+            for chunk in rows.partitions():
+                term_rows = [
+                    {"memory_id": memory_id, "user_id": term.user_id, "term": term.term,
+                     "tf": term.tf, "doc_length": term.doc_length}
+                    for memory_id, user_id, content in chunk
+                    for term in search_terms(user_id, content)
+                ]
+                session.execute(insert(MemoryTerm), term_rows)
+            session.commit()
         finally:
             session.close()
+            self.search_stats.clear()
     
-    def cleanup_old_memories(self) -> None:
-        """Remove memories older than the configured expiry period."""
+    def rebuild_tag_index(self, batch_size: int = 1000) -> None:
+        """Repopulate memory_tags from the JSON tag column (for databases created before the index)."""
         session = self.Session()
         try:
-            expiry_date = datetime.utcnow() - timedelta(days=self.config.memory_expiry_days)
-            session.query(MemoryEntry).filter(MemoryEntry.created_at < expiry_date).delete()
+            session.execute(delete(MemoryTag))
+            rows = session.execute(
+                select(MemoryEntry.id, MemoryEntry.tags)
+            ).yield_per(batch_size)
+            for chunk in rows.partitions():
+                tag_rows = [
+                    {"memory_id": memory_id, "tag": tag}
+                    for memory_id, tags in chunk
+                    for tag in dict.fromkeys(tags or [])
+                ]
+                if tag_rows:
+                    session.execute(insert(MemoryTag), tag_rows)
             session.commit()
         finally:
             session.close() 
\ No newline at end of file
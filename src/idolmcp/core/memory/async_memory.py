@@ -0,0 +1,354 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+from sqlalchemy import delete
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from . import (
+    SUMMARY_TAG, MemoryArchive, MemoryConfig, MemoryEntry, archive_statements, bm25_query, compaction_batch_query,
+    compaction_users_query, create_schema, expired_ids_query, memories_many_query, memories_query, memory_delete_statements,
+    memory_to_dict, search, search_result_to_dict, search_stats_query, term_df_query
+)
+from .cache import MemoryCache
+from .engine import PoolStats, engine_options, install_tuning
+from .write_behind import PendingMemory, WriteBehindQueue, merge_pending
+
+# Sync driver -> async driver used when the configured URL names a blocking driver
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+    "postgres": "asyncpg",
+}
+
+def to_async_url(db_url: str) -> str:
+    """Rewrite a database URL so it uses an asyncio-capable driver."""
+    url = make_url(db_url)
+    backend = url.get_backend_name()
+    if backend == "postgres":
+        url = url.set(drivername="postgresql")
+        backend = "postgresql"
+    driver = ASYNC_DRIVERS.get(backend)
+    if driver is None or url.get_driver_name() == driver:
+        return url.render_as_string(hide_password=False)
+    return url.set(drivername=f"{backend}+{driver}").render_as_string(hide_password=False)
+
+class AsyncMemorySystem:
+    """Asyncio counterpart of MemorySystem.
+
+    Exposes the same methods as coroutines so the event loop is never blocked
+    waiting on the database.
+    """
+
+    def __init__(self, config: MemoryConfig):
+        self.config = config
+        url = to_async_url(config.db_url)
+        self.pool_stats = PoolStats()
+        engine_kwargs = engine_options(config, url, self.pool_stats, is_async=True)
+        self._is_sqlite = make_url(url).get_backend_name() == "sqlite"
+        if self._is_sqlite and make_url(url).database in (None, "", ":memory:"):
+            # An in-memory SQLite database only exists for the lifetime of one connection
+            engine_kwargs["poolclass"] = StaticPool
+            engine_kwargs["connect_args"] = {"check_same_thread": False}
+        self.engine = create_async_engine(url, **engine_kwargs)
+        install_tuning(self.engine.sync_engine, config)
+        self.Session = async_sessionmaker(self.engine, expire_on_commit=False)
+        self._schema_ready = False
+        self._schema_lock = asyncio.Lock()
+        # SQLite allows a single writer; queue writers here instead of failing with "database is locked"
+        self._write_lock = asyncio.Lock() if self._is_sqlite else None
+        self.write_queue: Optional[WriteBehindQueue] = None
+        if config.write_behind is not None:
+            self.write_queue = WriteBehindQueue(config.write_behind, self._insert_pending)
+        self.cache = MemoryCache(config.cache) if config.cache is not None else None
+        self.search_stats = search.SearchStatsCache()
+
+    async def init_schema(self) -> None:
+        """Create the memory tables if they do not exist yet."""
+        if self._schema_ready:
+            return
+        async with self._schema_lock:
+            if self._schema_ready:
+                return
+            async with self.engine.begin() as conn:
+                await conn.run_sync(create_schema)
+            self._schema_ready = True
+
+    async def warm_up(self, connections: int = 1) -> None:
+        """Open ``connections`` pooled connections now instead of on the first requests."""
+        async def ping():
+            async with self.engine.connect() as conn:
+                await conn.exec_driver_sql("SELECT 1")
+
+        # Held concurrently, so each one is a separate connection left in the pool
+        await asyncio.gather(*(ping() for _ in range(connections)))
+
+    @asynccontextmanager
+    async def _writer(self):
+        if self._write_lock is None:
+            yield
+            return
+        async with self._write_lock:
+            yield
+
+    async def store_memory(self, user_id: str, content: str, tags: List[str]) -> None:
+        """Store a new memory entry."""
+        if self.write_queue is not None:
+            item = await self.write_queue.put(user_id, content, tags)
+            created_at = item.created_at
+        else:
+            await self.init_schema()
+            created_at = datetime.utcnow()
+            async with self._writer(), self.Session() as session:
+                session.add(MemoryEntry(
+                    user_id=user_id,
+                    content=content,
+                    tags=tags,
+                    created_at=created_at,
+                    updated_at=created_at
+                ))
+                await session.commit()
+        if self.cache is not None:
+            self.cache.on_store(
+                user_id,
+                {"content": content, "tags": list(tags), "created_at": created_at},
+                self.config.max_memories_per_user
+            )
+
+    async def store_memories(self, items: List[Tuple[str, str, List[str]]]) -> None:
+        """Store many (user_id, content, tags) memories in a single transaction."""
+        if self.write_queue is not None:
+            # The queue already batches; this keeps its durability and ordering rules
+            batch = await self.write_queue.put_many(items)
+        else:
+            batch = [PendingMemory(user_id=user_id, content=content, tags=list(tags)) for user_id, content, tags in items]
+            await self._insert_pending(batch)
+        if self.cache is not None:
+            for item in batch:
+                self.cache.on_store(
+                    item.user_id,
+                    {"content": item.content, "tags": list(item.tags), "created_at": item.created_at},
+                    self.config.max_memories_per_user
+                )
+
+    async def _insert_pending(self, batch: List[PendingMemory]) -> None:
+        """Write a batch of queued memories in a single transaction."""
+        await self.init_schema()
+        async with self._writer(), self.Session() as session:
+            session.add_all([
+                MemoryEntry(
+                    user_id=item.user_id,
+                    content=item.content,
+                    tags=item.tags,
+                    created_at=item.created_at,
+                    updated_at=item.created_at
+                )
+                for item in batch
+            ])
+            await session.commit()
+
+    async def get_memories(self, user_id: str, tags: Optional[List[str]] = None) -> List[Dict]:
+        """Retrieve memories for a user, optionally filtered by tags."""
+        if self.cache is None:
+            return await self._load_memories(user_id, tags)
+        cached = self.cache.get(user_id, tags)
+        if cached is not None:
+            return cached
+        generation = self.cache.begin_fill(user_id)
+        try:
+            memories = await self._load_memories(user_id, tags)
+            self.cache.put(user_id, tags, memories, generation)
+            return memories
+        finally:
+            self.cache.end_fill(user_id)
+
+    async def get_memories_many(self, user_ids: List[str]) -> Dict[str, List[Dict]]:
+        """get_memories() for many users: cache hits first, then one query for all misses."""
+        user_ids = list(dict.fromkeys(user_ids))
+        found: Dict[str, List[Dict]] = {}
+        if self.cache is not None:
+            for user_id in user_ids:
+                cached = self.cache.get(user_id)
+                if cached is not None:
+                    found[user_id] = cached
+        missing = [user_id for user_id in user_ids if user_id not in found]
+        if not missing:
+            return found
+        generations = {user_id: self.cache.begin_fill(user_id) for user_id in missing} if self.cache is not None else {}
+        try:
+            await self.init_schema()
+            loaded: Dict[str, List[Dict]] = {user_id: [] for user_id in missing}
+            async with self.Session() as session:
+                result = await session.execute(memories_many_query(missing, self.config.max_memories_per_user))
+                for row in result.all():
+                    loaded[row.user_id].append(memory_to_dict(row))
+            for user_id, memories in loaded.items():
+                pending = self.write_queue.pending_for(user_id) if self.write_queue is not None else None
+                if pending:
+                    memories = merge_pending(pending, memories, None, self.config.max_memories_per_user)
+                if self.cache is not None:
+                    self.cache.put(user_id, None, memories, generations[user_id])
+                found[user_id] = memories
+        finally:
+            for user_id in generations:
+                self.cache.end_fill(user_id)
+        return found
+
+    async def _load_memories(self, user_id: str, tags: Optional[List[str]]) -> List[Dict]:
+        await self.init_schema()
+        pending = self.write_queue.pending_for(user_id) if self.write_queue is not None else None
+        async with self.Session() as session:
+            result = await session.execute(
+                memories_query(user_id, tags, self.config.max_memories_per_user)
+            )
+            memories = [memory_to_dict(row) for row in result.all()]
+        if pending:
+            memories = merge_pending(pending, memories, tags, self.config.max_memories_per_user)
+        return memories
+
+    async def search_memories(self, user_id: str, query: str, k: int = 10) -> List[Dict]:
+        """Return the k memories most relevant to ``query`` (BM25), best first.
+
+        Memories still waiting in the write-behind queue are not searchable yet.
+        """
+        terms = search.query_terms(query)
+        if not terms:
+            return []
+        await self.init_schema()
+        async with self.Session() as session:
+            stats = self.search_stats.get(user_id)
+            if stats is None:
+                stats = tuple((await session.execute(search_stats_query(user_id))).one())
+                self.search_stats.put(user_id, *stats)
+            doc_count, total_length = stats
+            if not doc_count:
+                return []
+            dfs = dict((await session.execute(term_df_query(user_id, terms))).all())
+            weights = search.term_weights(doc_count, dfs)
+            if not weights:
+                return []
+            result = await session.execute(bm25_query(user_id, weights, total_length / doc_count, k))
+            return [search_result_to_dict(row) for row in result.all()]
+
+    async def compaction_candidates(self, cutoff: datetime, min_rows: int, after: str, limit: int) -> List[str]:
+        """Users after ``after`` with at least ``min_rows`` memories older than ``cutoff``."""
+        await self.init_schema()
+        async with self.Session() as session:
+            result = await session.execute(compaction_users_query(cutoff, min_rows, after, limit))
+            return list(result.scalars())
+
+    async def compaction_batch(self, user_id: str, cutoff: datetime, keep_recent: int, limit: int) -> List[Dict]:
+        """A user's oldest memories (earlier summaries included) eligible for compaction, oldest first."""
+        await self.init_schema()
+        async with self.Session() as session:
+            result = await session.execute(compaction_batch_query(user_id, cutoff, keep_recent, limit))
+            return [{"id": row.id, **memory_to_dict(row)} for row in result.all()]
+
+    async def fold_memories(self, user_id: str, memories: List[Dict], summary: str) -> int:
+        """Replace ``memories`` with one summary entry, archiving the originals atomically.
+
+        The summary takes the newest folded timestamp, so it sorts where the
+        originals did and expires with the last of them.
+        """
+        await self.init_schema()
+        created_at = max(memory["created_at"] for memory in memories)
+        tags = [
+            tag for tag in dict.fromkeys(tag for memory in memories for tag in memory["tags"] or [])
+            if tag != SUMMARY_TAG
+        ]
+        async with self._writer(), self.Session() as session:
+            entry = MemoryEntry(
+                user_id=user_id,
+                content=summary,
+                tags=tags + [SUMMARY_TAG],
+                created_at=created_at,
+                updated_at=created_at
+            )
+            session.add(entry)
+            await session.flush()
+            for stmt in archive_statements([memory["id"] for memory in memories], entry.id, datetime.utcnow()):
+                await session.execute(stmt)
+            await session.commit()
+        # The user's document count and total length changed with the index rows
+        self.search_stats.invalidate(user_id)
+        if self.cache is not None:
+            self.cache.invalidate_user(user_id)
+        return entry.id
+
+    async def cleanup_old_memories(self, batch_size: int = 1000) -> int:
+        """Remove memories older than the configured expiry period, ``batch_size`` per transaction."""
+        deleted, _ = await self.expire_memories(batch_size)
+        return deleted
+
+    async def expire_memories(
+        self,
+        batch_size: int = 1000,
+        pause: float = 0.0,
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> Tuple[int, int]:
+        """Remove memories (and archived originals) older than the configured expiry period.
+
+        Deletes at most ``batch_size`` rows of each per transaction and sleeps
+        ``pause`` seconds between batches, so writers are never locked out for
+        long. ``progress(memories, archived)`` is called with running totals
+        after each batch. Returns the totals.
+        """
+        await self.init_schema()
+        expiry_date = datetime.utcnow() - timedelta(days=self.config.memory_expiry_days)
+        memories = archived = 0
+        try:
+            while True:
+                deleted, deleted_archived = await self.delete_expired(expiry_date, batch_size)
+                memories += deleted
+                archived += deleted_archived
+                if progress is not None:
+                    progress(memories, archived)
+                if deleted < batch_size and deleted_archived < batch_size:
+                    return memories, archived
+                await asyncio.sleep(pause)
+        finally:
+            self.search_stats.clear()
+            if self.cache is not None:
+                self.cache.clear()
+
+    async def delete_expired(self, expiry_date: datetime, limit: int) -> Tuple[int, int]:
+        """Delete up to ``limit`` expired memories and ``limit`` expired archive rows in one transaction."""
+        async with self._writer(), self.Session() as session:
+            ids = (await session.execute(expired_ids_query(MemoryEntry, expiry_date, limit))).scalars().all()
+            if ids:
+                for stmt in memory_delete_statements(ids):
+                    await session.execute(stmt)
+            archived_ids = (await session.execute(expired_ids_query(MemoryArchive, expiry_date, limit))).scalars().all()
+            if archived_ids:
+                await session.execute(delete(MemoryArchive).where(MemoryArchive.id.in_(archived_ids)))
+            await session.commit()
+        return len(ids), len(archived_ids)
+
+    async def reclaim_space(self, max_pages: int) -> int:
+        """Return up to ``max_pages`` free pages to the filesystem (SQLite incremental vacuum).
+
+        A no-op for other databases, which reclaim space on their own, and for
+        SQLite files created before auto_vacuum was enabled (those need a
+        one-off VACUUM, see init_db.py). Returns the number of pages freed.
+        """
+        if not self._is_sqlite or max_pages <= 0:
+            return 0
+        await self.init_schema()
+        async with self._writer(), self.engine.connect() as conn:
+            if (await conn.exec_driver_sql("PRAGMA auto_vacuum")).scalar() != 2:
+                return 0
+            before = (await conn.exec_driver_sql("PRAGMA freelist_count")).scalar()
+            await conn.commit()
+            # A plain execute frees a single page per statement step; executescript runs it to completion
+            raw = await conn.get_raw_connection()
+            await raw.driver_connection.executescript(f"PRAGMA incremental_vacuum({int(max_pages)});")
+            after = (await conn.exec_driver_sql("PRAGMA freelist_count")).scalar()
+        return before - after
+
+    async def close(self) -> None:
+        """Flush queued writes, then dispose of the engine and its connection pool."""
+        if self.write_queue is not None:
+            await self.write_queue.close()
+        await self.engine.dispose()
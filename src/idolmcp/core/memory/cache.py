@@ -0,0 +1,126 @@
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+from pydantic import BaseModel
+
+CacheKey = Tuple[str, Tuple[str, ...]]
+
+class MemoryCacheConfig(BaseModel):
+    max_entries: int = 10000
+    ttl_seconds: float = 300.0
+
+class MemoryCache:
+    """LRU + TTL cache for get_memories results, keyed by user and tag filter.
+
+    store_memory writes through: every cached filter the new memory matches
+    gets it prepended in place, so a fan's next read is still a hit.
+    """
+
+    def __init__(self, config: MemoryCacheConfig, clock=time.monotonic):
+        self.config = config
+        self._clock = clock
+        self._entries: "OrderedDict[CacheKey, Tuple[float, List[Dict]]]" = OrderedDict()
+        self._keys_by_user: Dict[str, Set[CacheKey]] = {}
+        # user_id -> [reads in flight, write generation]; only users with a miss
+        # being filled are tracked, so this stays as small as the read concurrency
+        self._fills: Dict[str, List[int]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(user_id: str, tags: Optional[List[str]]) -> CacheKey:
+        return (user_id, tuple(sorted(set(tags or ()))))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def begin_fill(self, user_id: str) -> int:
+        """Note that a miss for ``user_id`` is being loaded; pass the result to put()."""
+        fill = self._fills.setdefault(user_id, [0, 0])
+        fill[0] += 1
+        return fill[1]
+
+    def end_fill(self, user_id: str) -> None:
+        """Pair of begin_fill(); call once the load finished or failed."""
+        fill = self._fills.get(user_id)
+        if fill is not None:
+            fill[0] -= 1
+            if fill[0] <= 0:
+                del self._fills[user_id]
+
+    def get(self, user_id: str, tags: Optional[List[str]] = None) -> Optional[List[Dict]]:
+        """Return a cached result, or None on a miss."""
+        key = self.make_key(user_id, tags)
+        cached = self._entries.get(key)
+        if cached is None or cached[0] <= self._clock():
+            if cached is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return list(cached[1])
+
+    def put(self, user_id: str, tags: Optional[List[str]], memories: List[Dict], generation: Optional[int] = None) -> None:
+        """Cache a query result; skipped if the user was written to since begin_fill()."""
+        if generation is not None:
+            fill = self._fills.get(user_id)
+            if fill is None or fill[1] != generation:
+                return
+        key = self.make_key(user_id, tags)
+        self._entries[key] = (self._clock() + self.config.ttl_seconds, list(memories))
+        self._entries.move_to_end(key)
+        self._keys_by_user.setdefault(user_id, set()).add(key)
+        while len(self._entries) > self.config.max_entries:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def on_store(self, user_id: str, memory: Dict, limit: int) -> None:
+        """Apply a newly stored memory to every cached filter it matches."""
+        self._bump(user_id)
+        memory_tags = set(memory["tags"] or ())
+        identity = (memory["content"], memory["created_at"])
+        for key in self._keys_by_user.get(user_id, ()):
+            if not set(key[1]) <= memory_tags:
+                continue
+            expires_at, memories = self._entries[key]
+            # A read that completed while the write was in flight may already include it
+            if any((m["content"], m["created_at"]) == identity for m in memories):
+                continue
+            self._entries[key] = (expires_at, [memory] + memories[:limit - 1])
+
+    def invalidate_user(self, user_id: str) -> None:
+        self._bump(user_id)
+        for key in list(self._keys_by_user.get(user_id, ())):
+            self._drop(key)
+
+    def clear(self) -> None:
+        for fill in self._fills.values():
+            fill[1] += 1
+        self._entries.clear()
+        self._keys_by_user.clear()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+        }
+
+    def _bump(self, user_id: str) -> None:
+        fill = self._fills.get(user_id)
+        if fill is not None:
+            fill[1] += 1
+
+    def _drop(self, key: CacheKey) -> None:
+        del self._entries[key]
+        user_keys = self._keys_by_user.get(key[0])
+        if user_keys is not None:
+            user_keys.discard(key)
+            if not user_keys:
+                del self._keys_by_user[key[0]]
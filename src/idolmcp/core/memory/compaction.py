@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import math
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from pydantic import BaseModel
+
+from . import search
+
+logger = logging.getLogger(__name__)
+
+# Tag carried by the entries compaction writes in place of folded memories
+SUMMARY_TAG = "summary"
+SUMMARY_HEADER = re.compile(r"\[摘要 (\d\d/\d\d)-\d\d/\d\d，(\d+) 則\]\s*")
+
+class CompactionConfig(BaseModel):
+    # Only memories older than this are folded
+    min_age_hours: float = 24.0
+    # Newest raw memories always left untouched per user
+    keep_recent: int = 50
+    # Memories folded into one summary entry
+    batch_size: int = 50
+    # Fewer foldable memories than this wait for a later run
+    min_batch: int = 20
+    # Maximum summary length in characters
+    summary_chars: int = 300
+    # Users examined per run; the next run continues after the last one
+    users_per_run: int = 100
+    # Upper bound on summaries written per second, so compaction never
+    # competes with /chat for the database or the LLM
+    max_batches_per_second: float = 2.0
+    # Seconds between runs when started in the background
+    interval_seconds: float = 600.0
+
+def folded(memory: Dict) -> Tuple[str, int, str]:
+    """First date, message count and text of a memory; an earlier summary reports what it folded."""
+    content = str(memory.get("content") or "").strip()
+    match = SUMMARY_HEADER.match(content) if SUMMARY_TAG in (memory.get("tags") or []) else None
+    if match is None:
+        return f"{memory['created_at']:%m/%d}", 1, content
+    return match.group(1), int(match.group(2)), content[match.end():]
+
+def summary_header(memories: List[Dict]) -> str:
+    first = folded(memories[0])[0]
+    count = sum(folded(memory)[1] for memory in memories)
+    return f"[摘要 {first}-{memories[-1]['created_at']:%m/%d}，{count} 則]"
+
+class ExtractiveSummarizer:
+    """Local summarizer: keeps the most informative distinct messages of a batch.
+
+    Repeated messages count once, one-term chatter ("早安", stickers) is
+    dropped, and the rest are ranked by how rare their terms are within the
+    batch. The chosen messages are joined oldest first.
+    """
+
+    def __init__(self, max_chars: int = 300):
+        self.max_chars = max_chars
+
+    async def summarize(self, memories: List[Dict]) -> str:
+        header = summary_header(memories)
+        distinct: Dict[str, tuple] = {}
+        for index, memory in enumerate(memories):
+            content = folded(memory)[2]
+            terms = set(search.tokenize(content))
+            key = " ".join(sorted(terms))
+            if len(terms) >= 2 and key not in distinct:
+                distinct[key] = (index, content, terms)
+        df = Counter(term for _, _, terms in distinct.values() for term in terms)
+        n = len(distinct)
+        ranked = sorted(
+            distinct.values(),
+            key=lambda item: -sum(math.log(1 + n / df[term]) for term in item[2]) / math.sqrt(len(item[2]))
+        )
+        chosen, used = [], len(header)
+        for index, content, _ in ranked:
+            if used + len(content) + 1 > self.max_chars:
+                continue
+            chosen.append((index, content))
+            used += len(content) + 1
+        return " ".join([header] + [content for _, content in sorted(chosen)])
+
+class LLMSummarizer:
+    """Asks a language model for the summary, falling back to extractive on failure."""
+
+    PROMPT = (
+        "以下是粉絲的 {count} 則舊訊息。請用繁體中文、第三人稱，在 {chars} 字內整理出值得記住的事"
+        "（喜好、經歷、約定、心情變化），略過問候與閒聊，只輸出摘要本身。\n{messages}"
+    )
+
+    def __init__(self, complete: Callable[[str], Awaitable[str]], max_chars: int = 300):
+        self.complete = complete
+        self.max_chars = max_chars
+        self.fallback = ExtractiveSummarizer(max_chars)
+
+    async def summarize(self, memories: List[Dict]) -> str:
+        header = summary_header(memories)
+        prompt = self.PROMPT.format(
+            count=len(memories),
+            chars=self.max_chars - len(header) - 1,
+            messages="\n".join(f"- {folded(memory)[2]}" for memory in memories)
+        )
+        try:
+            text = " ".join((await self.complete(prompt)).split())
+        except Exception as e:
+            logger.warning("LLM 摘要失敗，改用擷取式摘要: %s", e)
+            return await self.fallback.summarize(memories)
+        if not text:
+            return await self.fallback.summarize(memories)
+        return f"{header} {text}"[:self.max_chars]
+
+@dataclass
+class CompactionRun:
+    users: int = 0
+    summaries: int = 0
+    archived: int = 0
+    elapsed: float = 0.0
+
+class MemoryCompactor:
+    """Background job that folds old memories into rolling summary entries.
+
+    Earlier summaries are folded again together with the memories after them,
+    so each user keeps a bounded number of summaries. Each batch (summary insert plus archiving of its originals) is one
+    transaction, and the work left is read from the database, so a job that
+    is stopped or crashes part way simply continues with what remains on the
+    next run. Users are visited in user_id order across runs.
+    """
+
+    def __init__(self, memory_system, config: CompactionConfig, summarizer=None):
+        self.memory_system = memory_system
+        self.config = config
+        self.summarizer = summarizer or ExtractiveSummarizer(config.summary_chars)
+        self._after = ""
+        self._next_batch_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.summaries = 0
+        self.archived = 0
+
+    async def run_once(self, now: Optional[datetime] = None) -> CompactionRun:
+        """Compact up to ``users_per_run`` users, continuing after the previous run."""
+        started = time.perf_counter()
+        cutoff = (now or datetime.utcnow()) - timedelta(hours=self.config.min_age_hours)
+        users = await self.memory_system.compaction_candidates(
+            cutoff,
+            self.config.keep_recent + self.config.min_batch,
+            self._after,
+            self.config.users_per_run
+        )
+        # A short page means the end of the user list: start over next time
+        self._after = users[-1] if len(users) == self.config.users_per_run else ""
+        run = CompactionRun(users=len(users))
+        for user_id in users:
+            summaries, archived = await self.compact_user(user_id, cutoff)
+            run.summaries += summaries
+            run.archived += archived
+        run.elapsed = time.perf_counter() - started
+        self.runs += 1
+        self.summaries += run.summaries
+        self.archived += run.archived
+        if run.summaries:
+            logger.info("記憶壓縮完成: %d 位使用者，%d 則記憶併入 %d 則摘要", run.users, run.archived, run.summaries)
+        return run
+
+    async def compact_user(self, user_id: str, cutoff: datetime):
+        summaries = archived = 0
+        while True:
+            batch = await self.memory_system.compaction_batch(
+                user_id, cutoff, self.config.keep_recent, self.config.batch_size
+            )
+            # A batch of one would only replace a summary with itself
+            if len(batch) < max(self.config.min_batch, 2):
+                return summaries, archived
+            await self._throttle()
+            summary = await self.summarizer.summarize(batch)
+            await self.memory_system.fold_memories(user_id, batch, summary)
+            summaries += 1
+            archived += len(batch)
+
+    async def _throttle(self) -> None:
+        now = time.monotonic()
+        if self._next_batch_at > now:
+            await asyncio.sleep(self._next_batch_at - now)
+        self._next_batch_at = max(now, self._next_batch_at) + 1 / self.config.max_batches_per_second
+
+    def start(self) -> None:
+        """Run compaction every ``interval_seconds`` until stop()."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run_forever(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error("記憶壓縮時發生錯誤: %s", e)
+            await asyncio.sleep(self.config.interval_seconds)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "runs": self.runs,
+            "summaries": self.summaries,
+            "archived": self.archived,
+        }
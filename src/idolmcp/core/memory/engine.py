@@ -0,0 +1,151 @@
+import time
+from collections import deque
+from typing import Deque, Dict
+from pydantic import BaseModel
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+class PoolConfig(BaseModel):
+    # Connections kept open
+    size: int = 10
+    # Extra connections allowed under bursts, closed when returned
+    max_overflow: int = 20
+    # Seconds to wait for a free connection before failing
+    timeout: float = 30.0
+    # Reopen connections older than this (proxies / server idle limits)
+    recycle_seconds: int = 1800
+    # Test each connection on checkout so a restarted server is not an error
+    pre_ping: bool = True
+
+class SQLiteTuning(BaseModel):
+    # WAL lets readers run while a write is in progress
+    journal_mode: str = "WAL"
+    # NORMAL is durable across application crashes in WAL mode; FULL also survives power loss
+    synchronous: str = "NORMAL"
+    # Bytes of the file read through memory mapping instead of read() calls
+    mmap_size: int = 256 * 1024 * 1024
+    # Wait this long for a lock instead of failing with "database is locked"
+    busy_timeout_ms: int = 5000
+    # Page cache per connection
+    cache_size_kb: int = 20000
+
+class PostgresTuning(BaseModel):
+    # Server-side limit for one statement; 0 disables
+    statement_timeout_ms: int = 5000
+    # Shown in pg_stat_activity
+    application_name: str = "idolmcp"
+
+class PoolStats:
+    """Checkout wait times of one engine's connection pool.
+
+    Keeps the last ``window`` waits for percentiles; a p95 that approaches
+    PoolConfig.timeout means the pool is too small for the load.
+    """
+
+    def __init__(self, window: int = 10000):
+        self._waits: Deque[float] = deque(maxlen=window)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.pool = None
+        # Optional core.metrics histogram fed with every wait, for /metrics
+        self.histogram = None
+
+    def record(self, wait: float) -> None:
+        self.checkouts += 1
+        self._waits.append(wait)
+        if self.histogram is not None:
+            self.histogram.observe(wait)
+
+    def stats(self) -> Dict[str, float]:
+        waits = sorted(self._waits)
+
+        def percentile_ms(q: float) -> float:
+            return waits[min(len(waits) - 1, int(len(waits) * q))] * 1000 if waits else 0.0
+
+        stats = {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_p50_ms": percentile_ms(0.50),
+            "wait_p95_ms": percentile_ms(0.95),
+            "wait_max_ms": waits[-1] * 1000 if waits else 0.0,
+        }
+        if isinstance(self.pool, QueuePool):
+            stats.update({
+                "size": self.pool.size(),
+                "checked_out": self.pool.checkedout(),
+                "overflow": max(self.pool.overflow(), 0),
+            })
+        return stats
+
+def _instrumented(pool_class, stats: PoolStats):
+    class InstrumentedPool(pool_class):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            # The engine recreates its pool on dispose(); stats follow the live one
+            stats.pool = self
+
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                return super()._do_get()
+            except exc.TimeoutError:
+                stats.timeouts += 1
+                raise
+            finally:
+                stats.record(time.perf_counter() - started)
+
+    InstrumentedPool.__name__ = f"Instrumented{pool_class.__name__}"
+    return InstrumentedPool
+
+def engine_options(config, url: str, stats: PoolStats, is_async: bool = False) -> Dict:
+    """create_engine / create_async_engine keyword arguments for a MemoryConfig."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    options: Dict = {}
+    if backend == "sqlite" and parsed.database in (None, "", ":memory:"):
+        # One shared connection (see StaticPool / SingletonThreadPool); nothing to pool
+        return options
+    if config.pool is not None:
+        options.update(
+            poolclass=_instrumented(AsyncAdaptedQueuePool if is_async else QueuePool, stats),
+            pool_size=config.pool.size,
+            max_overflow=config.pool.max_overflow,
+            pool_timeout=config.pool.timeout,
+            pool_recycle=config.pool.recycle_seconds,
+            # A local SQLite file cannot go away underneath the pool
+            pool_pre_ping=config.pool.pre_ping and backend != "sqlite",
+        )
+    if backend == "postgresql" and config.postgres is not None:
+        settings = {"application_name": config.postgres.application_name}
+        if config.postgres.statement_timeout_ms:
+            settings["statement_timeout"] = str(config.postgres.statement_timeout_ms)
+        if parsed.get_driver_name() == "asyncpg":
+            options["connect_args"] = {"server_settings": settings}
+        else:
+            options["connect_args"] = {"options": " ".join(f"-c {k}={v}" for k, v in settings.items())}
+    return options
+
+def install_tuning(engine, config) -> None:
+    """Apply per-connection settings (SQLite PRAGMAs) to every new connection of ``engine``."""
+    if engine.dialect.name != "sqlite" or config.sqlite is None:
+        return
+    tuning: SQLiteTuning = config.sqlite
+    pragmas = [
+        # Must precede the switch to WAL to take effect on a new database
+        "PRAGMA auto_vacuum = INCREMENTAL",
+        f"PRAGMA journal_mode = {tuning.journal_mode}",
+        f"PRAGMA synchronous = {tuning.synchronous}",
+        f"PRAGMA mmap_size = {int(tuning.mmap_size)}",
+        f"PRAGMA busy_timeout = {int(tuning.busy_timeout_ms)}",
+        f"PRAGMA cache_size = -{int(tuning.cache_size_kb)}",
+    ]
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+class MaintenanceConfig(BaseModel):
+    # Seconds between maintenance passes (the first runs at startup)
+    interval_seconds: float = 3600.0
+    # Expired rows deleted per transaction
+    batch_size: int = 500
+    # Pause between batches so /chat writes get the database in between
+    pause_seconds: float = 0.05
+    # Free pages handed back to the filesystem per pass (SQLite); 0 disables
+    vacuum_pages: int = 2000
+    # Log progress every this many deleted rows
+    progress_every: int = 50000
+
+@dataclass
+class MaintenanceRun:
+    expired: int = 0
+    archive_expired: int = 0
+    reclaimed_pages: int = 0
+    elapsed: float = 0.0
+
+class MemoryMaintenance:
+    """Background expiry and space reclamation for an AsyncMemorySystem.
+
+    Each pass deletes expired memories in small transactions, oldest first
+    along the created_at index, then runs a bounded incremental vacuum.
+    """
+
+    def __init__(self, memory_system, config: MaintenanceConfig):
+        self.memory_system = memory_system
+        self.config = config
+        self._task: Optional[asyncio.Task] = None
+        self._reported = 0
+        self.runs = 0
+        self.expired = 0
+        self.archive_expired = 0
+        self.reclaimed_pages = 0
+        self.running = False
+        self.last_run: Optional[MaintenanceRun] = None
+        self.last_run_at: Optional[datetime] = None
+
+    async def run_once(self) -> MaintenanceRun:
+        started = time.perf_counter()
+        self.running = True
+        self._reported = 0
+        try:
+            expired, archive_expired = await self.memory_system.expire_memories(
+                batch_size=self.config.batch_size,
+                pause=self.config.pause_seconds,
+                progress=self._progress
+            )
+            reclaimed = await self.memory_system.reclaim_space(self.config.vacuum_pages)
+        finally:
+            self.running = False
+        run = MaintenanceRun(expired, archive_expired, reclaimed, time.perf_counter() - started)
+        self.runs += 1
+        self.expired += run.expired
+        self.archive_expired += run.archive_expired
+        self.reclaimed_pages += run.reclaimed_pages
+        self.last_run = run
+        self.last_run_at = datetime.utcnow()
+        if run.expired or run.archive_expired or run.reclaimed_pages:
+            logger.info(
+                "記憶維護完成: 刪除 %d 則過期記憶、%d 則封存記憶，回收 %d 頁，耗時 %.1f 秒",
+                run.expired, run.archive_expired, run.reclaimed_pages, run.elapsed
+            )
+        return run
+
+    def _progress(self, expired: int, archive_expired: int) -> None:
+        total = expired + archive_expired
+        if total - self._reported >= self.config.progress_every:
+            self._reported = total
+            logger.info("記憶維護進行中: 已刪除 %d 則過期記憶、%d 則封存記憶", expired, archive_expired)
+
+    def start(self) -> None:
+        """Run a pass now and then every ``interval_seconds`` until stop()."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run_forever(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error("記憶維護時發生錯誤: %s", e)
+            await asyncio.sleep(self.config.interval_seconds)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "runs": self.runs,
+            "expired": self.expired,
+            "archive_expired": self.archive_expired,
+            "reclaimed_pages": self.reclaimed_pages,
+            "running": self.running,
+            "last_run_seconds": self.last_run.elapsed if self.last_run else 0.0,
+        }
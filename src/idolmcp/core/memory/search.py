@@ -0,0 +1,95 @@
+import math
+import re
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+# Pseudo-term stored once per memory; its tf is the memory's length in terms,
+# so per-user document count and average length come from the same index
+DOC_TERM = ""
+# Query terms beyond this are ignored
+MAX_QUERY_TERMS = 32
+# Only the newest postings of each term are scored, bounding the work for
+# terms that occur in tens of thousands of a heavy user's memories
+MAX_POSTINGS = 1000
+# Terms in more than this share of a user's memories (and more than
+# MAX_POSTINGS of them) carry almost no signal and are skipped when rarer
+# terms are present
+MAX_DF_RATIO = 0.3
+
+# Runs of CJK characters (kana, ideographs, hangul) vs. runs of letters/digits
+_TOKEN = re.compile(r"([぀-ヿ㐀-䶿一-鿿가-힯]+)|([^\W_]+)")
+
+def tokenize(text: str) -> List[str]:
+    """Split text into search terms: CJK runs become overlapping bigrams, other words stay whole."""
+    terms = []
+    for cjk, word in _TOKEN.findall(unicodedata.normalize("NFKC", text).casefold()):
+        if cjk:
+            if len(cjk) == 1:
+                terms.append(cjk)
+            else:
+                terms.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+        else:
+            terms.append(word)
+    return terms
+
+def term_counts(text: str) -> Counter:
+    return Counter(tokenize(text))
+
+def query_terms(query: str) -> List[str]:
+    return list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+
+def idf(doc_count: int, df: int) -> float:
+    return math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+
+def term_weights(doc_count: int, dfs: Dict[str, int]) -> Dict[str, float]:
+    """IDF weight per query term that occurs for the user, minus near-ubiquitous ones."""
+    present = {term: df for term, df in dfs.items() if df > 0}
+    rare = {
+        term: df for term, df in present.items()
+        if df <= MAX_POSTINGS or df <= doc_count * MAX_DF_RATIO
+    }
+    return {term: idf(doc_count, df) for term, df in (rare or present).items()}
+
+class SearchStatsCache:
+    """Per-user (document count, total length) for BM25 normalisation.
+
+    Counting a heavy user's index costs more than scoring a query, and the
+    figures drift slowly, so they are reused for ``ttl`` seconds. Users with
+    fewer than ``min_docs`` memories are not cached: their count is cheap and
+    their averages still move with every message.
+    """
+
+    def __init__(self, ttl: float = 60.0, min_docs: int = 1000, max_users: int = 10000):
+        self.ttl = ttl
+        self.min_docs = min_docs
+        self.max_users = max_users
+        self._entries: "OrderedDict[str, Tuple[float, int, int]]" = OrderedDict()
+
+    def get(self, user_id: str) -> Optional[Tuple[int, int]]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        expires_at, doc_count, total_length = entry
+        if expires_at <= time.monotonic():
+            del self._entries[user_id]
+            return None
+        return doc_count, total_length
+
+    def put(self, user_id: str, doc_count: int, total_length: int) -> None:
+        if doc_count < self.min_docs:
+            return
+        self._entries[user_id] = (time.monotonic() + self.ttl, doc_count, total_length)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_users:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str) -> None:
+        self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
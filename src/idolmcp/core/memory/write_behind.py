@@ -0,0 +1,243 @@
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import Enum
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+class Durability(Enum):
+    # store_memory returns once queued; a crash loses at most one flush interval
+    RELAXED = "relaxed"
+    # store_memory returns after the batch holding the message has committed
+    GROUP_COMMIT = "group_commit"
+
+class WriteBehindConfig(BaseModel):
+    batch_size: int = 200
+    flush_interval: float = 0.5
+    max_pending: int = 10000
+    durability: Durability = Durability.RELAXED
+    # Relaxed mode: failed flushes of the head batch (backing off between them) before it is
+    # written row by row and the rows that still fail are moved to the dead letters
+    max_retries: int = 3
+    max_dead_letters: int = 1000
+    # close() keeps retrying failed flushes (with the same backoff) this long, then
+    # moves whatever is still queued to the dead letters
+    close_timeout: float = 10.0
+
+@dataclass
+class PendingMemory:
+    user_id: str
+    content: str
+    tags: List[str]
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    committed: Optional[asyncio.Future] = None
+
+class WriteBehindQueue:
+    """In-process buffer that flushes memory writes in bulk transactions.
+
+    Writes are flushed when ``batch_size`` messages are waiting or every
+    ``flush_interval`` seconds, whichever comes first. Once ``max_pending``
+    messages are buffered, producers wait for a flush instead of growing the
+    queue without bound. In relaxed mode a batch that keeps failing is retried
+    with exponential backoff, then split so one bad row cannot block the
+    writes behind it; rows that fail on their own end up in ``dead_letters``.
+    """
+
+    def __init__(self, config: WriteBehindConfig, flush: Callable[[List[PendingMemory]], Awaitable[None]]):
+        self.config = config
+        self._flush = flush
+        self._pending: List[PendingMemory] = []
+        self._by_user: Dict[str, Deque[PendingMemory]] = {}
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Condition()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        self._failures = 0
+        self.dead_letters: Deque[PendingMemory] = deque(maxlen=config.max_dead_letters)
+        self.flushed_batches = 0
+        self.flushed_memories = 0
+        self.dropped_memories = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def put(self, user_id: str, content: str, tags: List[str]) -> PendingMemory:
+        """Queue a memory write, waiting for room if the buffer is full."""
+        return (await self.put_many([(user_id, content, tags)]))[0]
+
+    async def put_many(self, items: List[Tuple[str, str, List[str]]]) -> List[PendingMemory]:
+        """Queue (user_id, content, tags) writes in order; with group commit, wait until all have committed.
+
+        Everything is queued before waiting, so a batch shares flushes instead of
+        waiting out one flush interval per message.
+        """
+        if self._closed:
+            raise RuntimeError("write-behind queue is closed")
+        self._ensure_running()
+        queued = []
+        async with self._space:
+            for user_id, content, tags in items:
+                while len(self._pending) >= self.config.max_pending:
+                    self._wakeup.set()
+                    await self._space.wait()
+                item = PendingMemory(user_id=user_id, content=content, tags=list(tags))
+                if self.config.durability == Durability.GROUP_COMMIT:
+                    item.committed = asyncio.get_running_loop().create_future()
+                self._pending.append(item)
+                self._by_user.setdefault(user_id, deque()).append(item)
+                queued.append(item)
+                if len(self._pending) >= self.config.batch_size:
+                    self._wakeup.set()
+        committed = [item.committed for item in queued if item.committed is not None]
+        if committed:
+            # Shielded so a cancelled caller cannot cancel the futures the flusher resolves
+            results = await asyncio.shield(asyncio.gather(*committed, return_exceptions=True))
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+        return queued
+
+    def pending_for(self, user_id: str) -> List[PendingMemory]:
+        """Unflushed writes for a user, oldest first."""
+        return list(self._by_user.get(user_id, ()))
+
+    async def flush(self) -> None:
+        """Flush everything queued so far."""
+        while self._pending:
+            if not await self._flush_batch():
+                break
+
+    async def close(self) -> None:
+        """Stop the background flusher and write out whatever is still queued.
+
+        Failed flushes are retried with the usual backoff for up to
+        ``close_timeout`` seconds; writes still queued after that are moved to
+        ``dead_letters`` (group-commit callers get an error) rather than lost.
+        """
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.config.close_timeout
+        while self._pending:
+            if await self._flush_batch():
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            if self._failures:
+                await asyncio.sleep(min(self.config.flush_interval * 2 ** self._failures, remaining))
+        if self._pending:
+            batch = list(self._pending)
+            logger.error("關閉時仍有 %d 條記憶未寫入，已移至 dead letters", len(batch))
+            await self._forget(batch)
+            error = RuntimeError("write-behind queue closed before the write was flushed")
+            for item in batch:
+                if item.committed is not None and not item.committed.done():
+                    item.committed.set_exception(error)
+            self.dead_letters.extend(batch)
+            self.dropped_memories += len(batch)
+
+    def _ensure_running(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            if self._failures:
+                # Back off after a failed flush; a full buffer must not turn retries into a tight loop
+                await asyncio.sleep(self.config.flush_interval * 2 ** self._failures)
+            else:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.config.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._wakeup.clear()
+            while self._pending:
+                if not await self._flush_batch():
+                    break
+                if len(self._pending) < self.config.batch_size:
+                    break
+
+    async def _flush_batch(self) -> bool:
+        async with self._flush_lock:
+            batch = self._pending[:self.config.batch_size]
+            if not batch:
+                return True
+            try:
+                await self._flush(batch)
+            except Exception as e:
+                logger.error("批次寫入記憶時發生錯誤: %s", e)
+                if self.config.durability != Durability.GROUP_COMMIT:
+                    self._failures += 1
+                    if self._failures <= self.config.max_retries:
+                        # Keep the batch queued and retry after the backoff
+                        return False
+                    await self._flush_rows(batch)
+                    return True
+                # Waiting callers learn about the failure; nobody else will retry it
+                await self._forget(batch)
+                for item in batch:
+                    if not item.committed.done():
+                        item.committed.set_exception(e)
+                return False
+
+            self._failures = 0
+            await self._forget(batch)
+            for item in batch:
+                if item.committed is not None and not item.committed.done():
+                    item.committed.set_result(None)
+            self.flushed_batches += 1
+            self.flushed_memories += len(batch)
+            return True
+
+    async def _flush_rows(self, batch: List[PendingMemory]) -> None:
+        """Write a batch that kept failing one row at a time, dead-lettering the rows that fail."""
+        self._failures = 0
+        for item in batch:
+            try:
+                await self._flush([item])
+                self.flushed_memories += 1
+            except Exception as e:
+                self.dead_letters.append(item)
+                self.dropped_memories += 1
+                logger.error("記憶寫入重試 %d 次仍失敗，已丟棄: user_id=%s content=%.50r 錯誤: %s",
+                             self.config.max_retries, item.user_id, item.content, e)
+        await self._forget(batch)
+
+    async def _forget(self, batch: List[PendingMemory]) -> None:
+        # Batches are always taken from the head, so each user's oldest items go first
+        del self._pending[:len(batch)]
+        for item in batch:
+            user_items = self._by_user[item.user_id]
+            user_items.popleft()
+            if not user_items:
+                del self._by_user[item.user_id]
+        async with self._space:
+            self._space.notify_all()
+
+def merge_pending(
+    pending: List[PendingMemory],
+    memories: List[Dict],
+    tags: Optional[List[str]],
+    limit: int
+) -> List[Dict]:
+    """Overlay a user's unflushed writes on top of the rows read from the database."""
+    seen = {(m["content"], m["created_at"]) for m in memories}
+    unflushed = [
+        {"content": item.content, "tags": item.tags, "created_at": item.created_at}
+        for item in reversed(pending)
+        if (not tags or all(tag in item.tags for tag in tags))
+        and (item.content, item.created_at) not in seen
+    ]
+    return (unflushed + memories)[:limit]
@@ -0,0 +1,219 @@
+import time
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Seconds; spans a cache hit to a slow LLM reply
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+class HistogramChild:
+    """Bucket counts and sum for one label set, in arrays sized once.
+
+    observe() is a bisect and two in-place array updates: no per-observation
+    storage, unlike the sample windows behind the percentile stats().
+    """
+
+    __slots__ = ("_bounds", "_counts", "_sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._bounds = bounds
+        # One slot per bound plus +Inf
+        self._counts = array("Q", bytes(8 * (len(bounds) + 1)))
+        self._sum = array("d", [0.0])
+
+    def observe(self, value: float) -> None:
+        self._counts[bisect_left(self._bounds, value)] += 1
+        self._sum[0] += value
+
+    @property
+    def count(self) -> int:
+        return sum(self._counts)
+
+class CounterChild:
+    __slots__ = ("_value",)
+
+    def __init__(self):
+        self._value = array("d", [0.0])
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._value[0] += amount
+
+    @property
+    def value(self) -> float:
+        return self._value[0]
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, *values: str):
+        """The child for one label set; keep it around on hot paths instead of looking it up each time."""
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    @abstractmethod
+    def _new_child(self):
+        ...
+
+    @abstractmethod
+    def _render_child(self, out: List[str], values: Tuple[str, ...], child) -> None:
+        ...
+
+    def render(self, out: List[str]) -> None:
+        out.append(f"# HELP {self.name} {self.help}")
+        out.append(f"# TYPE {self.name} {self.kind}")
+        for values, child in self._children.items():
+            self._render_child(out, values, child)
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> HistogramChild:
+        return HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _render_child(self, out: List[str], values, child: HistogramChild) -> None:
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), child._counts):
+            cumulative += count
+            le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+            out.append(f"{self.name}_bucket{_labels(self.label_names, values, le)} {cumulative}")
+        out.append(f"{self.name}_sum{_labels(self.label_names, values)} {_number(child._sum[0])}")
+        out.append(f"{self.name}_count{_labels(self.label_names, values)} {cumulative}")
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> CounterChild:
+        return CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def _render_child(self, out: List[str], values, child: CounterChild) -> None:
+        out.append(f"{self.name}{_labels(self.label_names, values)} {_number(child.value)}")
+
+class MetricsRegistry:
+    """Metrics of one process, rendered in the Prometheus text format.
+
+    Besides its own histograms and counters it exports the stats() dicts the
+    components already keep (caches, admission, pools, background jobs) as
+    gauges named <namespace>_<subsystem>_<key>, read at scrape time.
+    """
+
+    def __init__(self, namespace: str = "idolmcp"):
+        self.namespace = namespace
+        self._metrics: List[_Metric] = []
+        self._stats: List[Tuple[str, Callable[[], Dict[str, float]]]] = []
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(f"{self.namespace}_{name}", help, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        metric = Counter(f"{self.namespace}_{name}", help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def stats(self, subsystem: str, source: Callable[[], Dict[str, float]]) -> None:
+        """Export the numeric values of ``source()`` as gauges on every scrape."""
+        self._stats.append((subsystem, source))
+
+    def render(self) -> str:
+        out: List[str] = []
+        for metric in self._metrics:
+            metric.render(out)
+        for subsystem, source in self._stats:
+            for key, value in source().items():
+                if isinstance(value, (int, float)):
+                    name = f"{self.namespace}_{subsystem}_{key}"
+                    out.append(f"# TYPE {name} gauge")
+                    out.append(f"{name} {_number(value)}")
+        out.append("")
+        return "\n".join(out)
+
+class PipelineMetrics:
+    """Latency per /chat pipeline stage and estimated LLM token counts."""
+
+    def __init__(self, registry: MetricsRegistry):
+        self.stage_seconds = registry.histogram(
+            "stage_seconds", "Latency of one chat pipeline stage", ("stage",)
+        )
+        self.llm_tokens = registry.counter(
+            "llm_tokens_total", "Estimated tokens sent to and received from the LLM provider", ("direction",)
+        )
+        self.llm_calls = registry.counter("llm_calls_total", "LLM provider calls by outcome", ("outcome",))
+        self.tokens_in = self.llm_tokens.labels("in")
+        self.tokens_out = self.llm_tokens.labels("out")
+        self._stages: Dict[str, HistogramChild] = {}
+
+    def stage(self, name: str) -> HistogramChild:
+        child = self._stages.get(name)
+        if child is None:
+            child = self._stages[name] = self.stage_seconds.labels(name)
+        return child
+
+    def observe(self, stage: str, started: float) -> float:
+        """Record the time since ``started`` (perf_counter) for ``stage``; returns now for the next stage."""
+        now = time.perf_counter()
+        self.stage(stage).observe(now - started)
+        return now
+
+class MetricsMiddleware:
+    """ASGI middleware counting requests and timing them per path and status.
+
+    Paths outside ``paths`` share the label "other" so unknown URLs cannot
+    grow the number of series.
+    """
+
+    def __init__(self, app, registry: MetricsRegistry, paths: Iterable[str]):
+        self.app = app
+        self.paths = set(paths)
+        self.requests = registry.counter("http_requests_total", "HTTP requests by path and status", ("path", "status"))
+        self.latency = registry.histogram("http_request_seconds", "HTTP request latency until the response ends", ("path",))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        path = scope["path"] if scope["path"] in self.paths else "other"
+        status = "500"
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.latency.labels(path).observe(time.perf_counter() - started)
+            self.requests.labels(path, status).inc()
@@ -10,9 +10,25 @@ class PersonaConfig(BaseModel):
     memory_tags: List[str]
 
 class Persona:
-    def __init__(self, config: PersonaConfig):
+    MOOD_KEY = "persona:mood"
+
+    def __init__(self, config: PersonaConfig, state=None):
         self.config = config
+        # Optional StateBackend so every worker process shares one mood
+        self.state = state
         self.current_mood: str = "neutral"
+
+    async def refresh_mood(self) -> str:
+        """Reload current_mood from the shared state, if any, e.g. before get_response_style()."""
+        if self.state is not None:
+            self.current_mood = await self.state.get(self.MOOD_KEY) or self.current_mood
+        return self.current_mood
+
+    async def set_mood(self, mood: str) -> None:
+        """adjust_mood() that also reaches the other worker processes through the shared state."""
+        self.adjust_mood(mood)
+        if self.state is not None:
+            await self.state.set(self.MOOD_KEY, mood)
     
     def get_response_style(self) -> Dict[str, str]:
         """Get the current response style based on mood and persona config."""
@@ -23,5 +39,5 @@ class Persona:
         }
     
     def adjust_mood(self, mood: str) -> None:
-        """Adjust the persona's current mood."""
+        """Adjust the persona's current mood in this process."""
         self.current_mood = mood 
\ No newline at end of file
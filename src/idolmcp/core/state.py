@@ -0,0 +1,191 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from enum import Enum
+from typing import Optional, Union
+from pydantic import BaseModel
+
+class StateBackendType(str, Enum):
+    # Per-process state; only correct with a single worker
+    MEMORY = "memory"
+    # SQLite file shared by the workers of one host (on tmpfs when available)
+    SQLITE = "sqlite"
+    # Redis (or a compatible server) shared by every host
+    REDIS = "redis"
+
+def default_sqlite_path() -> str:
+    # /dev/shm is a tmpfs: the file lives in shared memory and never touches the disk
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, "idolmcp_state.db")
+
+class StateConfig(BaseModel):
+    backend: StateBackendType = StateBackendType.MEMORY
+    sqlite_path: Optional[str] = None
+    redis_url: str = "redis://localhost:6379/0"
+    # Prepended to every key so several deployments can share one Redis
+    key_prefix: str = "idolmcp:"
+
+class StateBackend(ABC):
+    """String key/value store with expiry, shared by every worker process.
+
+    Holds the small per-user state (emotion, persona mood) that must look the
+    same whichever worker serves a request, plus leases used to pick the one
+    worker that runs background jobs. Every call is a coroutine: a lock wait
+    or a network round trip must never stall the event loop.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    async def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        """Take or renew the lease ``name`` for ``owner``; False while another owner holds it."""
+        ...
+
+    @abstractmethod
+    async def release(self, name: str, owner: str) -> None:
+        """Give up the lease if ``owner`` still holds it."""
+        ...
+
+    async def purge_expired(self) -> int:
+        """Drop expired keys; returns how many were removed."""
+        return 0
+
+    async def close(self) -> None:
+        pass
+
+class SQLiteStateBackend(StateBackend):
+    """StateBackend on a SQLite file in WAL mode, for workers on one host.
+
+    Every operation is a single statement, so concurrent workers never see a
+    half-written value; lease acquisition is one conditional upsert. The
+    statements run on a worker thread, where waiting out another worker's
+    write lock (up to ``busy_timeout`` seconds) does not block the event loop.
+    """
+
+    def __init__(self, path: Optional[str] = None, key_prefix: str = "", clock=time.time, busy_timeout: float = 5.0):
+        self.path = path or default_sqlite_path()
+        self.key_prefix = key_prefix
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=busy_timeout, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS state ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL"
+            ") WITHOUT ROWID"
+        )
+
+    def _expiry(self, ttl: Optional[float]) -> Optional[float]:
+        return self._clock() + ttl if ttl is not None else None
+
+    def _execute(self, sql: str, params: tuple, fetch: bool) -> Union[Optional[tuple], int]:
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            return cursor.fetchone() if fetch else cursor.rowcount
+
+    async def _run(self, sql: str, params: tuple, fetch: bool = False) -> Union[Optional[tuple], int]:
+        """Run one statement on a worker thread; returns the first row if ``fetch``, else the row count."""
+        return await asyncio.to_thread(self._execute, sql, params, fetch)
+
+    async def get(self, key: str) -> Optional[str]:
+        row = await self._run("SELECT value, expires_at FROM state WHERE key = ?", (self.key_prefix + key,), fetch=True)
+        if row is None or (row[1] is not None and row[1] <= self._clock()):
+            return None
+        return row[0]
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        await self._run(
+            "INSERT INTO state (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+            (self.key_prefix + key, value, self._expiry(ttl))
+        )
+
+    async def delete(self, key: str) -> None:
+        await self._run("DELETE FROM state WHERE key = ?", (self.key_prefix + key,))
+
+    async def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        updated = await self._run(
+            "INSERT INTO state (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at "
+            "WHERE state.value = excluded.value OR state.expires_at <= ?",
+            (self.key_prefix + name, owner, self._expiry(ttl), self._clock())
+        )
+        return updated == 1
+
+    async def release(self, name: str, owner: str) -> None:
+        await self._run("DELETE FROM state WHERE key = ? AND value = ?", (self.key_prefix + name, owner))
+
+    async def purge_expired(self) -> int:
+        return await self._run("DELETE FROM state WHERE expires_at <= ?", (self._clock(),))
+
+    async def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+class RedisStateBackend(StateBackend):
+    """StateBackend on Redis or any server speaking its protocol (Valkey, KeyDB, ...).
+
+    Needs the optional ``redis`` package and uses its asyncio client; keys
+    expire server-side.
+    """
+
+    def __init__(self, url: str, key_prefix: str = "", client=None):
+        if client is None:
+            try:
+                import redis.asyncio as redis
+            except ImportError as e:
+                raise ImportError("The redis state backend requires the 'redis' package (pip install redis)") from e
+            client = redis.Redis.from_url(url, decode_responses=True)
+        self.key_prefix = key_prefix
+        self._client = client
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._client.get(self.key_prefix + key)
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        await self._client.set(self.key_prefix + key, value, px=int(ttl * 1000) if ttl is not None else None)
+
+    async def delete(self, key: str) -> None:
+        await self._client.delete(self.key_prefix + key)
+
+    async def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        key = self.key_prefix + name
+        if await self._client.set(key, owner, nx=True, px=int(ttl * 1000)):
+            return True
+        # Renewal; the lease can lapse between the two calls, costing at most one skipped renewal
+        if await self._client.get(key) == owner:
+            return bool(await self._client.pexpire(key, int(ttl * 1000)))
+        return False
+
+    async def release(self, name: str, owner: str) -> None:
+        key = self.key_prefix + name
+        if await self._client.get(key) == owner:
+            await self._client.delete(key)
+
+    async def close(self) -> None:
+        # aclose() from redis-py 5; close() is the coroutine before that
+        close = getattr(self._client, "aclose", None) or self._client.close
+        await close()
+
+def create_state_backend(config: StateConfig) -> Optional[StateBackend]:
+    """Backend for ``config``; None for MEMORY, where callers keep state in-process."""
+    if config.backend == StateBackendType.SQLITE:
+        return SQLiteStateBackend(config.sqlite_path, config.key_prefix)
+    if config.backend == StateBackendType.REDIS:
+        return RedisStateBackend(config.redis_url, config.key_prefix)
+    return None
@@ -1,25 +1,54 @@
 import asyncio
-from typing import Dict, Optional
+import json
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Set, Tuple
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
 import os
 import uvicorn
 import logging
+import math
+import socket
+import time
 import traceback
 
 from core.persona import Persona, PersonaConfig
-from core.emotion import EmotionEngine, EmotionConfig, EmotionState
-from core.memory import MemorySystem, MemoryConfig
+from core.emotion import EmotionConfig, EmotionState
+from core.emotion.store import EmotionStateStore, EmotionStoreConfig, SharedEmotionStateStore
+from core.memory import MemoryConfig
+from core.memory.async_memory import AsyncMemorySystem
+from core.memory.cache import MemoryCacheConfig
+from core.memory.engine import PoolConfig, PostgresTuning, SQLiteTuning
+from core.memory.compaction import CompactionConfig, ExtractiveSummarizer, LLMSummarizer, MemoryCompactor
+from core.memory.maintenance import MaintenanceConfig, MemoryMaintenance
+from core.memory.write_behind import Durability, WriteBehindConfig
 from core.llm import LLMService, LLMConfig, LLMProvider
+from core.llm.admission import AdmissionConfig, LLMOverloadedError
+from core.llm.stub import LatencyDistribution, StubConfig
+from core.llm.cache import ResponseCacheConfig
+from core.llm.context import ContextConfig
+from core.idol_log import IdolLog
+from core.idol_log_store import SegmentLogConfig, SegmentLogStore
+from core.state import StateBackendType, StateConfig, create_state_backend
+from core.log_config import LoggingConfig, RequestIdMiddleware, parse_sample_rates, setup_logging
+from core.metrics import MetricsMiddleware, MetricsRegistry, PipelineMetrics
+
+load_dotenv()
 
 # 配置日誌
-logging.basicConfig(level=logging.DEBUG)
+log_handler = setup_logging(LoggingConfig(
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    json_format=os.getenv("LOG_FORMAT", "text").lower() == "json",
+    background=os.getenv("LOG_BACKGROUND", "true").lower() == "true",
+    queue_size=int(os.getenv("LOG_QUEUE_SIZE", "10000")),
+    sample_rates=parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", "")),
+    lean_records=os.getenv("LOG_LEAN_RECORDS", "false").lower() == "true"
+))
 logger = logging.getLogger(__name__)
 
-load_dotenv()
-
 class ChatRequest(BaseModel):
     user_id: str
     message: str
@@ -30,10 +59,42 @@ class ChatResponse(BaseModel):
     emotion: str
     emotion_intensity: float
 
+class ChatBatchRequest(BaseModel):
+    requests: List[ChatRequest]
+
+class ChatBatchResult(BaseModel):
+    # The status /chat would have returned for this message
+    status: int
+    response: Optional[ChatResponse] = None
+    error: Optional[str] = None
+
+class ChatBatchResponse(BaseModel):
+    results: List[ChatBatchResult]
+
 class IdolMCP:
+    # Held by the one worker that runs compaction and maintenance
+    JOBS_LEASE = "lease:memory-jobs"
+    # Held while a worker creates the schema; CREATE TABLE from several workers at once fails
+    SCHEMA_LEASE = "lease:schema"
+    
     def __init__(self):
         try:
             logger.info("初始化 IdolMCP 配置...")
+            self.workers = int(os.getenv("WORKERS", "1"))
+            self.state_config = StateConfig(
+                backend=StateBackendType(os.getenv("STATE_BACKEND", "memory")),
+                sqlite_path=os.getenv("STATE_SQLITE_PATH") or None,
+                redis_url=os.getenv("STATE_REDIS_URL", "redis://localhost:6379/0"),
+                key_prefix=os.getenv("STATE_KEY_PREFIX", "idolmcp:")
+            )
+            self.jobs_lease_seconds = float(os.getenv("STATE_JOBS_LEASE_SECONDS", "30"))
+            self.batch_max_size = int(os.getenv("CHAT_BATCH_MAX_SIZE", "100"))
+            self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+            if self.workers > 1 and self.state_config.backend == StateBackendType.MEMORY:
+                logger.warning("多個 worker 時 STATE_BACKEND=memory 會讓各 worker 的情緒狀態不一致，建議改用 sqlite 或 redis")
+            if self.workers > 1 and os.getenv("IDOL_LOG_DIR"):
+                logger.warning("多個 worker 不能共用同一個 IDOL_LOG_DIR，請改為每個 worker 各自的目錄或關閉持久化")
+            
             # Initialize configurations
             self.persona_config = PersonaConfig(
                 name=os.getenv("PERSONA_NAME", "星野 琴音"),
@@ -58,7 +119,51 @@ class IdolMCP:
             self.memory_config = MemoryConfig(
                 db_url=os.getenv("DATABASE_URL", "sqlite:///idolmcp.db"),
                 max_memories_per_user=int(os.getenv("MAX_MEMORIES", "100")),
-                memory_expiry_days=int(os.getenv("MEMORY_EXPIRY_DAYS", "30"))
+                memory_expiry_days=int(os.getenv("MEMORY_EXPIRY_DAYS", "30")),
+                write_behind=WriteBehindConfig(
+                    batch_size=int(os.getenv("MEMORY_WRITE_BATCH_SIZE", "200")),
+                    flush_interval=float(os.getenv("MEMORY_WRITE_FLUSH_INTERVAL", "0.5")),
+                    max_pending=int(os.getenv("MEMORY_WRITE_MAX_PENDING", "10000")),
+                    durability=Durability(os.getenv("MEMORY_WRITE_DURABILITY", "relaxed")),
+                    max_retries=int(os.getenv("MEMORY_WRITE_MAX_RETRIES", "3")),
+                    close_timeout=float(os.getenv("MEMORY_WRITE_CLOSE_TIMEOUT", "10"))
+                ) if os.getenv("MEMORY_WRITE_BEHIND", "false").lower() == "true" else None,
+                cache=MemoryCacheConfig(
+                    max_entries=int(os.getenv("MEMORY_CACHE_SIZE", "10000")),
+                    ttl_seconds=float(os.getenv("MEMORY_CACHE_TTL", "300"))
+                # Per-process: with several workers a write only invalidates its own worker's copy
+                ) if (os.getenv("MEMORY_CACHE") or ("true" if self.workers == 1 else "false")).lower() == "true" else None,
+                search_results=int(os.getenv("MEMORY_SEARCH_RESULTS", "0")),
+                compaction=CompactionConfig(
+                    min_age_hours=float(os.getenv("MEMORY_COMPACTION_MIN_AGE_HOURS", "24")),
+                    keep_recent=int(os.getenv("MEMORY_COMPACTION_KEEP_RECENT", "50")),
+                    batch_size=int(os.getenv("MEMORY_COMPACTION_BATCH_SIZE", "50")),
+                    max_batches_per_second=float(os.getenv("MEMORY_COMPACTION_RATE", "2")),
+                    interval_seconds=float(os.getenv("MEMORY_COMPACTION_INTERVAL", "600"))
+                ) if os.getenv("MEMORY_COMPACTION", "false").lower() == "true" else None,
+                maintenance=MaintenanceConfig(
+                    interval_seconds=float(os.getenv("MEMORY_MAINTENANCE_INTERVAL", "3600")),
+                    batch_size=int(os.getenv("MEMORY_EXPIRY_BATCH_SIZE", "500")),
+                    pause_seconds=float(os.getenv("MEMORY_EXPIRY_PAUSE", "0.05")),
+                    vacuum_pages=int(os.getenv("MEMORY_VACUUM_PAGES", "2000"))
+                # Opt-in: a pass deletes memories older than MEMORY_EXPIRY_DAYS
+                ) if os.getenv("MEMORY_MAINTENANCE", "false").lower() == "true" else None,
+                pool=PoolConfig(
+                    size=int(os.getenv("MEMORY_DB_POOL_SIZE", "10")),
+                    max_overflow=int(os.getenv("MEMORY_DB_MAX_OVERFLOW", "20")),
+                    timeout=float(os.getenv("MEMORY_DB_POOL_TIMEOUT", "30")),
+                    recycle_seconds=int(os.getenv("MEMORY_DB_POOL_RECYCLE", "1800")),
+                    pre_ping=os.getenv("MEMORY_DB_PRE_PING", "true").lower() == "true"
+                ) if os.getenv("MEMORY_DB_POOL", "true").lower() == "true" else None,
+                sqlite=SQLiteTuning(
+                    journal_mode=os.getenv("MEMORY_SQLITE_JOURNAL_MODE", "WAL"),
+                    synchronous=os.getenv("MEMORY_SQLITE_SYNCHRONOUS", "NORMAL"),
+                    mmap_size=int(os.getenv("MEMORY_SQLITE_MMAP_MB", "256")) * 1024 * 1024,
+                    busy_timeout_ms=int(os.getenv("MEMORY_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+                ) if os.getenv("MEMORY_SQLITE_TUNING", "true").lower() == "true" else None,
+                postgres=PostgresTuning(
+                    statement_timeout_ms=int(os.getenv("MEMORY_PG_STATEMENT_TIMEOUT_MS", "5000"))
+                )
             )
             logger.info("Memory 配置完成")
             
@@ -67,20 +172,105 @@ class IdolMCP:
                 api_key=os.getenv("LLM_API_KEY"),
                 model_name=os.getenv("LLM_MODEL", "gemini-pro"),
                 temperature=float(os.getenv("LLM_TEMPERATURE", "0.7")),
-                max_tokens=int(os.getenv("LLM_MAX_TOKENS", "1000"))
+                max_tokens=int(os.getenv("LLM_MAX_TOKENS", "1000")),
+                cache=ResponseCacheConfig(
+                    max_entries=int(os.getenv("LLM_CACHE_SIZE", "5000")),
+                    ttl_seconds=float(os.getenv("LLM_CACHE_TTL", "3600")),
+                    variants_per_key=int(os.getenv("LLM_CACHE_VARIANTS", "3")),
+                    max_message_chars=int(os.getenv("LLM_CACHE_MAX_MESSAGE_CHARS", "32")),
+                    context_items=int(os.getenv("LLM_CACHE_CONTEXT_ITEMS")) if os.getenv("LLM_CACHE_CONTEXT_ITEMS") else None,
+                    db_path=os.getenv("LLM_CACHE_DB") or None
+                ) if os.getenv("LLM_CACHE", "false").lower() == "true" else None,
+                coalesce_requests=os.getenv("LLM_COALESCE", "true").lower() == "true",
+                admission=AdmissionConfig(
+                    rate_per_second=float(os.getenv("LLM_RATE_LIMIT")) if os.getenv("LLM_RATE_LIMIT") else None,
+                    burst=int(os.getenv("LLM_RATE_BURST", "10")),
+                    max_in_flight=int(os.getenv("LLM_MAX_IN_FLIGHT", "16")),
+                    max_queue=int(os.getenv("LLM_MAX_QUEUE", "256")),
+                    queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT", "10"))
+                ) if os.getenv("LLM_ADMISSION", "true").lower() == "true" else None,
+                context=ContextConfig(
+                    max_tokens=int(os.getenv("LLM_CONTEXT_TOKENS", "600")),
+                    max_item_chars=int(os.getenv("LLM_CONTEXT_ITEM_CHARS", "160"))
+                ) if os.getenv("LLM_CONTEXT_BUDGET", "true").lower() == "true" else None,
+                stub=StubConfig(
+                    first_token_delay=float(os.getenv("LLM_STUB_LATENCY", "0.2")),
+                    distribution=LatencyDistribution(os.getenv("LLM_STUB_DISTRIBUTION", "fixed")),
+                    jitter=float(os.getenv("LLM_STUB_JITTER", "0")),
+                    chunk_delay=float(os.getenv("LLM_STUB_CHUNK_DELAY", "0.02")),
+                    error_rate=float(os.getenv("LLM_STUB_ERROR_RATE", "0")),
+                    max_concurrency=int(os.getenv("LLM_STUB_MAX_CONCURRENCY")) if os.getenv("LLM_STUB_MAX_CONCURRENCY") else None,
+                    requests_per_second=float(os.getenv("LLM_STUB_RPS")) if os.getenv("LLM_STUB_RPS") else None
+                ),
+                # The client is created by the warm-up, after the server is listening
+                lazy_init=True
             )
             logger.info("LLM 配置完成")
             
             # Initialize components
             logger.info("初始化組件...")
-            self.persona = Persona(self.persona_config)
-            self.emotion_engine = EmotionEngine(self.emotion_config)
-            self.memory_system = MemorySystem(self.memory_config)
-            self.llm_service = LLMService(self.llm_config)
+            # Per process: with several workers each scrape sees the worker that answered it
+            self.metrics: Optional[MetricsRegistry] = None
+            self.pipeline_metrics: Optional[PipelineMetrics] = None
+            if os.getenv("METRICS", "true").lower() == "true":
+                self.metrics = MetricsRegistry()
+                self.pipeline_metrics = PipelineMetrics(self.metrics)
+            self.state = create_state_backend(self.state_config)
+            self.persona = Persona(self.persona_config, self.state)
+            emotion_store_config = EmotionStoreConfig(
+                max_entries=int(os.getenv("EMOTION_MAX_USERS", "500000")),
+                idle_ttl_seconds=float(os.getenv("EMOTION_IDLE_TTL", "3600"))
+            )
+            if self.state is not None:
+                self.emotion_store = SharedEmotionStateStore(self.emotion_config, self.state, emotion_store_config)
+            else:
+                self.emotion_store = EmotionStateStore(self.emotion_config, emotion_store_config)
+            self.memory_system = AsyncMemorySystem(self.memory_config)
+            log_dir = os.getenv("IDOL_LOG_DIR")
+            self.idol_log = IdolLog(
+                max_entries=int(os.getenv("IDOL_LOG_MAX_ENTRIES", "1000")),
+                store=SegmentLogStore(SegmentLogConfig(
+                    directory=log_dir,
+                    max_segments=int(os.getenv("IDOL_LOG_MAX_SEGMENTS")) if os.getenv("IDOL_LOG_MAX_SEGMENTS") else None,
+                    retention_seconds=float(os.getenv("IDOL_LOG_RETENTION_DAYS")) * 86400 if os.getenv("IDOL_LOG_RETENTION_DAYS") else None
+                )) if log_dir else None
+            )
+            self.llm_service = LLMService(self.llm_config, metrics=self.pipeline_metrics)
+            self.compactor: Optional[MemoryCompactor] = None
+            compaction = self.memory_config.compaction
+            if compaction is not None:
+                if os.getenv("MEMORY_COMPACTION_SUMMARIZER", "extractive") == "llm":
+                    summarizer = LLMSummarizer(self.llm_service.complete, compaction.summary_chars)
+                else:
+                    summarizer = ExtractiveSummarizer(compaction.summary_chars)
+                self.compactor = MemoryCompactor(self.memory_system, compaction, summarizer)
+            self.maintenance: Optional[MemoryMaintenance] = None
+            if self.memory_config.maintenance is not None:
+                self.maintenance = MemoryMaintenance(self.memory_system, self.memory_config.maintenance)
+            # Replies generated at once per /chat/batch; by default as many as admission lets run
+            admission = self.llm_config.admission
+            self.batch_concurrency = int(os.getenv("CHAT_BATCH_CONCURRENCY") or (
+                admission.max_in_flight if admission is not None else 16
+            ))
+            if self.metrics is not None:
+                self._register_metrics()
             logger.info("所有組件初始化完成")
             
+            # Fire-and-forget work (e.g. memory writes for streamed replies)
+            self._background_tasks: Set[asyncio.Task] = set()
+            self._jobs_task: Optional[asyncio.Task] = None
+            
+            # Readiness: set once the warm-up (schema, DB connections, LLM client) has finished
+            self.warm_connections = int(os.getenv("MEMORY_DB_WARM_CONNECTIONS") or (
+                self.memory_config.pool.size if self.memory_config.pool is not None else 1
+            ))
+            self.ready = False
+            self.not_ready_reason: Optional[str] = None
+            self._warmed_up = asyncio.Event()
+            self._warm_up_task: Optional[asyncio.Task] = None
+            
             # Initialize FastAPI app
-            self.app = FastAPI(title="IdolMCP API")
+            self.app = FastAPI(title="IdolMCP API", lifespan=self._lifespan)
             
             # 添加 CORS 中間件
             self.app.add_middleware(
@@ -89,58 +279,432 @@ class IdolMCP:
                 allow_credentials=True,
                 allow_methods=["*"],
                 allow_headers=["*"],
+                expose_headers=["X-Request-ID"],
             )
+            if self.metrics is not None:
+                self.app.add_middleware(
+                    MetricsMiddleware,
+                    registry=self.metrics,
+                    paths=["/chat", "/chat/batch", "/chat/stream", "/health", "/ready", "/metrics"]
+                )
+            # Outermost, so every log line of a request carries its ID
+            self.app.add_middleware(RequestIdMiddleware)
             
             self._setup_routes()
             logger.info("FastAPI 路由設置完成")
             
         except Exception as e:
-            logger.error(f"初始化過程中發生錯誤: {str(e)}")
+            logger.error("初始化過程中發生錯誤: %s", e)
             logger.error(traceback.format_exc())
             raise
     
+    @asynccontextmanager
+    async def _lifespan(self, app: FastAPI):
+        # The schema is in place before any request (or direct use of memory_system);
+        # the slower connection and LLM warm-up runs in the background so the server binds right away
+        await self._init_schema()
+        self._warm_up_task = asyncio.create_task(self._warm_up())
+        yield
+        self.ready = False
+        self.not_ready_reason = "shutting down"
+        self._warm_up_task.cancel()
+        await asyncio.gather(self._warm_up_task, return_exceptions=True)
+        if self._jobs_task is not None:
+            self._jobs_task.cancel()
+            await asyncio.gather(self._jobs_task, return_exceptions=True)
+        else:
+            await self._stop_jobs()
+        if self._background_tasks:
+            await asyncio.gather(*self._background_tasks, return_exceptions=True)
+        await self.memory_system.close()
+        if self.idol_log.store is not None:
+            self.idol_log.store.close()
+        if self.llm_service.cache is not None:
+            self.llm_service.cache.close()
+        if self.state is not None:
+            await self.state.close()
+    
+    async def _warm_up(self) -> None:
+        """Open DB connections and the LLM client, then start background jobs."""
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(
+                self.memory_system.warm_up(self.warm_connections),
+                asyncio.to_thread(self.llm_service.warm_up)
+            )
+            self.ready = True
+            logger.info("暖機完成，耗時 %.2f 秒", time.perf_counter() - started)
+        except Exception as e:
+            self.not_ready_reason = str(e)
+            logger.error("暖機時發生錯誤: %s", e)
+            logger.error(traceback.format_exc())
+        finally:
+            # Requests that arrived during the warm-up go ahead (and fail on their own if it failed)
+            self._warmed_up.set()
+        if not self.ready:
+            return
+        if self.state is None:
+            self._start_jobs()
+        else:
+            # Every worker runs this; only the lease holder runs the jobs
+            self._jobs_task = asyncio.create_task(self._lead_jobs())
+    
+    async def _wait_warmed_up(self) -> None:
+        if not self._warmed_up.is_set():
+            await self._warmed_up.wait()
+    
+    async def _init_schema(self) -> None:
+        if self.state is None:
+            await self.memory_system.init_schema()
+            return
+        while not await self.state.acquire(self.SCHEMA_LEASE, self.worker_id, 60):
+            await asyncio.sleep(0.1)
+        try:
+            await self.memory_system.init_schema()
+        finally:
+            await self.state.release(self.SCHEMA_LEASE, self.worker_id)
+    
+    def _start_jobs(self) -> None:
+        if self.compactor is not None:
+            self.compactor.start()
+        if self.maintenance is not None:
+            self.maintenance.start()
+    
+    async def _stop_jobs(self) -> None:
+        if self.maintenance is not None:
+            await self.maintenance.stop()
+        if self.compactor is not None:
+            await self.compactor.stop()
+    
+    async def _lead_jobs(self) -> None:
+        """Hold the jobs lease and run background jobs while holding it; renew at a third of its TTL."""
+        owner = self.worker_id
+        leading = False
+        try:
+            while True:
+                try:
+                    held = await self.state.acquire(self.JOBS_LEASE, owner, self.jobs_lease_seconds)
+                    if held:
+                        await self.state.purge_expired()
+                except Exception as e:
+                    logger.error("更新背景任務租約時發生錯誤: %s", e)
+                    held = False
+                if held and not leading:
+                    logger.info("worker %s 取得背景任務租約，開始記憶整理與維護", owner)
+                    self._start_jobs()
+                elif leading and not held:
+                    logger.warning("worker %s 失去背景任務租約，停止記憶整理與維護", owner)
+                    await self._stop_jobs()
+                leading = held
+                await asyncio.sleep(self.jobs_lease_seconds / 3)
+        finally:
+            if leading:
+                await self._stop_jobs()
+                await self.state.release(self.JOBS_LEASE, owner)
+    
+    def _register_metrics(self) -> None:
+        """Export the stats() every component already keeps, plus DB pool wait times."""
+        registry = self.metrics
+        self.memory_system.pool_stats.histogram = registry.histogram(
+            "db_pool_wait_seconds", "Time spent waiting for a database connection",
+            buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+        )
+        registry.stats("db_pool", self.memory_system.pool_stats.stats)
+        if self.memory_system.cache is not None:
+            registry.stats("memory_cache", self.memory_system.cache.stats)
+        if self.memory_system.write_queue is not None:
+            queue = self.memory_system.write_queue
+            registry.stats("memory_write_behind", lambda: {
+                "pending": len(queue),
+                "flushed_batches": queue.flushed_batches,
+                "flushed_memories": queue.flushed_memories,
+                "dropped_memories": queue.dropped_memories,
+            })
+        if self.compactor is not None:
+            registry.stats("memory_compaction", self.compactor.stats)
+        if self.maintenance is not None:
+            registry.stats("memory_maintenance", self.maintenance.stats)
+        if self.llm_service.cache is not None:
+            registry.stats("llm_cache", self.llm_service.cache.stats)
+        if self.llm_service.single_flight is not None:
+            registry.stats("llm_singleflight", self.llm_service.single_flight.stats)
+        if self.llm_service.admission is not None:
+            registry.stats("llm_admission", self.llm_service.admission.stats)
+        if self.llm_service.context_builder is not None:
+            registry.stats("llm_context", self.llm_service.context_builder.stats)
+        if isinstance(self.emotion_store, EmotionStateStore):
+            registry.stats("emotion", lambda: {"tracked_users": len(self.emotion_store), "evictions": self.emotion_store.evictions})
+        registry.stats("log", lambda: {"dropped": getattr(log_handler, "dropped", 0)})
+    
+    async def _update_emotion(self, request: ChatRequest, state: EmotionState, intensity: float) -> Tuple[EmotionState, float]:
+        """Set the fan's emotion; returns the stored state, which the reply reports."""
+        if isinstance(self.emotion_store, SharedEmotionStateStore):
+            return await self.emotion_store.update_state(request.user_id, request.platform, state, intensity)
+        return self.emotion_store.update_state(request.user_id, request.platform, state, intensity)
+    
+    async def _response_style(self) -> Dict[str, str]:
+        await self.persona.refresh_mood()
+        return self.persona.get_response_style()
+    
+    def _stage(self, stage: str, started: float) -> float:
+        """Record a pipeline stage that began at ``started``; returns when the next one begins."""
+        if self.pipeline_metrics is None:
+            return started
+        return self.pipeline_metrics.observe(stage, started)
+    
+    async def _memory_context(self, user_id: str, message: str) -> List[Dict]:
+        """Recent memories plus the older ones most relevant to the message."""
+        context = await self.memory_system.get_memories(user_id)
+        if self.memory_config.search_results > 0:
+            context = context + await self.memory_system.search_memories(
+                user_id, message, self.memory_config.search_results
+            )
+        return context
+    
+    async def _memory_contexts(self, requests: List[ChatRequest]) -> List[List[Dict]]:
+        """_memory_context() for a batch: every user's recent memories in one query."""
+        recent = await self.memory_system.get_memories_many([request.user_id for request in requests])
+        contexts = [recent[request.user_id] for request in requests]
+        if self.memory_config.search_results > 0:
+            hits = await asyncio.gather(*(
+                self.memory_system.search_memories(request.user_id, request.message, self.memory_config.search_results)
+                for request in requests
+            ))
+            contexts = [context + found for context, found in zip(contexts, hits)]
+        return contexts
+    
+    def _spawn(self, coro) -> None:
+        """Run a coroutine off the request's critical path, logging failures."""
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_done)
+    
+    def _background_done(self, task: asyncio.Task) -> None:
+        self._background_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("背景任務發生錯誤: %s", task.exception())
+    
+    @staticmethod
+    def _overloaded(e: LLMOverloadedError) -> HTTPException:
+        # Rate limit -> 429; no capacity to queue or wait -> 503
+        status_code = 429 if e.reason == LLMOverloadedError.RATE_LIMITED else 503
+        return HTTPException(
+            status_code=status_code,
+            detail=str(e),
+            headers={"Retry-After": str(math.ceil(e.retry_after))}
+        )
+    
+    @staticmethod
+    def _sse(event: str, data: Dict) -> str:
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    
     def _setup_routes(self):
+        if self.metrics is not None:
+            @self.app.get("/metrics")
+            async def metrics():
+                """Prometheus text exposition of this process's metrics."""
+                return PlainTextResponse(self.metrics.render(), media_type="text/plain; version=0.0.4")
+        
+        @self.app.get("/health")
+        async def health():
+            """Liveness: the process is up and serving requests."""
+            return {"status": "ok"}
+        
+        @self.app.get("/ready")
+        async def ready():
+            """Readiness: the warm-up has finished and the process is not shutting down."""
+            if not self.ready:
+                raise HTTPException(status_code=503, detail=self.not_ready_reason or "warming up")
+            return {"status": "ready"}
+        
         @self.app.post("/chat", response_model=ChatResponse)
         async def chat(request: ChatRequest):
             try:
-                logger.info(f"收到聊天請求: {request}")
+                logger.info("收到聊天請求: %s", request)
+                await self._wait_warmed_up()
                 
                 # Process message through the system
+                started = time.perf_counter()
                 logger.info("更新情緒狀態...")
-                self.emotion_engine.update_state(EmotionState.HAPPY, 0.8)
+                emotion, intensity = await self._update_emotion(request, EmotionState.HAPPY, 0.8)
+                started = self._stage("emotion", started)
                 
                 logger.info("存儲記憶...")
-                self.memory_system.store_memory(
+                await self.memory_system.store_memory(
                     request.user_id,
                     request.message,
                     ["chat", request.platform]
                 )
+                started = self._stage("store_memory", started)
                 
                 logger.info("獲取角色風格...")
-                style = self.persona.get_response_style()
+                style = await self._response_style()
+                started = self._stage("persona", started)
                 
                 logger.info("獲取記憶上下文...")
-                context = self.memory_system.get_memories(request.user_id)
+                context = await self._memory_context(request.user_id, request.message)
+                started = self._stage("get_memories", started)
                 
                 logger.info("生成回應...")
+                # Includes cache lookup and admission wait; format_prompt and llm are recorded inside
                 response = await self.llm_service.generate_response(
                     request.message,
                     context=context,
                     style=style
                 )
+                started = self._stage("generate_response", started)
                 
                 logger.info("回應生成完成")
+                self.idol_log.add_entry(
+                    "chat",
+                    request.message,
+                    emotion.value,
+                    {"user_id": request.user_id, "platform": request.platform}
+                )
+                self._stage("idol_log", started)
                 return ChatResponse(
                     response=response,
-                    emotion=self.emotion_engine.current_state.value,
-                    emotion_intensity=self.emotion_engine.emotion_intensity
+                    emotion=emotion.value,
+                    emotion_intensity=intensity
+                )
+            except LLMOverloadedError as e:
+                raise self._overloaded(e)
+            except Exception as e:
+                logger.error("處理聊天請求時發生錯誤: %s", e)
+                logger.error(traceback.format_exc())
+                raise HTTPException(status_code=500, detail=str(e))
+        
+        @self.app.post("/chat/batch", response_model=ChatBatchResponse)
+        async def chat_batch(batch: ChatBatchRequest):
+            """Many messages (e.g. one LINE / Discord webhook delivery) in one call.
+            
+            Memories are written in one transaction and read in one query; replies
+            are generated concurrently, at most batch_concurrency at a time, under
+            the same admission control as /chat. Results keep the request order.
+            """
+            requests = batch.requests
+            if len(requests) > self.batch_max_size:
+                raise HTTPException(status_code=413, detail=f"批次最多 {self.batch_max_size} 則訊息")
+            try:
+                logger.info("收到批次聊天請求: %d 則訊息", len(requests))
+                await self._wait_warmed_up()
+                emotions = await asyncio.gather(*(self._update_emotion(request, EmotionState.HAPPY, 0.8) for request in requests))
+                
+                started = time.perf_counter()
+                await self.memory_system.store_memories([
+                    (request.user_id, request.message, ["chat", request.platform]) for request in requests
+                ])
+                started = self._stage("batch_store_memory", started)
+                
+                style = await self._response_style()
+                contexts = await self._memory_contexts(requests)
+                self._stage("batch_get_memories", started)
+            except Exception as e:
+                logger.error("處理批次聊天請求時發生錯誤: %s", e)
+                logger.error(traceback.format_exc())
+                raise HTTPException(status_code=500, detail=str(e))
+            
+            slots = asyncio.Semaphore(self.batch_concurrency)
+            
+            async def reply(request: ChatRequest, context: List[Dict], emotion: EmotionState, intensity: float) -> ChatBatchResult:
+                try:
+                    async with slots:
+                        response = await self.llm_service.generate_response(
+                            request.message,
+                            context=context,
+                            style=style
+                        )
+                except LLMOverloadedError as e:
+                    return ChatBatchResult(status=self._overloaded(e).status_code, error=str(e))
+                except Exception as e:
+                    logger.error("批次中的訊息處理失敗: %s", e)
+                    return ChatBatchResult(status=500, error=str(e))
+                self.idol_log.add_entry(
+                    "chat",
+                    request.message,
+                    emotion.value,
+                    {"user_id": request.user_id, "platform": request.platform}
+                )
+                return ChatBatchResult(
+                    status=200,
+                    response=ChatResponse(response=response, emotion=emotion.value, emotion_intensity=intensity)
                 )
+            
+            results = await asyncio.gather(*(
+                reply(request, context, *emotion) for request, context, emotion in zip(requests, contexts, emotions)
+            ))
+            return ChatBatchResponse(results=results)
+        
+        @self.app.post("/chat/stream")
+        async def chat_stream(request: ChatRequest):
+            """Server-sent events: one `emotion` frame, then `chunk` frames, then `done`."""
+            try:
+                logger.info("收到串流聊天請求: %s", request)
+                await self._wait_warmed_up()
+                if self.llm_service.admission is not None:
+                    # Reject before the response starts, while a status code can still be sent
+                    self.llm_service.admission.check()
+                started = time.perf_counter()
+                emotion, intensity = await self._update_emotion(request, EmotionState.HAPPY, 0.8)
+                started = self._stage("emotion", started)
+                style = await self._response_style()
+                started = self._stage("persona", started)
+                context = await self._memory_context(request.user_id, request.message)
+                self._stage("get_memories", started)
+                
+                # The reply does not depend on the write, so it happens in the background
+                self._spawn(self.memory_system.store_memory(
+                    request.user_id,
+                    request.message,
+                    ["chat", request.platform]
+                ))
+            except LLMOverloadedError as e:
+                raise self._overloaded(e)
             except Exception as e:
-                logger.error(f"處理聊天請求時發生錯誤: {str(e)}")
+                logger.error("處理串流聊天請求時發生錯誤: %s", e)
                 logger.error(traceback.format_exc())
                 raise HTTPException(status_code=500, detail=str(e))
+            
+            emotion_frame = {
+                "emotion": emotion.value,
+                "emotion_intensity": intensity
+            }
+            
+            async def events():
+                yield self._sse("emotion", emotion_frame)
+                try:
+                    async for text in self.llm_service.generate_response_stream(
+                        request.message,
+                        context=context,
+                        style=style
+                    ):
+                        yield self._sse("chunk", {"text": text})
+                except Exception as e:
+                    yield self._sse("error", {"detail": str(e)})
+                    return
+                yield self._sse("done", {})
+            
+            return StreamingResponse(
+                events(),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
+
+def create_app() -> FastAPI:
+    """App factory: every worker process builds its own IdolMCP.
+
+    uvicorn main:create_app --factory --workers 4
+    gunicorn -k uvicorn.workers.UvicornWorker -w 4 "main:create_app()"
+    """
+    return IdolMCP().app
 
 if __name__ == "__main__":
     logger.info("啟動 IdolMCP 服務...")
-    idolmcp = IdolMCP()
-    uvicorn.run(idolmcp.app, host="0.0.0.0", port=8002, log_level="debug") 
\ No newline at end of file
+    uvicorn.run(
+        "main:create_app",
+        factory=True,
+        host="0.0.0.0",
+        port=8002,
+        workers=int(os.getenv("WORKERS", "1")),
+        log_level="debug"
+    )
@@ -0,0 +1,106 @@
+import logging
+import os
+import pytest
+from fastapi.testclient import TestClient
+
+APP_DIR = os.path.join(os.path.dirname(__file__), "..", "..")
+
+@pytest.fixture
+def idolmcp(monkeypatch):
+    monkeypatch.syspath_prepend(APP_DIR)
+    monkeypatch.setenv("LLM_PROVIDER", "STUB")
+    monkeypatch.setenv("LLM_STUB_LATENCY", "0")
+    monkeypatch.setenv("DATABASE_URL", "sqlite:///:memory:")
+    import main
+    return main.IdolMCP()
+
+def test_health_and_ready(idolmcp):
+    with TestClient(idolmcp.app) as client:
+        assert client.get("/health").json() == {"status": "ok"}
+        # Requests wait for the warm-up, so readiness follows the first chat
+        assert client.post("/chat", json={"user_id": "fan", "message": "早安", "platform": "web"}).status_code == 200
+        assert client.get("/ready").json() == {"status": "ready"}
+    assert not idolmcp.ready
+
+def test_request_id_reaches_every_log_line(idolmcp, caplog):
+    # main's copy of the module (imported as core.*), which owns the context variable
+    from core.log_config import RequestIdFilter
+    caplog.handler.addFilter(RequestIdFilter())
+    payload = {"user_id": "fan", "message": "早安", "platform": "web"}
+    with TestClient(idolmcp.app) as client, caplog.at_level(logging.INFO):
+        response = client.post("/chat", json=payload, headers={"X-Request-ID": "abc123"})
+        assert response.headers["X-Request-ID"] == "abc123"
+        generated = client.post("/chat", json=payload).headers["X-Request-ID"]
+    assert len(generated) == 16 and generated != "abc123"
+    ids = {entry.request_id for entry in caplog.records if entry.getMessage().startswith("收到聊天請求")}
+    assert ids == {"abc123", generated}
+    assert any(entry.request_id == "abc123" and entry.name.startswith("core.llm") for entry in caplog.records)
+
+def test_metrics_cover_each_stage(idolmcp):
+    payload = {"user_id": "fan", "message": "早安", "platform": "web"}
+    with TestClient(idolmcp.app) as client:
+        assert client.post("/chat", json=payload).status_code == 200
+        assert client.post("/chat/stream", json=payload).status_code == 200
+        client.get("/no-such-page")
+        response = client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    for stage in ("emotion", "store_memory", "get_memories", "format_prompt", "llm", "llm_first_chunk", "generate_response"):
+        assert f'idolmcp_stage_seconds_count{{stage="{stage}"}}' in body
+    assert 'idolmcp_llm_calls_total{outcome="ok"} 2.0' in body
+    assert 'idolmcp_llm_tokens_total{direction="out"}' in body
+    assert 'idolmcp_http_requests_total{path="/chat",status="200"} 1.0' in body
+    assert 'idolmcp_http_requests_total{path="other",status="404"} 1.0' in body
+    assert "idolmcp_db_pool_checkouts" in body and "idolmcp_llm_admission_admitted" in body
+
+def test_chat_batch_keeps_order_and_reports_errors_per_item(idolmcp):
+    messages = [
+        {"user_id": "fan_a", "message": "早安", "platform": "line"},
+        {"user_id": "fan_b", "message": "失敗", "platform": "discord"},
+        {"user_id": "fan_a", "message": "晚安", "platform": "line"},
+    ]
+    original = idolmcp.llm_service.backend.generate
+
+    async def generate(prompt):
+        if "User: 失敗" in prompt:
+            raise RuntimeError("provider error")
+        return await original(prompt)
+
+    idolmcp.llm_service.backend.generate = generate
+    with TestClient(idolmcp.app) as client:
+        results = client.post("/chat/batch", json={"requests": messages}).json()["results"]
+        assert [result["status"] for result in results] == [200, 500, 200]
+        assert "早安" in results[0]["response"]["response"] and "晚安" in results[2]["response"]["response"]
+        assert "provider error" in results[1]["error"]
+        # Every message was stored in the one transaction, failed replies included
+        stored = client.portal.call(idolmcp.memory_system.get_memories_many, ["fan_a", "fan_b"])
+        assert [memory["content"] for memory in stored["fan_a"]] == ["晚安", "早安"]
+        assert len(stored["fan_b"]) == 1
+        assert client.post("/chat/batch", json={"requests": []}).json() == {"results": []}
+        oversized = client.post("/chat/batch", json={"requests": messages * 40})
+        assert oversized.status_code == 413
+
+def test_chat_reports_the_emotion_it_set(idolmcp):
+    payload = {"user_id": "fan", "message": "早安", "platform": "web"}
+    with TestClient(idolmcp.app) as client:
+        # The intensity written by this request, not a decayed read after the LLM call
+        assert client.post("/chat", json=payload).json()["emotion_intensity"] == 0.8
+        results = client.post("/chat/batch", json={"requests": [payload, payload]}).json()["results"]
+    assert [result["response"]["emotion_intensity"] for result in results] == [0.8, 0.8]
+
+def test_memory_expiry_is_opt_in(idolmcp, monkeypatch):
+    assert idolmcp.maintenance is None
+    monkeypatch.setenv("MEMORY_MAINTENANCE", "true")
+    import main
+    assert main.IdolMCP().maintenance is not None
+
+def test_chat_load_seed_leaves_ids_to_the_database(idolmcp):
+    from benchmarks.bench_chat_load import seed
+    payload = {"user_id": "fan_0", "message": "早安", "platform": "web"}
+    with TestClient(idolmcp.app) as client:
+        # Rows already in the store must not collide with the seeded ones
+        assert client.post("/chat", json=payload).status_code == 200
+        client.portal.call(seed, idolmcp.memory_system, 1, 50)
+        assert client.post("/chat", json=payload).status_code == 200
+        results = client.portal.call(idolmcp.memory_system.search_memories, "fan_0", "歷史訊息 7")
+    assert results and results[0]["content"] == "歷史訊息 7"
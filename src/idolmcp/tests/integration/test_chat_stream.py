@@ -0,0 +1,74 @@
+import json
+import os
+import pytest
+from fastapi.testclient import TestClient
+
+APP_DIR = os.path.join(os.path.dirname(__file__), "..", "..")
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.syspath_prepend(APP_DIR)
+    monkeypatch.setenv("LLM_PROVIDER", "STUB")
+    monkeypatch.setenv("DATABASE_URL", "sqlite:///:memory:")
+    import main
+    idolmcp = main.IdolMCP()
+    idolmcp.llm_service.model.first_token_delay = 0
+    idolmcp.llm_service.model.chunk_delay = 0
+    with TestClient(idolmcp.app) as client:
+        yield client
+
+def parse_events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+def test_chat_stream_emotion_first_then_chunks(client):
+    payload = {"user_id": "fan", "message": "早安", "platform": "web"}
+    response = client.post("/chat/stream", json=payload)
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_events(response.text)
+    assert events[0] == ("emotion", {"emotion": "happy", "emotion_intensity": pytest.approx(0.8, abs=1e-3)})
+    assert events[-1] == ("done", {})
+    text = "".join(data["text"] for name, data in events if name == "chunk")
+    assert "早安" in text
+    
+    # The memory write ran in the background and is visible to the next request
+    chat = client.post("/chat", json=payload)
+    assert chat.status_code == 200
+
+def test_overloaded_llm_returns_503_with_retry_after(monkeypatch):
+    monkeypatch.syspath_prepend(APP_DIR)
+    monkeypatch.setenv("LLM_PROVIDER", "STUB")
+    monkeypatch.setenv("DATABASE_URL", "sqlite:///:memory:")
+    monkeypatch.setenv("LLM_MAX_IN_FLIGHT", "1")
+    monkeypatch.setenv("LLM_MAX_QUEUE", "0")
+    import main
+    idolmcp = main.IdolMCP()
+    with TestClient(idolmcp.app) as client:
+        # Occupy the only slot so the next request has nowhere to go
+        idolmcp.llm_service.admission._in_flight = 1
+        payload = {"user_id": "fan", "message": "早安", "platform": "web"}
+        for path in ("/chat", "/chat/stream"):
+            response = client.post(path, json=payload)
+            assert response.status_code == 503
+            assert int(response.headers["Retry-After"]) >= 1
+
+def test_chat_stream_state_failure_is_a_500_before_the_write(monkeypatch):
+    monkeypatch.syspath_prepend(APP_DIR)
+    monkeypatch.setenv("LLM_PROVIDER", "STUB")
+    monkeypatch.setenv("DATABASE_URL", "sqlite:///:memory:")
+    import main
+    idolmcp = main.IdolMCP()
+
+    def unavailable(user_id, platform, new_state, intensity):
+        raise ConnectionError("state backend unavailable")
+
+    monkeypatch.setattr(idolmcp.emotion_store, "update_state", unavailable)
+    with TestClient(idolmcp.app) as client:
+        response = client.post("/chat/stream", json={"user_id": "fan", "message": "早安", "platform": "web"})
+        assert response.status_code == 500
+        assert client.portal.call(idolmcp.memory_system.get_memories, "fan") == []
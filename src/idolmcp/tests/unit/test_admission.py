@@ -0,0 +1,135 @@
+import asyncio
+import pytest
+from src.idolmcp.core.llm import LLMService, LLMConfig, LLMProvider
+from src.idolmcp.core.llm.admission import AdmissionConfig, AdmissionController, LLMOverloadedError, TokenBucket
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.mark.asyncio
+async def test_in_flight_is_bounded_and_queue_is_fifo():
+    controller = AdmissionController(AdmissionConfig(max_in_flight=2, max_queue=10))
+    running, peak, order = 0, 0, []
+
+    async def call(i):
+        nonlocal running, peak
+        async with controller.slot():
+            running += 1
+            peak = max(peak, running)
+            order.append(i)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    await asyncio.gather(*(call(i) for i in range(8)))
+    assert peak == 2
+    assert order == list(range(8))
+    stats = controller.stats()
+    assert stats["admitted"] == 8
+    assert stats["in_flight"] == 0 and stats["queue_depth"] == 0
+    assert stats["max_queue_depth"] == 6
+    assert stats["wait_max_seconds"] > 0
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_immediately():
+    controller = AdmissionController(AdmissionConfig(max_in_flight=1, max_queue=1))
+    release = asyncio.Event()
+
+    async def hold():
+        async with controller.slot():
+            await release.wait()
+
+    holders = [asyncio.create_task(hold()) for _ in range(2)]
+    await asyncio.sleep(0)
+    with pytest.raises(LLMOverloadedError) as exc_info:
+        controller.check()
+    assert exc_info.value.reason == LLMOverloadedError.QUEUE_FULL
+    assert exc_info.value.retry_after >= 1
+    with pytest.raises(LLMOverloadedError):
+        await controller.acquire()
+
+    release.set()
+    await asyncio.gather(*holders)
+    assert controller.stats()["rejected_queue_full"] == 2
+
+@pytest.mark.asyncio
+async def test_queued_request_times_out_without_leaking_slots():
+    controller = AdmissionController(AdmissionConfig(max_in_flight=1, max_queue=5))
+    await controller.acquire()
+
+    with pytest.raises(LLMOverloadedError) as exc_info:
+        await controller.acquire(timeout=0.01)
+    assert exc_info.value.reason == LLMOverloadedError.TIMEOUT
+
+    waiter = asyncio.create_task(controller.acquire())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    await asyncio.gather(waiter, return_exceptions=True)
+
+    controller.release()
+    assert controller.in_flight == 0 and controller.queue_depth == 0
+    await asyncio.wait_for(controller.acquire(), 0.1)
+
+def test_token_bucket():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, burst=2, clock=clock)
+    assert bucket.reserve(0) == 0
+    assert bucket.reserve(0) == 0
+    assert bucket.reserve(0.1) is None
+    assert bucket.reserve(1) == pytest.approx(0.5)
+    clock.now = 2
+    assert bucket.reserve(0) == 0
+
+@pytest.mark.asyncio
+async def test_rate_limit_rejects_beyond_deadline():
+    controller = AdmissionController(AdmissionConfig(rate_per_second=1, burst=1, queue_timeout=0.5))
+    await controller.acquire()
+    controller.release()
+    with pytest.raises(LLMOverloadedError) as exc_info:
+        await controller.acquire()
+    assert exc_info.value.reason == LLMOverloadedError.RATE_LIMITED
+    assert exc_info.value.retry_after == 1
+
+@pytest.mark.asyncio
+async def test_rejected_requests_give_their_token_back():
+    clock = FakeClock()
+    controller = AdmissionController(
+        AdmissionConfig(rate_per_second=1, burst=5, max_in_flight=1, max_queue=1, queue_timeout=10), clock=clock
+    )
+    await controller.acquire()
+    queued = asyncio.create_task(controller.acquire())
+    await asyncio.sleep(0)
+    for _ in range(10):
+        with pytest.raises(LLMOverloadedError) as exc_info:
+            await controller.acquire()
+        assert exc_info.value.reason == LLMOverloadedError.QUEUE_FULL
+    queued.cancel()
+    await asyncio.gather(queued, return_exceptions=True)
+
+    # Only the one call that got a slot used a token
+    assert controller._bucket.delay() == 0
+    controller.release()
+    for _ in range(4):
+        await controller.acquire()
+        controller.release()
+    assert controller.stats()["rejected_rate_limited"] == 0
+
+@pytest.mark.asyncio
+async def test_service_keeps_overload_error_type():
+    service = LLMService(LLMConfig(
+        provider=LLMProvider.STUB,
+        model_name="stub",
+        coalesce_requests=False,
+        admission=AdmissionConfig(max_in_flight=1, max_queue=0)
+    ))
+    service.model.first_token_delay = 0.05
+    results = await asyncio.gather(
+        service.generate_response("早安"),
+        service.generate_response("晚安"),
+        return_exceptions=True
+    )
+    assert isinstance(results[0], str)
+    assert isinstance(results[1], LLMOverloadedError)
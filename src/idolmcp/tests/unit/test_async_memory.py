@@ -0,0 +1,100 @@
+import pytest
+import pytest_asyncio
+from datetime import datetime, timedelta
+from src.idolmcp.core.memory import MemoryConfig, MemoryEntry
+from src.idolmcp.core.memory.async_memory import AsyncMemorySystem, to_async_url
+
+@pytest.fixture
+def memory_config():
+    return MemoryConfig(
+        db_url="sqlite:///:memory:",
+        max_memories_per_user=5,
+        memory_expiry_days=7
+    )
+
+@pytest_asyncio.fixture
+async def memory_system(memory_config):
+    system = AsyncMemorySystem(memory_config)
+    yield system
+    await system.close()
+
+def test_to_async_url():
+    assert to_async_url("sqlite:///idolmcp.db") == "sqlite+aiosqlite:///idolmcp.db"
+    assert to_async_url("postgresql://u:p@db/idol") == "postgresql+asyncpg://u:p@db/idol"
+    assert to_async_url("postgres://u:p@db/idol") == "postgresql+asyncpg://u:p@db/idol"
+    assert to_async_url("sqlite+aiosqlite:///x.db") == "sqlite+aiosqlite:///x.db"
+
+@pytest.mark.asyncio
+async def test_store_memory(memory_system):
+    await memory_system.store_memory("test_user", "Test memory content", ["test", "memory"])
+    memories = await memory_system.get_memories("test_user")
+
+    assert len(memories) == 1
+    assert memories[0]["content"] == "Test memory content"
+    assert memories[0]["tags"] == ["test", "memory"]
+
+@pytest.mark.asyncio
+async def test_get_memories_with_tags(memory_system):
+    user_id = "test_user"
+    await memory_system.store_memory(user_id, "Memory 1", ["tag1"])
+    await memory_system.store_memory(user_id, "Memory 2", ["tag2"])
+    await memory_system.store_memory(user_id, "Memory 3", ["tag1", "tag2"])
+
+    assert len(await memory_system.get_memories(user_id, ["tag1"])) == 2
+    assert len(await memory_system.get_memories(user_id, ["tag1", "tag2"])) == 1
+
+@pytest.mark.asyncio
+async def test_memory_limit(memory_system):
+    for i in range(10):
+        await memory_system.store_memory("test_user", f"Memory {i}", ["test"])
+
+    memories = await memory_system.get_memories("test_user")
+    assert len(memories) == memory_system.config.max_memories_per_user
+
+@pytest.mark.asyncio
+async def test_cleanup_old_memories(memory_system):
+    user_id = "test_user"
+    await memory_system.store_memory(user_id, "Recent memory", ["test"])
+
+    async with memory_system.Session() as session:
+        session.add(MemoryEntry(
+            user_id=user_id,
+            content="Old memory",
+            tags=["test"],
+            created_at=datetime.utcnow() - timedelta(days=10)
+        ))
+        await session.commit()
+
+    assert await memory_system.cleanup_old_memories() == 1
+    memories = await memory_system.get_memories(user_id)
+
+    assert len(memories) == 1
+    assert memories[0]["content"] == "Recent memory"
+
+@pytest.mark.asyncio
+async def test_batch_store_and_multi_user_fetch(memory_system):
+    await memory_system.store_memories(
+        [("fan_a", f"A {i}", ["chat", "line"]) for i in range(7)]
+        + [("fan_b", "B 0", ["chat", "discord"])]
+    )
+    found = await memory_system.get_memories_many(["fan_b", "fan_a", "fan_c", "fan_a"])
+
+    assert list(found) == ["fan_b", "fan_a", "fan_c"]
+    assert [m["content"] for m in found["fan_a"]] == ["A 6", "A 5", "A 4", "A 3", "A 2"]
+    assert found["fan_a"] == await memory_system.get_memories("fan_a")
+    assert [m["content"] for m in found["fan_b"]] == ["B 0"]
+    assert found["fan_c"] == []
+
+@pytest.mark.asyncio
+async def test_multi_user_fetch_uses_and_fills_cache():
+    from src.idolmcp.core.memory.cache import MemoryCacheConfig
+    system = AsyncMemorySystem(MemoryConfig(db_url="sqlite:///:memory:", max_memories_per_user=3, cache=MemoryCacheConfig()))
+    await system.store_memories([("fan_a", "first", ["chat"]), ("fan_b", "hello", ["chat"])])
+    await system.get_memories_many(["fan_a", "fan_b"])
+    assert system.cache.stats()["misses"] == 2
+
+    await system.store_memories([("fan_a", "second", ["chat"])])
+    found = await system.get_memories_many(["fan_a", "fan_b"])
+    assert system.cache.stats()["hits"] == 2
+    assert [m["content"] for m in found["fan_a"]] == ["second", "first"]
+    await system.close()
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+from src.idolmcp.core.llm import LLMService, LLMConfig, LLMProvider
+from src.idolmcp.core.llm.context import ContextBuilder, ContextConfig, estimate_tokens
+
+NOW = datetime(2024, 6, 1, 12, 0)
+
+def memory(content, hours_ago, tags=("chat", "web")):
+    return {"content": content, "tags": list(tags), "created_at": NOW - timedelta(hours=hours_ago)}
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("早安") == 2
+    assert estimate_tokens("hello world!") == 3
+    assert estimate_tokens("我喜歡 ramen") == 3 + 2
+
+def test_renders_compactly_oldest_first():
+    builder = ContextBuilder(ContextConfig())
+    built = builder.build([memory("今天好累", 1), memory("我喜歡草莓蛋糕", 30)], "晚安", now=NOW)
+    assert built.text == "- 05/31 06:00 我喜歡草莓蛋糕\n- 06/01 11:00 今天好累"
+    assert "datetime" not in built.text and "tags" not in built.text
+    assert built.tokens == sum(estimate_tokens(line) for line in built.text.splitlines())
+
+def test_dedupes_including_current_message():
+    builder = ContextBuilder(ContextConfig())
+    memories = [memory("早安！", 0), memory("我喜歡草莓", 1), memory("我喜歡草莓～", 2), memory("早安", 3)]
+    built = builder.build(memories, "早安", now=NOW)
+    assert built.items == 1
+    assert built.duplicates == 3
+
+def test_budget_keeps_relevant_and_recent_memories():
+    builder = ContextBuilder(ContextConfig(max_tokens=40))
+    memories = [memory(f"隨便聊聊第 {i} 次，沒有特別的事情", i) for i in range(1, 50)]
+    memories.append(memory("我最喜歡的食物是草莓蛋糕", 24 * 20))
+    built = builder.build(memories, "你記得我最喜歡的食物嗎", now=NOW)
+
+    assert built.tokens <= 40
+    assert "草莓蛋糕" in built.text
+    assert "第 1 次" in built.text
+    assert built.dropped_items == 50 - built.items
+    assert built.dropped_tokens > 0
+    assert builder.stats()["tokens_dropped"] == built.dropped_tokens
+
+def test_long_memories_are_truncated():
+    builder = ContextBuilder(ContextConfig(max_item_chars=10))
+    built = builder.build([memory("啊" * 50, 1)], "hi", now=NOW)
+    assert built.text.endswith("啊" * 9 + "…")
+
+def test_format_prompt_uses_builder_for_memory_lists():
+    service = LLMService(LLMConfig(provider=LLMProvider.STUB, model_name="stub", context=ContextConfig()))
+    memories = [memory(f"訊息 {i}", i) for i in range(100)]
+
+    compact = service.format_prompt("早安", memories)
+    raw = LLMService(LLMConfig(provider=LLMProvider.STUB, model_name="stub")).format_prompt("早安", memories)
+    assert estimate_tokens(compact) < estimate_tokens(raw) / 3
+    assert compact.endswith("User: 早安\nAssistant:")
+
+    # Non-list context is passed through as before
+    assert "Context: {'previous_topic': 'colors'}" in service.format_prompt("hi", {"previous_topic": "colors"})
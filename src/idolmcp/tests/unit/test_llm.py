@@ -60,4 +60,17 @@ async def test_generate_response_error_handling(llm_service):
     with pytest.raises(Exception) as exc_info:
         await llm_service.generate_response(test_prompt)
     
-    assert str(exc_info.value) == f"Error generating response: {error_message}" 
\ No newline at end of file
+    assert str(exc_info.value) == f"Error generating response: {error_message}" 
+
+@pytest.mark.asyncio
+async def test_generate_response_stream_with_stub():
+    service = LLMService(LLMConfig(provider=LLMProvider.STUB, model_name="stub"))
+    service.model.first_token_delay = 0
+    service.model.chunk_delay = 0
+    service.model.reply = "嗨嗨！本小姐今天也閃亮登場囉～"
+    
+    chunks = [chunk async for chunk in service.generate_response_stream("Hello")]
+    
+    assert len(chunks) > 1
+    assert "".join(chunks) == "嗨嗨！本小姐今天也閃亮登場囉～"
+    assert await service.generate_response("Hello") == "嗨嗨！本小姐今天也閃亮登場囉～"
@@ -0,0 +1,114 @@
+import asyncio
+import time
+import pytest
+from src.idolmcp.core.llm import LLMService, LLMConfig, LLMProvider
+from src.idolmcp.core.llm.backends import LLMBackend
+from src.idolmcp.core.llm.stub import LatencyDistribution, StubConfig, StubError, StubModel, StubQuotaError
+
+def stub_service(**stub):
+    return LLMService(LLMConfig(
+        provider=LLMProvider.STUB,
+        model_name="stub",
+        coalesce_requests=False,
+        stub=StubConfig(**stub)
+    ))
+
+class EchoBackend(LLMBackend):
+    async def generate(self, prompt: str) -> str:
+        return prompt.upper()
+
+    async def stream(self, prompt: str):
+        for word in prompt.split():
+            yield word
+
+@pytest.mark.asyncio
+async def test_custom_backend_plugs_into_service():
+    service = LLMService(LLMConfig(provider=LLMProvider.OPENAI, model_name="x"), backend=EchoBackend())
+    assert "USER: HI" in await service.generate_response("hi")
+    assert [chunk async for chunk in service.generate_response_stream("hi")][-2:] == ["hi", "Assistant:"]
+
+def test_incomplete_backend_fails_when_instantiated():
+    class GenerateOnly(LLMBackend):
+        async def generate(self, prompt: str) -> str:
+            return prompt
+
+    with pytest.raises(TypeError):
+        GenerateOnly()
+
+def test_unregistered_provider_fails_at_startup():
+    with pytest.raises(ValueError):
+        LLMService(LLMConfig(provider=LLMProvider.OPENAI, model_name="gpt-4"))
+
+@pytest.mark.asyncio
+async def test_lazy_init_defers_provider_client():
+    service = LLMService(LLMConfig(
+        provider=LLMProvider.STUB, model_name="stub", lazy_init=True,
+        stub=StubConfig(first_token_delay=0, chunk_delay=0)
+    ))
+    assert service._backend is None
+    await asyncio.to_thread(service.warm_up)
+    backend = service._backend
+    assert backend is not None
+    await service.generate_response("hi")
+    assert service.backend is backend
+
+def test_lazy_init_reports_unregistered_provider_on_warm_up():
+    service = LLMService(LLMConfig(provider=LLMProvider.OPENAI, model_name="gpt-4", lazy_init=True))
+    with pytest.raises(ValueError):
+        service.warm_up()
+
+@pytest.mark.parametrize("distribution", list(LatencyDistribution))
+def test_latency_distributions(distribution):
+    model = StubModel(first_token_delay=0.1, distribution=distribution, jitter=0.5, seed=1)
+    delays = [model._first_token_delay() for _ in range(2000)]
+    assert all(d >= 0 for d in delays)
+    median = sorted(delays)[1000]
+    assert 0.05 < median < 0.15
+    if distribution == LatencyDistribution.FIXED:
+        assert set(delays) == {0.1}
+    if distribution == LatencyDistribution.LOGNORMAL:
+        assert max(delays) > 0.3
+
+@pytest.mark.asyncio
+async def test_token_by_token_streaming():
+    service = stub_service(reply="一二三四五六七八", first_token_delay=0, chunk_delay=0, chunk_size=1)
+    assert [chunk async for chunk in service.generate_response_stream("hi")] == list("一二三四五六七八")
+
+@pytest.mark.asyncio
+async def test_simulated_errors():
+    service = stub_service(first_token_delay=0, chunk_delay=0, error_rate=0.5, seed=3)
+    results = await asyncio.gather(*(service.generate_response(f"m{i}") for i in range(200)), return_exceptions=True)
+    failures = [r for r in results if isinstance(r, Exception)]
+    assert 60 < len(failures) < 140
+    assert "simulated provider error" in str(failures[0])
+
+@pytest.mark.asyncio
+async def test_provider_capacity_queues_requests():
+    service = stub_service(first_token_delay=0.05, chunk_delay=0, max_concurrency=2)
+    started = time.perf_counter()
+    await asyncio.gather(*(service.generate_response(f"m{i}") for i in range(6)))
+    # Three waves of two requests each
+    assert time.perf_counter() - started >= 0.15
+
+@pytest.mark.asyncio
+async def test_abandoned_streams_give_back_capacity():
+    model = StubModel(first_token_delay=0, chunk_delay=0, max_concurrency=1)
+    # Never read
+    await model.generate_content_async("hi", stream=True)
+    # Read one chunk, then closed early
+    response = await model.generate_content_async("hi", stream=True)
+    chunks = response.__aiter__()
+    await chunks.__anext__()
+    await chunks.aclose()
+
+    response = await asyncio.wait_for(model.generate_content_async("hi"), timeout=1)
+    assert response.text
+
+@pytest.mark.asyncio
+async def test_requests_per_second_quota():
+    model = StubModel(first_token_delay=0, chunk_delay=0, requests_per_second=3)
+    for _ in range(3):
+        await model.generate_content_async("hi")
+    with pytest.raises(StubQuotaError):
+        await model.generate_content_async("hi")
+    assert issubclass(StubQuotaError, StubError)
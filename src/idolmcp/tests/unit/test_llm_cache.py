@@ -0,0 +1,111 @@
+import pytest
+from src.idolmcp.core.llm import LLMService, LLMConfig, LLMProvider
+from src.idolmcp.core.llm.cache import ResponseCache, ResponseCacheConfig
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+@pytest.fixture
+def cache(clock):
+    return ResponseCache(ResponseCacheConfig(variants_per_key=2, ttl_seconds=10), clock=clock)
+
+def test_key_normalizes_message(cache):
+    assert cache.make_key("早安！！") == cache.make_key("早安")
+    assert cache.make_key("  Hi~ ") == cache.make_key("hi")
+    assert cache.make_key("ＨＩ") == cache.make_key("hi")
+    assert cache.make_key("hi", style={"tone": "a"}) != cache.make_key("hi", style={"tone": "b"})
+    assert cache.make_key("hi", generation={"temperature": 0.7}) != cache.make_key("hi", generation={"temperature": 0})
+
+def test_context_keys_on_memory_content(clock):
+    cache = ResponseCache(ResponseCacheConfig(), clock=clock)
+    fan_a = [{"content": "早安", "created_at": "2024-01-02 08:00:00"}, {"content": "我喜歡貓", "created_at": "2024-01-01"}]
+    fan_b = [{"content": "早安", "created_at": "2024-01-02 08:00:01"}, {"content": "我喜歡狗", "created_at": "2024-01-01"}]
+    # Different histories never share a reply
+    assert cache.make_key("早安", fan_a) != cache.make_key("早安", fan_b)
+    # The entry just stored for this message and the timestamps don't change the key
+    later = [{"content": "早安！", "created_at": "2024-01-03 08:00:00", "tags": ["chat"]}] + fan_a
+    assert cache.make_key("早安", later) == cache.make_key("早安", fan_a[1:])
+    assert cache.make_key("早安", [{"content": "早安"}]) == cache.make_key("早安")
+
+def test_context_only_counts_configured_items(clock):
+    cache = ResponseCache(ResponseCacheConfig(context_items=1), clock=clock)
+    assert cache.make_key("hi", [{"content": "a"}, {"content": "b"}]) == cache.make_key("hi", [{"content": "a"}])
+    assert cache.make_key("hi", [{"content": "a"}]) != cache.make_key("hi", [{"content": "c"}])
+    shared = ResponseCache(ResponseCacheConfig(context_items=0), clock=clock)
+    assert shared.make_key("hi", [{"content": "a"}]) == shared.make_key("hi", [{"content": "c"}])
+
+def test_long_messages_are_not_cached(cache):
+    assert cache.make_key("x" * 100) is None
+
+@pytest.mark.asyncio
+async def test_hits_after_enough_variants(cache):
+    key = cache.make_key("hi")
+    assert await cache.get(key) is None
+    await cache.put(key, "嗨嗨～", latency=0.5)
+    assert await cache.get(key) is None
+    await cache.put(key, "哈囉！", latency=1.5)
+
+    served = [await cache.get(key) for _ in range(6)]
+    assert set(served) == {"嗨嗨～", "哈囉！"}
+    assert all(a != b for a, b in zip(served, served[1:]))
+    stats = cache.stats()
+    assert stats["hits"] == 6
+    assert stats["misses"] == 2
+    assert stats["latency_saved_seconds"] == pytest.approx(6.0)
+
+@pytest.mark.asyncio
+async def test_deterministic_entries_need_one_sample(cache):
+    key = cache.make_key("hi")
+    await cache.put(key, "嗨嗨～", latency=0.5, deterministic=True)
+    assert await cache.get(key) == "嗨嗨～"
+
+@pytest.mark.asyncio
+async def test_ttl_expiry(cache, clock):
+    key = cache.make_key("hi")
+    await cache.put(key, "嗨嗨～", latency=0.5, deterministic=True)
+    clock.now = 11
+    assert await cache.get(key) is None
+
+@pytest.mark.asyncio
+async def test_disk_tier_survives_restart(tmp_path, clock):
+    config = ResponseCacheConfig(variants_per_key=1, db_path=str(tmp_path / "llm_cache.db"))
+    cache = ResponseCache(config, clock=clock)
+    key = cache.make_key("早安")
+    await cache.put(key, "早安呀！", latency=0.8)
+    cache.close()
+
+    reopened = ResponseCache(config, clock=clock)
+    assert await reopened.get(key) == "早安呀！"
+    assert reopened.stats()["disk_hits"] == 1
+    reopened.close()
+
+@pytest.mark.asyncio
+async def test_service_serves_repeated_messages_from_cache():
+    service = LLMService(LLMConfig(
+        provider=LLMProvider.STUB,
+        model_name="stub",
+        cache=ResponseCacheConfig(variants_per_key=1)
+    ))
+    service.model.first_token_delay = 0
+    service.model.chunk_delay = 0
+    calls = []
+    generate = service.model.generate_content_async
+
+    async def counting(*args, **kwargs):
+        calls.append(args)
+        return await generate(*args, **kwargs)
+
+    service.model.generate_content_async = counting
+    first = await service.generate_response("早安！", context=[{"content": "早安！"}])
+    assert await service.generate_response("早安", context=[{"content": "早安"}]) == first
+    assert [chunk async for chunk in service.generate_response_stream("早安～")] == [first]
+    assert len(calls) == 1
+    assert service.cache.stats()["hits"] == 2
@@ -1,6 +1,7 @@
 import pytest
 from datetime import datetime, timedelta
-from src.idolmcp.core.memory import MemorySystem, MemoryConfig, MemoryEntry
+from sqlalchemy import delete, func, select
+from src.idolmcp.core.memory import MemorySystem, MemoryConfig, MemoryEntry, MemoryTag
 
 @pytest.fixture
 def memory_config():
@@ -77,4 +78,49 @@ def test_cleanup_old_memories(memory_system):
     memories = memory_system.get_memories(user_id)
     
     assert len(memories) == 1
-    assert memories[0]["content"] == "Recent memory" 
\ No newline at end of file
+    assert memories[0]["content"] == "Recent memory" 
+
+def test_tag_index_rows(memory_system):
+    memory_system.store_memory("test_user", "Memory", ["tag1", "tag2", "tag1"])
+    
+    session = memory_system.Session()
+    rows = session.scalars(select(MemoryTag.tag).order_by(MemoryTag.tag)).all()
+    session.close()
+    
+    assert rows == ["tag1", "tag2"]
+
+def test_tag_filter_respects_limit_and_order(memory_system):
+    user_id = "test_user"
+    for i in range(10):
+        memory_system.store_memory(user_id, f"Memory {i}", ["even"] if i % 2 == 0 else ["odd"])
+    memory_system.store_memory("other_user", "Not mine", ["even"])
+    
+    memories = memory_system.get_memories(user_id, ["even", "even"])
+    assert [m["content"] for m in memories] == ["Memory 8", "Memory 6", "Memory 4", "Memory 2", "Memory 0"]
+
+def test_cleanup_removes_tag_rows(memory_system):
+    memory_system.store_memory("test_user", "Old memory", ["test"])
+    session = memory_system.Session()
+    session.query(MemoryEntry).update({MemoryEntry.created_at: datetime.utcnow() - timedelta(days=10)})
+    session.commit()
+    session.close()
+    
+    memory_system.cleanup_old_memories()
+    
+    session = memory_system.Session()
+    assert session.scalar(select(func.count()).select_from(MemoryTag)) == 0
+    session.close()
+
+def test_rebuild_tag_index(memory_system):
+    memory_system.store_memory("test_user", "Memory 1", ["tag1"])
+    memory_system.store_memory("test_user", "Memory 2", ["tag1", "tag2"])
+    session = memory_system.Session()
+    session.execute(delete(MemoryTag))
+    session.commit()
+    session.close()
+    assert memory_system.get_memories("test_user", ["tag1"]) == []
+    
+    memory_system.rebuild_tag_index()
+    
+    assert len(memory_system.get_memories("test_user", ["tag1"])) == 2
+    assert len(memory_system.get_memories("test_user", ["tag2"])) == 1
@@ -0,0 +1,98 @@
+import pytest
+from datetime import datetime
+from src.idolmcp.core.memory import MemoryConfig, MemorySystem
+from src.idolmcp.core.memory.cache import MemoryCache, MemoryCacheConfig
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def memory(content, tags):
+    return {"content": content, "tags": tags, "created_at": datetime.utcnow()}
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+@pytest.fixture
+def cache(clock):
+    return MemoryCache(MemoryCacheConfig(max_entries=3, ttl_seconds=10), clock=clock)
+
+@pytest.fixture
+def memory_system():
+    system = MemorySystem(MemoryConfig(
+        db_url="sqlite:///:memory:",
+        max_memories_per_user=3,
+        cache=MemoryCacheConfig()
+    ))
+    yield system
+    system.engine.dispose()
+
+def test_hit_and_miss_counters(cache):
+    assert cache.get("fan", None) is None
+    cache.put("fan", None, [memory("hi", ["chat"])])
+    assert cache.get("fan", []) is not None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+def test_tag_filter_is_part_of_key(cache):
+    cache.put("fan", ["b", "a"], [memory("hi", ["a", "b"])])
+    assert cache.get("fan", ["a", "b"]) is not None
+    assert cache.get("fan", ["a"]) is None
+
+def test_ttl_expiry(cache, clock):
+    cache.put("fan", None, [])
+    clock.now = 11
+    assert cache.get("fan", None) is None
+    assert len(cache) == 0
+
+def test_lru_eviction(cache):
+    for user in ("a", "b", "c"):
+        cache.put(user, None, [])
+    cache.get("a", None)
+    cache.put("d", None, [])
+
+    assert cache.get("b", None) is None
+    assert cache.get("a", None) is not None
+    assert cache.stats()["evictions"] == 1
+
+def test_on_store_updates_matching_filters(cache):
+    cache.put("fan", None, [memory("old", ["chat"])])
+    cache.put("fan", ["line"], [])
+    cache.put("fan", ["discord"], [])
+
+    cache.on_store("fan", memory("new", ["chat", "line"]), limit=1)
+
+    assert [m["content"] for m in cache.get("fan", None)] == ["new"]
+    assert [m["content"] for m in cache.get("fan", ["line"])] == ["new"]
+    assert cache.get("fan", ["discord"]) == []
+
+def test_racing_fill_is_not_cached(cache):
+    generation = cache.begin_fill("fan")
+    cache.on_store("fan", memory("new", ["chat"]), limit=5)
+    cache.put("fan", None, [], generation)
+    cache.end_fill("fan")
+
+    assert cache.get("fan", None) is None
+
+def test_store_then_get_hits_cache(memory_system):
+    memory_system.store_memory("fan", "Memory 0", ["chat"])
+    memory_system.get_memories("fan")
+    for i in range(1, 6):
+        memory_system.store_memory("fan", f"Memory {i}", ["chat"])
+        memories = memory_system.get_memories("fan")
+
+    assert [m["content"] for m in memories] == ["Memory 5", "Memory 4", "Memory 3"]
+    assert memory_system.cache.stats()["hits"] == 5
+    assert memory_system.cache.stats()["misses"] == 1
+    memory_system.cache.clear()
+    assert memory_system.get_memories("fan") == memories
+
+def test_cleanup_clears_cache(memory_system):
+    memory_system.store_memory("fan", "Memory", ["chat"])
+    memory_system.get_memories("fan")
+    memory_system.cleanup_old_memories()
+    assert len(memory_system.cache) == 0
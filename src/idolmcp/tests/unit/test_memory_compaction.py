@@ -0,0 +1,153 @@
+import pytest
+import pytest_asyncio
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+from src.idolmcp.core.memory import SUMMARY_TAG, MemoryArchive, MemoryConfig, MemoryEntry, MemoryTerm
+from src.idolmcp.core.memory.async_memory import AsyncMemorySystem
+from src.idolmcp.core.memory.cache import MemoryCacheConfig
+from src.idolmcp.core.memory.compaction import (
+    CompactionConfig, ExtractiveSummarizer, LLMSummarizer, MemoryCompactor
+)
+
+NOW = datetime(2024, 6, 1, 12, 0)
+
+def config(**overrides):
+    return CompactionConfig(**{
+        "min_age_hours": 24, "keep_recent": 5, "batch_size": 10, "min_batch": 4,
+        "max_batches_per_second": 1000, **overrides
+    })
+
+def memory(content, days_ago=3, tags=("chat", "web")):
+    return {"content": content, "tags": list(tags), "created_at": NOW - timedelta(days=days_ago)}
+
+async def seed(system, user_id, count, days_ago=3):
+    await system.init_schema()
+    start = datetime.utcnow() - timedelta(days=days_ago)
+    async with system.Session() as session:
+        session.add_all([
+            MemoryEntry(
+                user_id=user_id,
+                content=f"第 {i} 則：今天去看了演唱會" if i % 2 else "早安",
+                tags=["chat", "web"],
+                created_at=start + timedelta(seconds=i),
+                updated_at=start + timedelta(seconds=i)
+            )
+            for i in range(count)
+        ])
+        await session.commit()
+
+async def count(system, model, *where):
+    async with system.Session() as session:
+        return await session.scalar(select(func.count()).select_from(model).where(*where))
+
+@pytest_asyncio.fixture
+async def memory_system():
+    system = AsyncMemorySystem(MemoryConfig(
+        db_url="sqlite:///:memory:",
+        max_memories_per_user=100,
+        cache=MemoryCacheConfig()
+    ))
+    yield system
+    await system.close()
+
+@pytest.mark.asyncio
+async def test_extractive_summary_drops_chatter_and_repeats():
+    memories = [
+        memory("早安"), memory("[貼圖]"), memory("我最喜歡草莓蛋糕"), memory("早安"),
+        memory("我最喜歡草莓蛋糕！"), memory("下個月要去大阪看演唱會", days_ago=2),
+    ]
+    summary = await ExtractiveSummarizer(max_chars=100).summarize(memories)
+    assert summary.startswith("[摘要 05/29-05/30，6 則]")
+    assert summary.count("草莓蛋糕") == 1
+    assert "大阪" in summary
+    assert "早安" not in summary and "貼圖" not in summary
+
+@pytest.mark.asyncio
+async def test_extractive_summary_respects_length():
+    memories = [memory(f"第 {i} 次聊到新歌和握手會的心得") for i in range(50)]
+    summary = await ExtractiveSummarizer(max_chars=80).summarize(memories)
+    assert len(summary) <= 80
+
+@pytest.mark.asyncio
+async def test_llm_summarizer_falls_back_on_error():
+    async def complete(prompt):
+        assert "我最喜歡草莓蛋糕" in prompt
+        return "粉絲喜歡\n草莓蛋糕。"
+
+    async def broken(prompt):
+        raise RuntimeError("quota")
+
+    memories = [memory("早安"), memory("我最喜歡草莓蛋糕")]
+    assert await LLMSummarizer(complete).summarize(memories) == "[摘要 05/29-05/29，2 則] 粉絲喜歡 草莓蛋糕。"
+    assert "草莓蛋糕" in await LLMSummarizer(broken).summarize(memories)
+
+@pytest.mark.asyncio
+async def test_compaction_folds_old_memories(memory_system):
+    await seed(memory_system, "fan", 25)
+    await memory_system.store_memory("fan", "剛剛的訊息", ["chat", "web"])
+    assert len(await memory_system.get_memories("fan")) == 26
+
+    run = await MemoryCompactor(memory_system, config()).run_once()
+    # 26 memories, newest 5 kept (one is too new anyway): 10 folded, then the
+    # first summary and the next 9 folded into a second one
+    assert (run.users, run.summaries, run.archived) == (1, 2, 20)
+    assert await count(memory_system, MemoryArchive) == 20
+
+    memories = await memory_system.get_memories("fan")
+    summaries = [m for m in memories if SUMMARY_TAG in m["tags"]]
+    assert len(memories) == 7 + 1 and len(summaries) == 1
+    assert memories[0]["content"] == "剛剛的訊息"
+    assert summaries[0]["tags"] == ["chat", "web", SUMMARY_TAG]
+    assert "，19 則]" in summaries[0]["content"] and summaries[0]["content"].count("[摘要") == 1
+    # Folded memories are gone from the search index; the summaries are searchable
+    results = await memory_system.search_memories("fan", "演唱會")
+    folded = {f"第 {i} 則：今天去看了演唱會" for i in range(19)}
+    assert results and not folded & {r["content"] for r in results}
+    assert await count(memory_system, MemoryTerm, MemoryTerm.user_id == "fan") < 26 * 5
+
+@pytest.mark.asyncio
+async def test_summaries_roll_up_instead_of_piling_up(memory_system):
+    compactor = MemoryCompactor(memory_system, config())
+    memory_system.search_stats.min_docs = 0
+    for week in range(6):
+        await seed(memory_system, "fan", 12, days_ago=40 - week * 5)
+        assert await memory_system.search_memories("fan", "演唱會")
+        assert (await compactor.run_once()).summaries
+        # Cached BM25 statistics are dropped with the rows each fold removes
+        assert memory_system.search_stats.get("fan") is None
+
+    summaries = await count(memory_system, MemoryEntry, MemoryEntry.content.startswith("[摘要"))
+    assert summaries == 1
+    assert await count(memory_system, MemoryEntry) <= config().keep_recent + config().min_batch
+
+@pytest.mark.asyncio
+async def test_compaction_skips_recent_and_small_users(memory_system):
+    await seed(memory_system, "new_fan", 30, days_ago=0)
+    await seed(memory_system, "light_fan", 8)
+    run = await MemoryCompactor(memory_system, config()).run_once()
+    assert run.summaries == 0
+    assert await count(memory_system, MemoryEntry) == 38
+
+@pytest.mark.asyncio
+async def test_compaction_is_resumable_and_idempotent(memory_system):
+    for user in ("a", "b", "c"):
+        await seed(memory_system, user, 15)
+    compactor = MemoryCompactor(memory_system, config(users_per_run=2))
+
+    first = await compactor.run_once()
+    assert first.users == 2
+    second = await compactor.run_once()
+    assert second.users == 1 and second.summaries == 1
+    # Everything is compacted; a fresh job finds nothing left to do
+    again = await MemoryCompactor(memory_system, config()).run_once()
+    assert again.summaries == 0
+    assert compactor.stats()["archived"] == 30
+
+@pytest.mark.asyncio
+async def test_cleanup_expires_archive(memory_system):
+    await seed(memory_system, "fan", 15, days_ago=3)
+    await MemoryCompactor(memory_system, config()).run_once()
+    memory_system.config.memory_expiry_days = 1
+    await memory_system.cleanup_old_memories()
+    assert await count(memory_system, MemoryArchive) == 0
+    assert await count(memory_system, MemoryEntry) == 0
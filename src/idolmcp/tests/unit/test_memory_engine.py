@@ -0,0 +1,85 @@
+import asyncio
+import pytest
+from sqlalchemy import exc
+from src.idolmcp.core.memory import MemoryConfig, MemorySystem
+from src.idolmcp.core.memory.async_memory import AsyncMemorySystem
+from src.idolmcp.core.memory.engine import PoolConfig, PoolStats, PostgresTuning, SQLiteTuning, engine_options
+
+def pragmas(conn):
+    return {
+        name: conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+        for name in ("journal_mode", "synchronous", "busy_timeout", "auto_vacuum")
+    }
+
+def test_sqlite_tuning_applied(tmp_path):
+    system = MemorySystem(MemoryConfig(
+        db_url=f"sqlite:///{tmp_path / 'tuned.db'}",
+        pool=PoolConfig(size=2),
+        sqlite=SQLiteTuning(synchronous="FULL", busy_timeout_ms=1234)
+    ))
+    with system.engine.connect() as conn:
+        # synchronous FULL == 2; auto_vacuum INCREMENTAL == 2 even though WAL is on
+        assert pragmas(conn) == {"journal_mode": "wal", "synchronous": 2, "busy_timeout": 1234, "auto_vacuum": 2}
+    system.store_memory("fan", "早安", ["chat"])
+    assert system.pool_stats.stats()["checkouts"] >= 2
+    system.engine.dispose()
+
+def test_defaults_untouched_without_tuning(tmp_path):
+    system = MemorySystem(MemoryConfig(db_url=f"sqlite:///{tmp_path / 'plain.db'}"))
+    with system.engine.connect() as conn:
+        assert pragmas(conn)["journal_mode"] == "delete"
+    assert system.pool_stats.stats()["checkouts"] == 0
+    system.engine.dispose()
+
+def test_postgres_options():
+    config = MemoryConfig(
+        db_url="postgresql://u:p@db/idol",
+        pool=PoolConfig(size=5, max_overflow=0, timeout=2),
+        postgres=PostgresTuning(statement_timeout_ms=1500)
+    )
+    options = engine_options(config, "postgresql+asyncpg://u:p@db/idol", PoolStats(), is_async=True)
+    assert options["pool_size"] == 5 and options["max_overflow"] == 0 and options["pool_timeout"] == 2
+    assert options["pool_pre_ping"] is True
+    assert options["connect_args"] == {
+        "server_settings": {"application_name": "idolmcp", "statement_timeout": "1500"}
+    }
+    sync = engine_options(config, "postgresql://u:p@db/idol", PoolStats())
+    assert sync["connect_args"] == {"options": "-c application_name=idolmcp -c statement_timeout=1500"}
+
+def test_in_memory_sqlite_is_not_pooled():
+    config = MemoryConfig(db_url="sqlite:///:memory:", pool=PoolConfig())
+    assert engine_options(config, config.db_url, PoolStats()) == {}
+
+@pytest.mark.asyncio
+async def test_pool_waits_and_timeouts_are_recorded(tmp_path):
+    system = AsyncMemorySystem(MemoryConfig(
+        db_url=f"sqlite:///{tmp_path / 'pool.db'}",
+        pool=PoolConfig(size=1, max_overflow=0, timeout=0.2),
+        sqlite=SQLiteTuning()
+    ))
+    await system.init_schema()
+    async with system.engine.connect() as held:
+        await held.exec_driver_sql("SELECT 1")
+        with pytest.raises(exc.TimeoutError):
+            await system.get_memories("fan")
+
+        async def release_soon():
+            await asyncio.sleep(0.05)
+            await held.close()
+
+        release = asyncio.create_task(release_soon())
+        assert await system.get_memories("fan") == []
+        await release
+
+    stats = system.pool_stats.stats()
+    assert stats["timeouts"] == 1
+    assert stats["wait_max_ms"] >= 40
+    assert stats["size"] == 1 and stats["checked_out"] == 0
+    await system.close()
+
+@pytest.mark.asyncio
+async def test_warm_up_opens_pooled_connections(tmp_path):
+    system = AsyncMemorySystem(MemoryConfig(db_url=f"sqlite:///{tmp_path / 'warm.db'}", pool=PoolConfig(size=4)))
+    await system.warm_up(3)
+    assert system.engine.sync_engine.pool.checkedin() == 3
+    await system.close()
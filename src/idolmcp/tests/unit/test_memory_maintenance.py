@@ -0,0 +1,86 @@
+import os
+import pytest
+import pytest_asyncio
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+from src.idolmcp.core.memory import MemoryArchive, MemoryConfig, MemoryEntry, MemoryTag, MemoryTerm
+from src.idolmcp.core.memory.async_memory import AsyncMemorySystem
+from src.idolmcp.core.memory.maintenance import MaintenanceConfig, MemoryMaintenance
+
+async def seed(system, count, days_ago, content="今天也去看了演唱會，超開心的一天"):
+    await system.init_schema()
+    created = datetime.utcnow() - timedelta(days=days_ago)
+    async with system.Session() as session:
+        session.add_all([
+            MemoryEntry(user_id=f"fan_{i % 3}", content=f"{content} {i}", tags=["chat", "web"],
+                        created_at=created, updated_at=created)
+            for i in range(count)
+        ])
+        await session.commit()
+
+async def count(system, model):
+    async with system.Session() as session:
+        return await session.scalar(select(func.count()).select_from(model))
+
+@pytest_asyncio.fixture
+async def memory_system(tmp_path):
+    system = AsyncMemorySystem(MemoryConfig(
+        db_url=f"sqlite:///{tmp_path / 'memories.db'}",
+        memory_expiry_days=7
+    ))
+    yield system
+    await system.close()
+
+@pytest.mark.asyncio
+async def test_cleanup_deletes_in_batches(memory_system):
+    await seed(memory_system, 25, days_ago=10)
+    await seed(memory_system, 5, days_ago=1)
+    progress = []
+
+    expired, archived = await memory_system.expire_memories(
+        batch_size=10, progress=lambda m, a: progress.append(m)
+    )
+    assert (expired, archived) == (25, 0)
+    assert progress == [10, 20, 25]
+    assert await count(memory_system, MemoryEntry) == 5
+    assert await count(memory_system, MemoryTag) == 10
+    assert await count(memory_system, MemoryTerm) > 0
+
+@pytest.mark.asyncio
+async def test_cleanup_expires_archive_rows(memory_system):
+    await memory_system.init_schema()
+    old = datetime.utcnow() - timedelta(days=30)
+    async with memory_system.Session() as session:
+        session.add_all([
+            MemoryArchive(id=i, user_id="fan", content="舊訊息", tags=["chat"], created_at=old, summary_id=1)
+            for i in range(1, 4)
+        ])
+        await session.commit()
+    assert await memory_system.expire_memories(batch_size=2) == (0, 3)
+    assert await count(memory_system, MemoryArchive) == 0
+
+@pytest.mark.asyncio
+async def test_maintenance_reclaims_space(memory_system, tmp_path):
+    await seed(memory_system, 3000, days_ago=10, content="很長的訊息" * 20)
+    size_before = os.path.getsize(tmp_path / "memories.db")
+
+    maintenance = MemoryMaintenance(memory_system, MaintenanceConfig(batch_size=500, pause_seconds=0, vacuum_pages=100000))
+    run = await maintenance.run_once()
+    assert run.expired == 3000
+    assert run.reclaimed_pages > 0
+    assert os.path.getsize(tmp_path / "memories.db") < size_before / 2
+
+    stats = maintenance.stats()
+    assert stats["runs"] == 1 and stats["expired"] == 3000 and not stats["running"]
+    # Nothing left to do on the next pass
+    assert (await maintenance.run_once()).expired == 0
+
+@pytest.mark.asyncio
+async def test_reclaim_space_is_noop_without_incremental_vacuum(tmp_path):
+    system = AsyncMemorySystem(MemoryConfig(db_url=f"sqlite:///{tmp_path / 'legacy.db'}"))
+    async with system.engine.begin() as conn:
+        await conn.exec_driver_sql("CREATE TABLE legacy (x)")
+    await seed(system, 10, days_ago=30)
+    await system.cleanup_old_memories()
+    assert await system.reclaim_space(1000) == 0
+    await system.close()
@@ -0,0 +1,103 @@
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, select
+from src.idolmcp.core.memory import MemoryConfig, MemoryEntry, MemorySystem, MemoryTerm, search
+from src.idolmcp.core.memory.async_memory import AsyncMemorySystem
+
+@pytest.fixture
+def memory_config():
+    return MemoryConfig(
+        db_url="sqlite:///:memory:",
+        max_memories_per_user=5,
+        memory_expiry_days=7
+    )
+
+@pytest.fixture
+def memory_system(memory_config):
+    system = MemorySystem(memory_config)
+    yield system
+    system.engine.dispose()
+
+def test_tokenize():
+    assert search.tokenize("我喜歡草莓") == ["我喜", "喜歡", "歡草", "草莓"]
+    assert search.tokenize("Hello, ＷＯＲＬＤ 2024!") == ["hello", "world", "2024"]
+    assert search.tokenize("貓 cat") == ["貓", "cat"]
+    assert search.query_terms("新歌新歌") == ["新歌", "歌新"]
+
+def test_term_weights_skip_ubiquitous_terms():
+    weights = search.term_weights(100000, {"我喜": 90000, "草莓": 3, "拉麵": 0})
+    assert list(weights) == ["草莓"]
+    # Only common terms in the query: keep them rather than returning nothing
+    assert list(search.term_weights(100000, {"我喜": 90000})) == ["我喜"]
+    # Small collections are never pruned
+    assert list(search.term_weights(100, {"我喜": 90, "草莓": 3})) == ["我喜", "草莓"]
+
+def test_search_ranks_by_relevance(memory_system):
+    memory_system.store_memory("fan", "今天好累", ["chat"])
+    memory_system.store_memory("fan", "我最喜歡草莓蛋糕了", ["chat"])
+    memory_system.store_memory("fan", "草莓季節到了", ["chat"])
+    memory_system.store_memory("fan", "晚餐吃拉麵", ["chat"])
+    memory_system.store_memory("other", "我也喜歡草莓蛋糕", ["chat"])
+
+    results = memory_system.search_memories("fan", "草莓蛋糕", k=2)
+    assert [r["content"] for r in results] == ["我最喜歡草莓蛋糕了", "草莓季節到了"]
+    assert results[0]["score"] > results[1]["score"] > 0
+    assert results[0]["tags"] == ["chat"]
+
+    assert memory_system.search_memories("fan", "演唱會") == []
+    assert memory_system.search_memories("fan", "？！") == []
+    assert memory_system.search_memories("nobody", "草莓") == []
+
+def test_search_sees_new_memories_immediately(memory_system):
+    assert memory_system.search_memories("fan", "握手會") == []
+    memory_system.store_memory("fan", "下週要去握手會", ["chat"])
+    assert [r["content"] for r in memory_system.search_memories("fan", "握手會")] == ["下週要去握手會"]
+
+def test_cleanup_removes_index_rows(memory_system):
+    memory_system.store_memory("fan", "舊的演唱會回憶", ["chat"])
+    session = memory_system.Session()
+    session.query(MemoryEntry).update({"created_at": datetime.utcnow() - timedelta(days=30)})
+    session.commit()
+    session.close()
+
+    memory_system.cleanup_old_memories()
+    session = memory_system.Session()
+    assert session.scalar(select(func.count()).select_from(MemoryTerm)) == 0
+    session.close()
+    assert memory_system.search_memories("fan", "演唱會") == []
+
+def test_rebuild_search_index(memory_system):
+    memory_system.store_memory("fan", "我喜歡新歌", ["chat"])
+    session = memory_system.Session()
+    session.execute(delete(MemoryTerm))
+    session.commit()
+    session.close()
+    assert memory_system.search_memories("fan", "新歌") == []
+
+    memory_system.rebuild_search_index()
+    assert [r["content"] for r in memory_system.search_memories("fan", "新歌")] == ["我喜歡新歌"]
+
+def test_stats_cache_only_keeps_large_users():
+    cache = search.SearchStatsCache(ttl=60, min_docs=10, max_users=2)
+    cache.put("small", 3, 30)
+    assert cache.get("small") is None
+    cache.put("a", 10, 100)
+    cache.put("b", 20, 200)
+    cache.put("c", 30, 300)
+    assert cache.get("a") is None
+    assert cache.get("c") == (30, 300)
+
+    expired = search.SearchStatsCache(ttl=0, min_docs=1)
+    expired.put("a", 10, 100)
+    assert expired.get("a") is None
+
+@pytest.mark.asyncio
+async def test_async_search(memory_config):
+    system = AsyncMemorySystem(memory_config)
+    try:
+        await system.store_memory("fan", "我媽媽買了貓咪", ["chat"])
+        await system.store_memory("fan", "今天看了電影", ["chat"])
+        results = await system.search_memories("fan", "媽媽買了什麼")
+        assert [r["content"] for r in results] == ["我媽媽買了貓咪"]
+    finally:
+        await system.close()
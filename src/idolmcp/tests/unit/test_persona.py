@@ -1,5 +1,6 @@
 import pytest
 from src.idolmcp.core.persona import Persona, PersonaConfig
+from src.idolmcp.core.state import SQLiteStateBackend
 
 @pytest.fixture
 def sample_persona_config():
@@ -32,4 +33,16 @@ def test_adjust_mood(persona):
     persona.adjust_mood("happy")
     assert persona.current_mood == "happy"
     style = persona.get_response_style()
-    assert style["mood"] == "happy" 
\ No newline at end of file
+    assert style["mood"] == "happy" 
+
+@pytest.mark.asyncio
+async def test_mood_shared_through_state_backend(sample_persona_config, tmp_path):
+    path = str(tmp_path / "state.db")
+    worker_a = Persona(sample_persona_config, SQLiteStateBackend(path))
+    worker_b = Persona(sample_persona_config, SQLiteStateBackend(path))
+    await worker_b.refresh_mood()
+    assert worker_b.current_mood == "neutral"
+    await worker_a.set_mood("excited")
+    assert worker_b.get_response_style()["mood"] == "neutral"
+    await worker_b.refresh_mood()
+    assert worker_b.get_response_style()["mood"] == "excited"
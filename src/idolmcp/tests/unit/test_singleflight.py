@@ -0,0 +1,92 @@
+import asyncio
+import pytest
+from src.idolmcp.core.llm import LLMService, LLMConfig, LLMProvider
+from src.idolmcp.core.llm.singleflight import SingleFlight
+
+def slow_stub_service(delay=0.05):
+    service = LLMService(LLMConfig(provider=LLMProvider.STUB, model_name="stub"))
+    service.model.first_token_delay = delay
+    service.model.chunk_delay = 0
+    calls = []
+    generate = service.model.generate_content_async
+
+    async def counting(*args, **kwargs):
+        calls.append(args[0])
+        return await generate(*args, **kwargs)
+
+    service.model.generate_content_async = counting
+    return service, calls
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_requests_share_one_call():
+    service, calls = slow_stub_service()
+
+    messages = ["早安"] * 200 + ["晚安"] * 100
+    replies = await asyncio.gather(*(service.generate_response(m) for m in messages))
+
+    assert len(calls) == 2
+    assert set(replies[:200]) == {replies[0]} and set(replies[200:]) == {replies[200]}
+    stats = service.single_flight.stats()
+    assert stats["calls"] == 300
+    assert stats["dedup_ratio"] == pytest.approx(1 - 2 / 300)
+    assert stats["in_flight"] == 0
+
+@pytest.mark.asyncio
+async def test_sequential_requests_are_not_coalesced():
+    service, calls = slow_stub_service(delay=0)
+    await service.generate_response("早安")
+    await service.generate_response("早安")
+    assert len(calls) == 2
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_fail_the_others():
+    service, calls = slow_stub_service()
+    tasks = [asyncio.create_task(service.generate_response("早安")) for _ in range(5)]
+    await asyncio.sleep(0.01)
+    tasks[0].cancel()
+
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    assert isinstance(results[0], asyncio.CancelledError)
+    assert all(isinstance(r, str) for r in results[1:])
+    assert len(calls) == 1
+
+@pytest.mark.asyncio
+async def test_work_is_cancelled_when_every_caller_leaves():
+    flight = SingleFlight()
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def work():
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    tasks = [asyncio.create_task(flight.do("k", work)) for _ in range(3)]
+    await started.wait()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await asyncio.wait_for(cancelled.wait(), 1)
+    assert len(flight) == 0
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_caller_and_are_not_cached():
+    flight = SingleFlight()
+    attempts = []
+
+    async def failing():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("quota exceeded")
+
+    results = await asyncio.gather(*(flight.do("k", failing) for _ in range(4)), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert len(attempts) == 1
+
+    # The failure is not remembered: the next call runs again
+    with pytest.raises(RuntimeError):
+        await flight.do("k", failing)
+    assert len(attempts) == 2
@@ -0,0 +1,118 @@
+import pytest
+from src.idolmcp.core.state import (
+    RedisStateBackend, SQLiteStateBackend, StateBackend, StateBackendType, StateConfig, create_state_backend
+)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class FakeRedis:
+    """The handful of redis.asyncio calls RedisStateBackend makes, with expiry on a fake clock."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.data = {}
+
+    async def get(self, key):
+        value, expires_at = self.data.get(key, (None, None))
+        if expires_at is not None and expires_at <= self.clock():
+            del self.data[key]
+            return None
+        return value
+
+    async def set(self, key, value, px=None, nx=False):
+        if nx and await self.get(key) is not None:
+            return None
+        self.data[key] = (value, self.clock() + px / 1000 if px is not None else None)
+        return True
+
+    async def pexpire(self, key, px):
+        if await self.get(key) is None:
+            return False
+        self.data[key] = (self.data[key][0], self.clock() + px / 1000)
+        return True
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+    async def aclose(self):
+        pass
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+@pytest.fixture(params=["sqlite", "redis"])
+def backends(request, tmp_path, clock):
+    """Two workers' views of one shared store."""
+    if request.param == "sqlite":
+        path = str(tmp_path / "state.db")
+        return SQLiteStateBackend(path, "t:", clock), SQLiteStateBackend(path, "t:", clock)
+    server = FakeRedis(clock)
+    return RedisStateBackend("", "t:", client=server), RedisStateBackend("", "t:", client=server)
+
+@pytest.mark.asyncio
+async def test_values_expire(backends, clock):
+    a, b = backends
+    await a.set("mood", "happy", ttl=10)
+    await a.set("forever", "1")
+    assert await b.get("mood") == "happy"
+    clock.now += 10
+    assert await b.get("mood") is None
+    assert await b.get("forever") == "1"
+    await b.delete("forever")
+    assert await a.get("forever") is None
+
+@pytest.mark.asyncio
+async def test_lease_has_one_holder(backends, clock):
+    a, b = backends
+    assert await a.acquire("jobs", "worker-a", ttl=30)
+    assert not await b.acquire("jobs", "worker-b", ttl=30)
+    clock.now += 20
+    # Renewal by the holder extends the lease past the original expiry
+    assert await a.acquire("jobs", "worker-a", ttl=30)
+    clock.now += 20
+    assert not await b.acquire("jobs", "worker-b", ttl=30)
+    # A holder that stops renewing loses the lease
+    clock.now += 30
+    assert await b.acquire("jobs", "worker-b", ttl=30)
+    assert not await a.acquire("jobs", "worker-a", ttl=30)
+
+    await a.release("jobs", "worker-a")
+    assert not await a.acquire("jobs", "worker-a", ttl=30)
+    await b.release("jobs", "worker-b")
+    assert await a.acquire("jobs", "worker-a", ttl=30)
+
+@pytest.mark.asyncio
+async def test_sqlite_purges_expired_rows(tmp_path, clock):
+    backend = SQLiteStateBackend(str(tmp_path / "state.db"), clock=clock)
+    await backend.set("a", "1", ttl=5)
+    await backend.set("b", "1", ttl=50)
+    clock.now += 10
+    assert await backend.purge_expired() == 1
+    await backend.close()
+
+@pytest.mark.asyncio
+async def test_create_state_backend(tmp_path):
+    assert create_state_backend(StateConfig()) is None
+    backend = create_state_backend(StateConfig(backend=StateBackendType.SQLITE, sqlite_path=str(tmp_path / "s.db")))
+    assert isinstance(backend, SQLiteStateBackend)
+    await backend.close()
+
+def test_incomplete_backend_fails_when_instantiated():
+    class NoLeases(StateBackend):
+        async def get(self, key):
+            return None
+
+        async def set(self, key, value, ttl=None):
+            pass
+
+        async def delete(self, key):
+            pass
+
+    with pytest.raises(TypeError):
+        NoLeases()
@@ -0,0 +1,179 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from sqlalchemy import func, select
+from src.idolmcp.core.memory import MemoryConfig, MemoryEntry
+from src.idolmcp.core.memory.async_memory import AsyncMemorySystem
+from src.idolmcp.core.memory.write_behind import Durability, WriteBehindConfig, WriteBehindQueue, merge_pending
+
+def make_system(**write_behind):
+    return AsyncMemorySystem(MemoryConfig(
+        db_url="sqlite:///:memory:",
+        max_memories_per_user=5,
+        write_behind=WriteBehindConfig(**write_behind)
+    ))
+
+@pytest_asyncio.fixture
+async def memory_system():
+    system = make_system(batch_size=3, flush_interval=60)
+    yield system
+    await system.close()
+
+async def count_rows(system):
+    await system.init_schema()
+    async with system.Session() as session:
+        return await session.scalar(select(func.count()).select_from(MemoryEntry))
+
+@pytest.mark.asyncio
+async def test_unflushed_writes_are_visible(memory_system):
+    await memory_system.store_memory("test_user", "Memory 1", ["tag1"])
+    await memory_system.store_memory("test_user", "Memory 2", ["tag2"])
+
+    assert len(memory_system.write_queue) == 2
+    assert await count_rows(memory_system) == 0
+    memories = await memory_system.get_memories("test_user")
+    assert [m["content"] for m in memories] == ["Memory 2", "Memory 1"]
+    assert [m["content"] for m in await memory_system.get_memories("test_user", ["tag1"])] == ["Memory 1"]
+
+@pytest.mark.asyncio
+async def test_flush_on_batch_size(memory_system):
+    for i in range(3):
+        await memory_system.store_memory("test_user", f"Memory {i}", ["test"])
+    await asyncio.sleep(0.05)
+
+    assert len(memory_system.write_queue) == 0
+    assert await count_rows(memory_system) == 3
+    assert memory_system.write_queue.flushed_batches == 1
+    memories = await memory_system.get_memories("test_user")
+    assert [m["content"] for m in memories] == ["Memory 2", "Memory 1", "Memory 0"]
+
+@pytest.mark.asyncio
+async def test_reads_do_not_duplicate_after_flush(memory_system):
+    await memory_system.store_memory("test_user", "Memory", ["test"])
+    pending = memory_system.write_queue.pending_for("test_user")
+    await memory_system.write_queue.flush()
+
+    memories = await memory_system.get_memories("test_user")
+    assert len(merge_pending(pending, memories, None, 5)) == 1
+
+@pytest.mark.asyncio
+async def test_close_flushes_pending():
+    system = make_system(batch_size=100, flush_interval=60)
+    await system.store_memory("test_user", "Memory", ["test"])
+    await system.write_queue.close()
+
+    assert await count_rows(system) == 1
+    await system.engine.dispose()
+
+@pytest.mark.asyncio
+async def test_group_commit_waits_for_flush():
+    system = make_system(batch_size=100, flush_interval=0.01, durability=Durability.GROUP_COMMIT)
+    await asyncio.gather(*(system.store_memory("test_user", f"Memory {i}", []) for i in range(5)))
+
+    assert await count_rows(system) == 5
+    assert system.write_queue.flushed_batches == 1
+    await system.close()
+
+@pytest.mark.asyncio
+async def test_group_commit_batch_shares_one_flush():
+    system = make_system(batch_size=100, flush_interval=0.05, durability=Durability.GROUP_COMMIT)
+    started = asyncio.get_running_loop().time()
+    await system.store_memories([("test_user", f"Memory {i}", []) for i in range(5)])
+
+    assert asyncio.get_running_loop().time() - started < 0.2
+    assert await count_rows(system) == 5
+    assert system.write_queue.flushed_batches == 1
+    memories = await system.get_memories("test_user")
+    assert [m["content"] for m in memories] == [f"Memory {i}" for i in reversed(range(5))]
+    await system.close()
+
+@pytest.mark.asyncio
+async def test_backpressure_bounds_queue():
+    flushed = []
+
+    async def flush(batch):
+        await asyncio.sleep(0.01)
+        flushed.extend(batch)
+
+    queue = WriteBehindQueue(WriteBehindConfig(batch_size=2, flush_interval=60, max_pending=4), flush)
+    high_water = 0
+
+    async def producer():
+        nonlocal high_water
+        for i in range(20):
+            await queue.put("test_user", f"Memory {i}", [])
+            high_water = max(high_water, len(queue))
+
+    await producer()
+    await queue.close()
+
+    assert high_water <= 4
+    assert [item.content for item in flushed] == [f"Memory {i}" for i in range(20)]
+
+@pytest.mark.asyncio
+async def test_relaxed_failure_keeps_batch_queued():
+    attempts = []
+
+    async def flush(batch):
+        attempts.append(len(batch))
+        if len(attempts) == 1:
+            raise RuntimeError("database is locked")
+
+    queue = WriteBehindQueue(WriteBehindConfig(batch_size=10, flush_interval=60), flush)
+    await queue.put("test_user", "Memory", [])
+    await queue.flush()
+    assert len(queue) == 1
+
+    await queue.close()
+    assert len(queue) == 0
+    assert attempts == [1, 1]
+
+@pytest.mark.asyncio
+async def test_poison_row_is_dead_lettered_after_retries():
+    written = []
+
+    async def flush(batch):
+        if any(item.content == "poison" for item in batch):
+            raise RuntimeError("CHECK constraint failed")
+        written.extend(item.content for item in batch)
+
+    queue = WriteBehindQueue(WriteBehindConfig(batch_size=10, flush_interval=0.001, max_retries=2), flush)
+    for content in ("before", "poison", "after"):
+        await queue.put("test_user", content, [])
+    for _ in range(200):
+        if not len(queue):
+            break
+        await asyncio.sleep(0.005)
+
+    assert len(queue) == 0
+    assert written == ["before", "after"]
+    assert [item.content for item in queue.dead_letters] == ["poison"]
+    assert queue.dropped_memories == 1
+    await queue.put("test_user", "later", [])
+    await queue.close()
+    assert written[-1] == "later"
+
+@pytest.mark.asyncio
+async def test_close_retries_then_dead_letters_what_is_left():
+    attempts = []
+
+    async def flaky(batch):
+        attempts.append(len(batch))
+        if len(attempts) < 3:
+            raise RuntimeError("database is locked")
+
+    queue = WriteBehindQueue(WriteBehindConfig(batch_size=10, flush_interval=0.001, max_retries=100), flaky)
+    await queue.put("test_user", "Memory", [])
+    await queue.close()
+    assert attempts == [1, 1, 1] and len(queue) == 0 and not queue.dead_letters
+
+    async def down(batch):
+        raise RuntimeError("database is gone")
+
+    queue = WriteBehindQueue(WriteBehindConfig(batch_size=10, flush_interval=0.001, max_retries=100, close_timeout=0.05), down)
+    for i in range(3):
+        await queue.put("test_user", f"Memory {i}", [])
+    await queue.close()
+    assert len(queue) == 0
+    assert [item.content for item in queue.dead_letters] == ["Memory 0", "Memory 1", "Memory 2"]
+    assert queue.dropped_memories == 3
@@ -57,4 +57,63 @@ def test_state_sequence():
     assert fsm.get_current_state() == EmotionState.HAPPY
     
     fsm.process_trigger("exciting_event")
-    assert fsm.get_current_state() == EmotionState.EXCITED 
\ No newline at end of file
+    assert fsm.get_current_state() == EmotionState.EXCITED 
+
+def test_seeded_fsm_replays_identically():
+    def run(seed):
+        fsm = EmotionFSM(seed=seed)
+        states = []
+        for trigger in ["positive_interaction", "exciting_event", "negative_interaction"] * 10:
+            fsm.process_trigger(trigger)
+            states.append(fsm.get_current_state())
+        return states
+
+    assert run(42) == run(42)
+
+def test_process_triggers_follows_the_transition_table():
+    fsm = EmotionFSM(seed=7)
+    fsm.add_transition(
+        EmotionTransition(from_state=EmotionState.ANGRY, to_state=EmotionState.SHY, trigger="comfort", probability=1.0)
+    )
+    fsm.add_transition(
+        EmotionTransition(from_state=EmotionState.ANGRY, to_state=EmotionState.SAD, trigger="comfort", probability=1.0)
+    )
+
+    new_states = fsm.process_triggers(
+        [EmotionState.ANGRY, EmotionState.ANGRY, EmotionState.HAPPY, EmotionState.NEUTRAL],
+        ["comfort", "unknown", "comfort", "unknown"]
+    )
+    # The first matching candidate wins; no rule or an unknown trigger keeps the state
+    assert new_states == [EmotionState.SHY, EmotionState.ANGRY, EmotionState.HAPPY, EmotionState.NEUTRAL]
+
+def test_process_triggers_seeded_replay_and_probabilities():
+    states = [EmotionState.NEUTRAL] * 20000
+    triggers = ["positive_interaction"] * 20000
+
+    first = EmotionFSM(seed=7).process_triggers(states, triggers)
+    assert first == EmotionFSM(seed=7).process_triggers(states, triggers)
+    # Same odds as process_trigger: NEUTRAL -> HAPPY with probability 0.8
+    assert abs(first.count(EmotionState.HAPPY) / len(first) - 0.8) < 0.02
+    assert set(first) == {EmotionState.HAPPY, EmotionState.NEUTRAL}
+
+def test_process_triggers_with_conditions():
+    fsm = EmotionFSM(seed=0)
+    fsm.add_transition(
+        EmotionTransition(
+            from_state=EmotionState.NEUTRAL,
+            to_state=EmotionState.CONFIDENT,
+            trigger="special_event",
+            conditions={"user_type": "vip"}
+        )
+    )
+
+    new_states = fsm.process_triggers(
+        [EmotionState.NEUTRAL, EmotionState.NEUTRAL, EmotionState.ANGRY],
+        ["special_event", "special_event", "special_event"],
+        [{"user_type": "vip"}, {"user_type": "normal"}, None]
+    )
+    assert new_states == [EmotionState.CONFIDENT, EmotionState.NEUTRAL, EmotionState.ANGRY]
+
+def test_process_triggers_length_mismatch():
+    with pytest.raises(ValueError):
+        EmotionFSM().process_triggers([EmotionState.NEUTRAL], [])
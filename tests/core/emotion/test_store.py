@@ -0,0 +1,147 @@
+import pytest
+from src.idolmcp.core.emotion import EmotionConfig, EmotionState
+from src.idolmcp.core.emotion.store import EmotionStateStore, EmotionStoreConfig, SharedEmotionStateStore
+from src.idolmcp.core.state import SQLiteStateBackend
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+@pytest.fixture
+def store(clock):
+    config = EmotionConfig(base_emotion=EmotionState.NEUTRAL, emotion_triggers={})
+    return EmotionStateStore(config, EmotionStoreConfig(max_entries=3, idle_ttl_seconds=60), clock=clock)
+
+def test_untracked_user_is_at_base_emotion(store):
+    assert store.get("fan", "line") == (EmotionState.NEUTRAL, 0.5)
+    assert len(store) == 0
+
+def test_users_do_not_share_state(store):
+    store.update_state("fan_a", "line", EmotionState.HAPPY, 0.8)
+    store.update_state("fan_b", "line", EmotionState.SAD, 1.5)
+
+    assert store.get("fan_a", "line") == (EmotionState.HAPPY, 0.8)
+    assert store.get("fan_b", "line") == (EmotionState.SAD, 1.0)
+    assert store.get("fan_a", "discord") == (EmotionState.NEUTRAL, 0.5)
+
+def test_capacity_evicts_least_recently_updated(store):
+    for user in ("a", "b", "c"):
+        store.update_state(user, "web", EmotionState.HAPPY, 0.8)
+    store.update_state("a", "web", EmotionState.EXCITED, 0.9)
+    store.update_state("d", "web", EmotionState.SAD, 0.3)
+
+    assert len(store) == 3
+    assert ("web", "b") not in store
+    assert store.get("a", "web") == (EmotionState.EXCITED, 0.9)
+    assert store.evictions == 1
+
+def test_idle_entries_are_evicted(store, clock):
+    store.update_state("a", "web", EmotionState.HAPPY, 0.8)
+    clock.now += 30
+    store.update_state("b", "web", EmotionState.HAPPY, 0.8)
+    clock.now += 40
+
+    assert store.evict_idle() == 1
+    assert ("web", "a") not in store
+    assert ("web", "b") in store
+
+def test_slots_are_reused(store):
+    store.update_state("a", "web", EmotionState.HAPPY, 0.8)
+    store.reset("a", "web")
+    store.update_state("b", "web", EmotionState.SAD, 0.4)
+
+    assert len(store._state) == 1
+    assert store.get("a", "web") == (EmotionState.NEUTRAL, 0.5)
+
+@pytest.fixture
+def decaying_store(clock):
+    config = EmotionConfig(
+        base_emotion=EmotionState.NEUTRAL,
+        emotion_triggers={},
+        emotion_decay_rate=0.1,
+        emotion_decay_interval=10
+    )
+    return EmotionStateStore(config, clock=clock)
+
+def test_decay_is_computed_from_elapsed_time(decaying_store, clock):
+    decaying_store.update_state("fan", "web", EmotionState.HAPPY, 0.8)
+    clock.now += 30
+
+    state, intensity = decaying_store.get("fan", "web")
+    assert state == EmotionState.HAPPY
+    assert intensity == pytest.approx(0.5)
+
+    clock.now += 50
+    assert decaying_store.get("fan", "web") == (EmotionState.NEUTRAL, 0.5)
+
+def test_base_emotion_does_not_decay(decaying_store, clock):
+    decaying_store.update_state("fan", "web", EmotionState.NEUTRAL, 0.3)
+    clock.now += 1000
+    assert decaying_store.get("fan", "web") == (EmotionState.NEUTRAL, 0.3)
+
+def test_snapshot_matches_lazy_reads(decaying_store, clock):
+    decaying_store.update_state("a", "web", EmotionState.HAPPY, 0.8)
+    decaying_store.update_state("b", "web", EmotionState.SAD, 0.2)
+    decaying_store.update_state("c", "web", EmotionState.NEUTRAL, 0.5)
+    clock.now += 30
+
+    snapshot = decaying_store.snapshot()
+    assert snapshot.keys == [("web", "a"), ("web", "b"), ("web", "c")]
+    for i, (platform, user_id) in enumerate(snapshot.keys):
+        state, intensity = decaying_store.get(user_id, platform)
+        assert snapshot.state_of(i) == state
+        assert snapshot.intensity[i] == pytest.approx(intensity)
+    assert decaying_store.state_counts() == {
+        EmotionState.HAPPY: 1,
+        EmotionState.SAD: 0,
+        EmotionState.ANGRY: 0,
+        EmotionState.NEUTRAL: 2,
+        EmotionState.EXCITED: 0,
+    }
+
+def test_decay_all_folds_decay_into_storage(decaying_store, clock):
+    decaying_store.update_state("a", "web", EmotionState.HAPPY, 0.8)
+    decaying_store.update_state("b", "web", EmotionState.SAD, 0.2)
+    clock.now += 30
+    decaying_store.decay_all()
+
+    assert decaying_store.get("a", "web") == (EmotionState.HAPPY, pytest.approx(0.5))
+    assert decaying_store.get("b", "web") == (EmotionState.NEUTRAL, 0.5)
+    clock.now += 10
+    assert decaying_store.get("a", "web")[1] == pytest.approx(0.4)
+    # Arrays can still grow after the NumPy views were released
+    decaying_store.update_state("c", "web", EmotionState.HAPPY, 0.8)
+
+@pytest.mark.asyncio
+async def test_shared_store_is_seen_by_every_worker(tmp_path, clock):
+    config = EmotionConfig(
+        base_emotion=EmotionState.NEUTRAL,
+        emotion_triggers={},
+        emotion_decay_rate=0.1,
+        emotion_decay_interval=10
+    )
+    path = str(tmp_path / "state.db")
+    # Two workers, each with its own connection to the shared file
+    worker_a = SharedEmotionStateStore(config, SQLiteStateBackend(path, clock=clock), EmotionStoreConfig(idle_ttl_seconds=60), clock=clock)
+    worker_b = SharedEmotionStateStore(config, SQLiteStateBackend(path, clock=clock), EmotionStoreConfig(idle_ttl_seconds=60), clock=clock)
+
+    assert await worker_a.update_state("fan", "web", EmotionState.HAPPY, 1.5) == (EmotionState.HAPPY, 1.0)
+    assert await worker_b.get("fan", "web") == (EmotionState.HAPPY, 1.0)
+    clock.now += 30
+    assert await worker_b.get("fan", "web") == (EmotionState.HAPPY, pytest.approx(0.7))
+    assert await worker_a.get("fan", "line") == (EmotionState.NEUTRAL, 0.5)
+
+    # Idle entries expire with the backend key
+    clock.now += 31
+    assert await worker_a.get("fan", "web") == (EmotionState.NEUTRAL, 0.5)
+
+    await worker_b.update_state("fan", "web", EmotionState.SAD, 0.4)
+    await worker_a.reset("fan", "web")
+    assert await worker_b.get("fan", "web") == (EmotionState.NEUTRAL, 0.5)
@@ -1,5 +1,6 @@
 import pytest
 from datetime import datetime, timedelta
+from src.idolmcp.core import idol_log
 from src.idolmcp.core.idol_log import IdolLog, IdolLogEntry
 
 def test_add_entry():
@@ -80,4 +81,77 @@ def test_clear_log():
     log.add_entry("event2", "desc2", "neutral")
     
     log.clear_log()
-    assert len(log.log_entries) == 0 
\ No newline at end of file
+    assert len(log.log_entries) == 0 
+
+def test_indexes_follow_eviction():
+    log = IdolLog(max_entries=3)
+    log.add_entry("training", "desc0", "happy")
+    log.add_entry("performance", "desc1", "sad")
+    log.add_entry("training", "desc2", "happy")
+    log.add_entry("fan_meeting", "desc3", "happy")
+    
+    assert [e.description for e in log.get_entries_by_type("training")] == ["desc2"]
+    assert log.get_entries_by_type("fan_meeting")[0].description == "desc3"
+    assert [e.description for e in log.get_entries_by_emotion("happy")] == ["desc2", "desc3"]
+    
+    log.add_entry("fan_meeting", "desc4", "neutral")
+    assert log.get_entries_by_type("performance") == []
+    assert log.get_entries_by_emotion("sad") == []
+
+def test_date_range_after_wraparound():
+    log = IdolLog(max_entries=4)
+    for i in range(10):
+        log.add_entry(f"event_{i}", f"desc_{i}", "neutral")
+    entries = log.log_entries
+    
+    in_range = log.get_entries_by_date_range(entries[1].timestamp, entries[2].timestamp)
+    assert in_range[0].timestamp >= entries[1].timestamp
+    assert all(entries[1].timestamp <= e.timestamp <= entries[2].timestamp for e in in_range)
+    assert log.get_entries_by_date_range(entries[-1].timestamp + timedelta(seconds=1), datetime.max) == []
+    assert len(log.get_recent_entries(limit=10)) == 4
+
+def test_log_entries_can_be_replaced():
+    log = IdolLog(max_entries=2)
+    log.add_entry("event1", "desc1", "neutral")
+    entries = log.log_entries
+    assert isinstance(entries, list)
+
+    log.log_entries = entries + [IdolLogEntry(timestamp=datetime.now(), event_type="event2", description="desc2", emotion_state="happy")]
+    assert [e.event_type for e in log.log_entries] == ["event1", "event2"]
+    assert [e.description for e in log.get_entries_by_emotion("happy")] == ["desc2"]
+    log.log_entries = []
+    assert log.log_entries == []
+
+def test_max_entries_must_be_positive():
+    with pytest.raises(ValueError):
+        IdolLog(max_entries=0)
+
+def test_timestamps_stay_ordered_when_the_clock_goes_back(monkeypatch):
+    now = datetime(2024, 1, 1, 12, 0)
+    readings = iter([now, now - timedelta(minutes=5), now + timedelta(minutes=1)])
+
+    class SteppingClock(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return next(readings)
+
+    monkeypatch.setattr(idol_log, "datetime", SteppingClock)
+    log = IdolLog()
+    for i in range(3):
+        log.add_entry(f"event_{i}", f"desc_{i}", "neutral")
+
+    timestamps = [e.timestamp for e in log.log_entries]
+    assert timestamps == sorted(timestamps) and len(set(timestamps)) == 3
+    assert [e.event_type for e in log.get_entries_by_date_range(now, now)] == ["event_0"]
+    assert len(log.get_entries_by_date_range(now, now + timedelta(minutes=1))) == 3
+
+def test_replaced_entries_are_sorted_by_time():
+    log = IdolLog()
+    now = datetime.now()
+    log.log_entries = [
+        IdolLogEntry(timestamp=now + timedelta(minutes=i), event_type=f"event_{i}", description="", emotion_state="neutral")
+        for i in (2, 0, 1)
+    ]
+    assert [e.event_type for e in log.log_entries] == ["event_0", "event_1", "event_2"]
+    in_range = log.get_entries_by_date_range(now, now + timedelta(minutes=1))
+    assert [e.event_type for e in in_range] == ["event_0", "event_1"]
@@ -0,0 +1,168 @@
+import os
+import time
+import pytest
+from datetime import datetime, timedelta
+from src.idolmcp.core.idol_log import IdolLog, IdolLogEntry
+from src.idolmcp.core.idol_log_store import SegmentLogConfig, SegmentLogStore
+
+BASE = datetime(2024, 1, 1, 12, 0, 0)
+
+def make_entry(i, event_type="chat", emotion_state="happy", additional_data=None, base=BASE):
+    return IdolLogEntry(
+        timestamp=base + timedelta(seconds=i),
+        event_type=event_type,
+        description=f"訊息 {i}",
+        emotion_state=emotion_state,
+        additional_data=additional_data
+    )
+
+@pytest.fixture
+def config(tmp_path):
+    return SegmentLogConfig(directory=str(tmp_path), segment_bytes=4096, index_interval=8)
+
+def test_roundtrip(config):
+    store = SegmentLogStore(config)
+    entry = make_entry(0, additional_data={"user_id": "u1", "duration": 60})
+    store.append(entry)
+    assert list(store) == [entry]
+    store.close()
+
+def test_read_range_across_segments(config):
+    store = SegmentLogStore(config)
+    for i in range(500):
+        store.append(make_entry(i))
+    assert len(store._segments) > 1
+
+    entries = store.read_range(BASE + timedelta(seconds=100), BASE + timedelta(seconds=299))
+    assert [e.description for e in entries] == [f"訊息 {i}" for i in range(100, 300)]
+    assert store.read_range(BASE - timedelta(days=1), BASE - timedelta(seconds=1)) == []
+    store.close()
+
+def test_read_by_type(config):
+    store = SegmentLogStore(config)
+    for i in range(100):
+        store.append(make_entry(i, event_type="training" if i % 10 == 0 else "chat"))
+
+    training = store.read_by_type("training")
+    assert [e.timestamp for e in training] == [BASE + timedelta(seconds=i) for i in range(0, 100, 10)]
+    assert len(store.read_by_type("training", start_date=BASE + timedelta(seconds=50))) == 5
+    store.close()
+
+def test_read_recent(config):
+    store = SegmentLogStore(config)
+    for i in range(300):
+        store.append(make_entry(i))
+    assert [e.description for e in store.read_recent(150)] == [f"訊息 {i}" for i in range(150, 300)]
+    assert len(store.read_recent(1000)) == 300
+    store.close()
+
+def test_retention_drops_whole_segments(tmp_path):
+    store = SegmentLogStore(SegmentLogConfig(directory=str(tmp_path), segment_bytes=2048, max_segments=3))
+    for i in range(1000):
+        store.append(make_entry(i))
+    assert len(store._segments) == 3
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".log")]) == 3
+    # 只保留最新的紀錄，且仍然連續
+    remaining = [e.timestamp for e in store]
+    assert remaining[-1] == BASE + timedelta(seconds=999)
+    assert remaining == sorted(remaining)
+    store.close()
+
+def test_time_based_retention(tmp_path):
+    store = SegmentLogStore(SegmentLogConfig(directory=str(tmp_path), segment_bytes=2048, retention_seconds=100))
+    base = datetime.now() - timedelta(seconds=1000)
+    for i in range(1000):
+        store.append(make_entry(i, base=base))
+    store.apply_retention(now=base + timedelta(seconds=1000))
+    # 最舊的保留段落可能含有少量過期紀錄，但不會早太多
+    first = next(iter(store)).timestamp
+    assert base + timedelta(seconds=800) < first <= base + timedelta(seconds=900)
+    store.close()
+
+def test_reopen_recovers_torn_tail(config):
+    store = SegmentLogStore(config)
+    for i in range(50):
+        store.append(make_entry(i))
+    store.close()
+
+    # 模擬寫到一半就當機：在最後一個段落尾端留下不完整的紀錄
+    last_log = sorted(name for name in os.listdir(config.directory) if name.endswith(".log"))[-1]
+    with open(os.path.join(config.directory, last_log), "ab") as f:
+        f.write(b"\x40\x00\x00\x00garbage")
+
+    store = SegmentLogStore(config)
+    store.append(make_entry(50))
+    assert [e.description for e in store] == [f"訊息 {i}" for i in range(51)]
+    store.close()
+
+def test_idol_log_warms_from_store(config):
+    log = IdolLog(max_entries=10, store=SegmentLogStore(config))
+    for i in range(25):
+        log.add_entry("chat", f"訊息 {i}", "happy" if i % 2 else "neutral")
+    log.store.close()
+
+    reopened = IdolLog(max_entries=10, store=SegmentLogStore(config))
+    assert [e.description for e in reopened.log_entries] == [f"訊息 {i}" for i in range(15, 25)]
+    assert len(reopened.get_entries_by_emotion("happy")) == 5
+    assert len(reopened.store.read_by_type("chat")) == 25
+    reopened.store.close()
+
+def test_queries_reach_entries_older_than_memory(config):
+    log = IdolLog(max_entries=10, store=SegmentLogStore(config))
+    for i in range(300):
+        log.add_entry("fan_meeting" if i % 3 == 0 else "chat", f"訊息 {i}", "happy")
+    entries = list(log.store)
+
+    meetings = log.get_entries_by_type("fan_meeting")
+    assert [e.description for e in meetings] == [f"訊息 {i}" for i in range(0, 300, 3)]
+    in_range = log.get_entries_by_date_range(entries[5].timestamp, entries[294].timestamp)
+    assert [e.description for e in in_range] == [f"訊息 {i}" for i in range(5, 295)]
+    # Ranges inside the ring never read the segments
+    assert log.get_entries_by_date_range(entries[295].timestamp, datetime.max) == log.log_entries[5:]
+    log.store.close()
+
+def test_clear_log_clears_store(config):
+    log = IdolLog(max_entries=10, store=SegmentLogStore(config))
+    for i in range(300):
+        log.add_entry("chat", f"訊息 {i}", "happy")
+    log.clear_log()
+    log.add_entry("chat", "new", "happy")
+    log.store.close()
+
+    reopened = IdolLog(max_entries=10, store=SegmentLogStore(config))
+    assert [e.description for e in reopened.log_entries] == ["new"]
+    assert len(os.listdir(config.directory)) == 2
+    reopened.store.close()
+
+def test_retention_runs_on_open(tmp_path):
+    old = datetime.now() - timedelta(days=30)
+    store = SegmentLogStore(SegmentLogConfig(directory=str(tmp_path), segment_bytes=2048))
+    for i in range(300):
+        store.append(make_entry(i, base=old))
+    store.close()
+    segments = len([name for name in os.listdir(tmp_path) if name.endswith(".log")])
+    assert segments > 2
+
+    # 重新開啟時就套用保留策略，不必等到下一次換段
+    store = SegmentLogStore(SegmentLogConfig(directory=str(tmp_path), segment_bytes=2048, retention_seconds=86400))
+    assert len(store._segments) == 1
+
+    store.close()
+
+def test_retention_checked_between_rolls(tmp_path):
+    store = SegmentLogStore(SegmentLogConfig(
+        directory=str(tmp_path), segment_bytes=2048, retention_seconds=1000, retention_check_seconds=0
+    ))
+    old = datetime.now() - timedelta(seconds=3600)
+    i = 0
+    while store._log_file.tell() < 2048:
+        store.append(make_entry(i, base=old))
+        i += 1
+    # 開啟第二段的這筆 0.2 秒後才過期，換段時第一段仍保留
+    store.append(make_entry(0, base=datetime.now() - timedelta(seconds=999.8)))
+    assert len(store._segments) == 2
+
+    time.sleep(0.3)
+    store.append(make_entry(0, base=datetime.now()))
+    assert len(store._segments) == 1
+    store.close()
@@ -0,0 +1,78 @@
+import json
+import logging
+import queue
+from src.idolmcp.core.log_config import (
+    BackgroundQueueHandler, JsonFormatter, LoggingConfig, RequestIdFilter, SamplingFilter, _use_lean_records,
+    parse_sample_rates, request_id
+)
+
+def record(name="main", level=logging.INFO, msg="收到聊天請求: %s", args=("早安",)):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+def test_json_lines_carry_request_id():
+    token = request_id.set("req-1")
+    try:
+        entry = record()
+        RequestIdFilter().filter(entry)
+    finally:
+        request_id.reset(token)
+    line = json.loads(JsonFormatter().format(entry))
+    assert line["request_id"] == "req-1"
+    assert line["message"] == "收到聊天請求: 早安"
+    assert line["logger"] == "main" and line["level"] == "INFO"
+
+def test_sampling_is_per_request_and_per_logger():
+    sampler = SamplingFilter({"main": 0.3, "core.llm": 0.0})
+
+    def kept(name, rid, level=logging.INFO):
+        entry = record(name, level)
+        entry.request_id = rid
+        return sampler.filter(entry)
+
+    requests = [f"req-{i}" for i in range(2000)]
+    kept_requests = [rid for rid in requests if kept("main", rid)]
+    assert 450 < len(kept_requests) < 750
+    # Every line of a kept request is kept, whichever module logged it
+    assert all(kept("main.routes", rid) for rid in kept_requests)
+    assert not any(kept("core.llm.backends", rid) for rid in requests)
+    assert all(kept("core.memory", rid) for rid in requests)
+    assert kept("core.llm", "req-1", logging.WARNING)
+    assert sampler.dropped == len(requests) * 2 - len(kept_requests)
+
+def test_queue_handler_defers_formatting_and_never_blocks():
+    handler = BackgroundQueueHandler(queue.Queue(1))
+    first, second = record(), record()
+    handler.handle(first)
+    handler.handle(second)
+    queued = handler.queue.get_nowait()
+    # Still unformatted: the listener thread does the formatting
+    assert queued is first and queued.args == ("早安",)
+    assert handler.dropped == 1
+
+def test_parse_sample_rates():
+    assert parse_sample_rates("main=0.1, core.llm=0.05,") == {"main": 0.1, "core.llm": 0.05}
+    assert parse_sample_rates("") == {}
+
+def logged():
+    handler = BackgroundQueueHandler(queue.Queue())
+    probe = logging.getLogger("test_log_config.lean")
+    probe.addHandler(handler)
+    try:
+        probe.warning("探測")
+    finally:
+        probe.removeHandler(handler)
+    return handler.queue.get_nowait()
+
+def test_lean_records_is_opt_in_and_reversible():
+    assert LoggingConfig().lean_records is False
+    before = (logging._srcfile, logging.logThreads, logging.logProcesses, logging.logMultiprocessing)
+    try:
+        _use_lean_records(True)
+        _use_lean_records(True)
+        lean = logged()
+        assert lean.pathname == "(unknown file)" and lean.thread is None and lean.process is None
+    finally:
+        _use_lean_records(False)
+    assert (logging._srcfile, logging.logThreads, logging.logProcesses, logging.logMultiprocessing) == before
+    full = logged()
+    assert full.pathname == __file__ and full.thread is not None
@@ -0,0 +1,57 @@
+import pytest
+from src.idolmcp.core.metrics import CounterChild, MetricsRegistry, PipelineMetrics, _Metric
+
+def lines(registry):
+    return registry.render().splitlines()
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry("t")
+    histogram = registry.histogram("latency_seconds", "Latency", ("stage",), buckets=(0.1, 1.0))
+    child = histogram.labels("llm")
+    for value in (0.05, 0.1, 0.5, 3.0):
+        child.observe(value)
+
+    rendered = lines(registry)
+    assert "# TYPE t_latency_seconds histogram" in rendered
+    assert 't_latency_seconds_bucket{stage="llm",le="0.1"} 2' in rendered
+    assert 't_latency_seconds_bucket{stage="llm",le="1.0"} 3' in rendered
+    assert 't_latency_seconds_bucket{stage="llm",le="+Inf"} 4' in rendered
+    assert 't_latency_seconds_count{stage="llm"} 4' in rendered
+    assert 't_latency_seconds_sum{stage="llm"} 3.65' in rendered
+    # Same child every time: nothing is allocated per observation
+    assert histogram.labels("llm") is child and child.count == 4
+
+def test_counters_and_label_escaping():
+    registry = MetricsRegistry("t")
+    counter = registry.counter("requests_total", "Requests", ("path",))
+    counter.labels('/a"b').inc()
+    counter.labels('/a"b').inc(2)
+    assert 't_requests_total{path="/a\\"b"} 3.0' in lines(registry)
+
+def test_stats_exported_as_gauges():
+    registry = MetricsRegistry("t")
+    state = {"hits": 1, "hit_rate": 0.5, "running": False, "name": "skipped"}
+    registry.stats("cache", lambda: state)
+    state["hits"] = 7
+    rendered = lines(registry)
+    assert "t_cache_hits 7" in rendered
+    assert "t_cache_hit_rate 0.5" in rendered
+    assert "t_cache_running 0" in rendered
+    assert not any("name" in line for line in rendered)
+
+def test_pipeline_stage_observe_chains():
+    metrics = PipelineMetrics(MetricsRegistry("t"))
+    now = metrics.observe("store_memory", 0.0)
+    assert now > 0
+    assert metrics.stage("store_memory").count == 1
+    assert metrics.stage("store_memory") is metrics.stage("store_memory")
+
+def test_metric_without_renderer_fails_when_instantiated():
+    class Unrendered(_Metric):
+        kind = "counter"
+
+        def _new_child(self):
+            return CounterChild()
+
+    with pytest.raises(TypeError):
+        Unrendered("t_x", "X")